@@ -0,0 +1,218 @@
+"""
+Admission control for new games: a global and a per-IP limit on concurrent games,
+with a FIFO wait queue for players over either limit.
+
+Every admitted game holds a slot until it ends (including any resume grace period),
+since that is how long its upstream Live session stays open. When a slot frees up,
+the longest-waiting player whose IP is under its own limit is admitted next. Waiting
+players are told their position and an ETA, estimated from how long recent games
+held their slots.
+
+With several worker processes (serve.py) the slots are counted in the shared
+registry, so the limits hold across all workers. Registry calls run on the
+registry's thread, so a worker waiting for another's write lock doesn't stall its
+event loop. Each worker queues its own players. Slots freed on other workers are not announced, so a worker with players
+waiting checks the registry every ORACLE_ADMISSION_POLL_S.
+
+Configuration (environment):
+    ORACLE_MAX_GAMES         concurrent games across all players (0 = unlimited)
+    ORACLE_MAX_GAMES_PER_IP  concurrent games per client IP (0 = unlimited)
+    ORACLE_MAX_QUEUE         players allowed to wait; further ones are turned away
+    ORACLE_ADMISSION_POLL_S  with workers, how often waiting players look for a slot freed elsewhere
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from metrics import ADMISSIONS, ADMISSION_WAIT
+from shared_registry import FULL, IP_LIMIT
+
+
+class QueueFullError(Exception):
+    """The wait queue is full; the player should try again later."""
+
+
+class Ticket:
+    """One admitted game's slot. Release it exactly once when the game ends."""
+
+    def __init__(self, ip, id=None):
+        self.ip = ip
+        self.id = id  # slot in the shared registry, if any
+        self.admitted = time.monotonic()
+        self.released = False
+
+
+class _Waiter:
+    def __init__(self, ip, on_update):
+        self.ip = ip
+        self.on_update = on_update
+        self.enqueued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    def __init__(self, max_games=None, max_per_ip=None, max_queue=None, initial_hold_s=120.0,
+                 shared=None, poll_s=None):
+        self.max_games = int(max_games if max_games is not None
+                             else os.getenv("ORACLE_MAX_GAMES", 0))
+        self.max_per_ip = int(max_per_ip if max_per_ip is not None
+                              else os.getenv("ORACLE_MAX_GAMES_PER_IP", 0))
+        self.max_queue = int(max_queue if max_queue is not None
+                             else os.getenv("ORACLE_MAX_QUEUE", 200))
+        self.shared = shared  # SharedRegistry when running with several workers
+        self.poll_s = float(poll_s if poll_s is not None else os.getenv("ORACLE_ADMISSION_POLL_S", 0.5))
+        self.active = 0  # games admitted by this process
+        self._per_ip = {}
+        self._waiters = deque()
+        self._poll_task = None
+        self._dispatching = asyncio.Lock()
+        self._pending = set()  # background slot releases, kept until they finish
+        self.avg_hold_s = initial_hold_s  # moving average of how long games hold a slot
+
+    def queue_depth(self):
+        return len(self._waiters)
+
+    async def _admit(self, ip):
+        """A Ticket if there is room, else None and why not (FULL or IP_LIMIT)."""
+        slot = None
+        if self.shared is not None:
+            slot, refused = await self.shared.run(self.shared.try_admit, ip, self.max_games, self.max_per_ip)
+            if slot is None:
+                return None, refused
+        elif self.max_games > 0 and self.active >= self.max_games:
+            return None, FULL
+        elif self.max_per_ip > 0 and self._per_ip.get(ip, 0) >= self.max_per_ip:
+            return None, IP_LIMIT
+        self.active += 1
+        self._per_ip[ip] = self._per_ip.get(ip, 0) + 1
+        return Ticket(ip, slot), None
+
+    async def try_acquire(self, ip):
+        """Admit right away if nobody is waiting and there is room, else None."""
+        if self._waiters:
+            return None
+        ticket, _ = await self._admit(ip)
+        if ticket is not None:
+            ADMISSIONS.inc(result="immediate")
+        return ticket
+
+    async def acquire(self, ip, on_update=None):
+        """Wait in line for a slot. `on_update(position, eta_s)` is called whenever the
+        player's place in the queue changes. Raises QueueFullError if the queue is full."""
+        ticket = await self.try_acquire(ip)
+        if ticket is not None:
+            return ticket
+        if self.max_queue > 0 and len(self._waiters) >= self.max_queue:
+            ADMISSIONS.inc(result="rejected")
+            raise QueueFullError(f"{len(self._waiters)} players already waiting")
+
+        waiter = _Waiter(ip, on_update)
+        self._waiters.append(waiter)
+        self._notify()
+        if self.shared is not None and self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll())
+        try:
+            ticket = await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the player gave up; hand the slot on
+                self.release(waiter.future.result())
+            else:
+                self._remove(waiter)
+            ADMISSIONS.inc(result="abandoned")
+            raise
+        ADMISSIONS.inc(result="queued")
+        ADMISSION_WAIT.observe(time.monotonic() - waiter.enqueued)
+        return ticket
+
+    def release(self, ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+        self.active -= 1
+        remaining = self._per_ip.get(ticket.ip, 1) - 1
+        if remaining > 0:
+            self._per_ip[ticket.ip] = remaining
+        else:
+            self._per_ip.pop(ticket.ip, None)
+        held = time.monotonic() - ticket.admitted
+        self.avg_hold_s += 0.1 * (held - self.avg_hold_s)
+        task = asyncio.get_running_loop().create_task(self._free(ticket.id))
+        self._pending.add(task)
+        task.add_done_callback(self._freed)
+
+    async def _free(self, slot):
+        # Give the slot back in the registry, then to the next waiting player
+        if slot is not None:
+            await self.shared.run(self.shared.release, slot)
+        await self._dispatch()
+
+    def _freed(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Releasing a game slot failed: {task.exception()}")
+
+    async def bind(self, ticket, game_id):
+        """Record which game holds the slot, so other workers can find it."""
+        if ticket.id is not None:
+            await self.shared.run(self.shared.bind, ticket.id, game_id)
+
+    async def close(self):
+        """Wait for slot releases still in flight (at shutdown, before the registry closes)."""
+        while self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return
+        self._notify()
+
+    async def _dispatch(self):
+        # FIFO, except that a player blocked only by their own IP limit doesn't hold up others.
+        # One pass at a time, so no waiter is admitted twice.
+        async with self._dispatching:
+            admitted = False
+            for waiter in list(self._waiters):
+                if waiter.future.done():
+                    continue
+                ticket, refused = await self._admit(waiter.ip)
+                if ticket is None:
+                    if refused == FULL:
+                        break
+                    continue
+                if waiter.future.done():
+                    # Gave up while the registry was asked; the slot goes to the next one
+                    self.release(ticket)
+                    continue
+                self._waiters.remove(waiter)
+                waiter.future.set_result(ticket)
+                admitted = True
+            if admitted:
+                self._notify()
+
+    async def _poll(self):
+        # Slots freed by other workers are only seen by looking
+        try:
+            while self._waiters:
+                await asyncio.sleep(self.poll_s)
+                await self._dispatch()
+        finally:
+            self._poll_task = None
+
+    def eta_s(self, position):
+        """Rough wait estimate for the player at `position` (1-based)."""
+        slots = self.max_games if self.max_games > 0 else max(self.active, 1)
+        return position * self.avg_hold_s / slots
+
+    def _notify(self):
+        for position, waiter in enumerate(self._waiters, start=1):
+            if waiter.on_update is None:
+                continue
+            try:
+                waiter.on_update(position, self.eta_s(position))
+            except Exception as e:
+                logging.warning(f"Queue update failed: {e}")
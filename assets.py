@@ -0,0 +1,122 @@
+"""
+Built static assets: content-hashed, precompressed copies of the files in static/.
+
+`python build_assets.py` writes them to static/dist together with a manifest.json
+mapping each source path (and each image variant, "<path>@<width>") to its hashed
+URL. Templates and PERSONAS ask the manifest for URLs. static/dist is served with
+a one-year immutable Cache-Control, since a changed file gets a new name. Without a
+build, URLs fall back to the plain /static files, so development needs no build step.
+
+Compressed siblings (<file>.br, <file>.gz) are served in place of the file when the
+request's Accept-Encoding allows, so nothing is compressed per request.
+
+Pages without per-request data are rendered once at startup into a PrerenderedPage
+and served from memory with an ETag.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import stat
+
+import anyio
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+DIST_URL = "/static/dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Preferred first
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+class AssetManifest:
+    def __init__(self, path=os.path.join(DIST_DIR, MANIFEST_NAME)):
+        self.path = path
+        self.urls = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.urls = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable asset manifest {path}: {e}")
+
+    @property
+    def built(self):
+        return bool(self.urls)
+
+    def url(self, path, width=None):
+        """URL of a static file (e.g. "script.js"), or of an image resized to `width`."""
+        key = f"{path}@{width}" if width else path
+        return self.urls.get(key) or f"/{STATIC_DIR}/{path}"
+
+
+def accepted_encodings(header):
+    """Content codings allowed by an Accept-Encoding header (q=0 excluded)."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name, params = name.strip().lower(), params.replace(" ", "")
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q = 1.0
+        if name and q > 0:
+            accepted.add(name)
+    return accepted
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for hashed build output: immutable caching, precompressed variants."""
+
+    async def get_response(self, path, scope):
+        headers = dict(scope.get("headers") or [])
+        accepted = accepted_encodings(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        response = None
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["content-encoding"] = encoding
+                content_type, _ = mimetypes.guess_type(path)
+                content_type = content_type or "application/octet-stream"
+                if content_type.startswith("text/"):
+                    content_type += "; charset=utf-8"
+                response.headers["content-type"] = content_type
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE
+            response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
+class PrerenderedPage:
+    """An HTML page rendered once, served from memory (gzipped when accepted).
+    Browsers revalidate it on every load and get a 304 while it is unchanged."""
+
+    def __init__(self, html):
+        self.body = html.encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        # Weak: the gzipped and plain bodies share it
+        self.etag = f'W/"{hashlib.sha256(self.body).hexdigest()[:20]}"'
+
+    def response(self, request):
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or self.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        body = self.body
+        if "gzip" in accepted_encodings(request.headers.get("accept-encoding", "")):
+            body = self.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, media_type="text/html", headers=headers)
@@ -0,0 +1,198 @@
+"""
+Optional compressed audio encodings for the client relay (16-bit 24 kHz mono input).
+
+    pcm16   raw little-endian PCM (default, 1x)
+    mulaw   G.711 mu-law, one byte per sample (2x)
+    adpcm   IMA-ADPCM, four bits per sample plus a small header per block (~3.2x)
+
+The client asks for an encoding with "audio_encoding" in start_game. Encoders are
+vectorized with NumPy: mu-law is a single lookup in a 64K-entry table, and
+ADPCM splits each frame into independent blocks and runs the (sequential) IMA
+recurrence across all blocks at once. ADPCM cost grows with the block length
+(one NumPy step per sample position) while the header overhead shrinks with it;
+see benchmarks/bench_audio_codec.py for the trade-off. With 32-sample blocks a frame
+costs 0.5-1.5 ms whatever its size, mostly per-step overhead, so the relay encodes
+ADPCM in a worker thread (protocol.send_audio) rather than on the event loop. The
+GIL still serializes that work: one core encodes roughly 1000 frames per second,
+which is a few hundred concurrent ADPCM games at one frame per 80-200 ms.
+
+ADPCM frame payload layout (little-endian):
+
+    u32  total samples in the frame
+    u16  samples per block
+    u16  reserved
+    per block:
+        i16  initial predictor (first sample)
+        u8   initial step index
+        u8   reserved
+        u8[block_samples / 2]  4-bit codes, low nibble first
+
+The last block is padded with its final sample; decoders trim to the sample count.
+"""
+import struct
+
+import numpy as np
+
+ENCODING_PCM16 = "pcm16"
+ENCODING_MULAW = "mulaw"
+ENCODING_ADPCM = "adpcm"
+
+# Codec ids carried in the binary frame header
+CODEC_IDS = {ENCODING_PCM16: 0, ENCODING_MULAW: 1, ENCODING_ADPCM: 2}
+
+ADPCM_BLOCK_SAMPLES = 32
+ADPCM_HEADER = struct.Struct("<IHH")
+
+_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+], dtype=np.int32)
+_INDEX_ADJUST = np.array([-1, -1, -1, -1, 2, 4, 6, 8], dtype=np.int32)
+
+
+def negotiate_encoding(start_msg):
+    """Pick the audio encoding for a game from the client's start_game message."""
+    encoding = start_msg.get("audio_encoding", ENCODING_PCM16)
+    return encoding if encoding in CODEC_IDS else ENCODING_PCM16
+
+
+# --- mu-law -------------------------------------------------------------------
+
+def _build_mulaw_table():
+    x = np.arange(-32768, 32768, dtype=np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    mag = np.minimum(np.abs(x), 32635) + 0x84
+    exponent = np.floor(np.log2(mag)).astype(np.int32) - 7
+    mantissa = (mag >> (exponent + 3)) & 0x0F
+    table = np.empty(65536, dtype=np.uint8)
+    table[x & 0xFFFF] = (~(sign | (exponent << 4) | mantissa)) & 0xFF
+    return table
+
+
+def _build_mulaw_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    sample = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return np.where(u & 0x80, -sample, sample).astype("<i2")
+
+
+_MULAW_ENCODE = _build_mulaw_table()
+_MULAW_DECODE = _build_mulaw_decode_table()
+
+
+def encode_mulaw(pcm):
+    return _MULAW_ENCODE[np.frombuffer(pcm, dtype="<u2")].tobytes()
+
+
+def decode_mulaw(data):
+    return _MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+# --- IMA-ADPCM ----------------------------------------------------------------
+
+def _build_adpcm_tables():
+    # Indexed by step_index * 8 + magnitude code, so each sample step is one gather
+    idx = np.arange(89, dtype=np.int32)[:, None]
+    q = np.arange(8, dtype=np.int32)[None, :]
+    step = _STEPS[idx]
+    vpdiff = (step >> 3) + (q >> 2) * step + ((q >> 1) & 1) * (step >> 1) + (q & 1) * (step >> 2)
+    next_idx = np.clip(idx + _INDEX_ADJUST[q], 0, 88)
+    return vpdiff.reshape(-1).astype(np.int32), (next_idx * 8).reshape(-1).astype(np.int32)
+
+
+_ADPCM_VPDIFF, _ADPCM_NEXT8 = _build_adpcm_tables()
+_STEPS8 = np.repeat(_STEPS, 8)  # step for step_index * 8
+
+
+def encode_adpcm(pcm, block_samples=ADPCM_BLOCK_SAMPLES):
+    x = np.frombuffer(pcm, dtype="<i2")
+    n = len(x)
+    if n == 0:
+        return ADPCM_HEADER.pack(0, block_samples, 0)
+    nblocks = -(-n // block_samples)
+    padded = np.empty(nblocks * block_samples, dtype=np.int32)
+    padded[:n] = x
+    padded[n:] = x[-1]
+    blocks = padded.reshape(nblocks, block_samples)
+    # Sample-major copy so each step reads one contiguous row across all blocks
+    columns = np.ascontiguousarray(blocks.T)
+
+    # Each block starts from its first sample with a step sized to its average slope
+    pred = columns[0].copy()
+    slope = np.abs(np.diff(blocks, axis=1)).mean(axis=1)
+    start_idx = np.clip(np.searchsorted(_STEPS, slope), 0, 88).astype(np.int32)
+    idx8 = start_idx * 8
+
+    # The recurrence is sequential per block, so keep the per-sample loop to as few
+    # small-array NumPy calls as possible; sign bits are merged in after the loop.
+    mags = np.empty((block_samples, nblocks), dtype=np.int32)
+    signs = np.empty((block_samples, nblocks), dtype=np.bool_)
+    for i in range(block_samples):
+        diff = columns[i] - pred
+        neg = diff < 0
+        q = np.minimum((np.abs(diff) << 2) // _STEPS8[idx8], 7)
+        k = idx8 + q
+        vpdiff = _ADPCM_VPDIFF[k]
+        np.negative(vpdiff, out=vpdiff, where=neg)
+        pred += vpdiff
+        # maximum/minimum rather than np.clip: much lower per-call overhead on small arrays
+        np.maximum(pred, -32768, out=pred)
+        np.minimum(pred, 32767, out=pred)
+        idx8 = _ADPCM_NEXT8[k]
+        mags[i] = q
+        signs[i] = neg
+
+    codes = (mags | (signs.astype(np.int32) << 3)).astype(np.uint8).T
+    out = np.empty((nblocks, 4 + block_samples // 2), dtype=np.uint8)
+    out[:, 0:2] = blocks[:, 0].astype("<i2").view(np.uint8).reshape(nblocks, 2)
+    out[:, 2] = start_idx
+    out[:, 3] = 0
+    out[:, 4:] = codes[:, 0::2] | (codes[:, 1::2] << 4)
+    return ADPCM_HEADER.pack(n, block_samples, 0) + out.tobytes()
+
+
+def decode_adpcm(data):
+    n, block_samples, _ = ADPCM_HEADER.unpack_from(data)
+    if n == 0:
+        return b""
+    raw = np.frombuffer(data, dtype=np.uint8, offset=ADPCM_HEADER.size)
+    blocks = raw.reshape(-1, 4 + block_samples // 2)
+    pred = blocks[:, 0:2].copy().view("<i2").reshape(-1).astype(np.int32)
+    idx = blocks[:, 2].astype(np.int32)
+    packed = blocks[:, 4:]
+    codes = np.empty((len(blocks), block_samples), dtype=np.int32)
+    codes[:, 0::2] = packed & 0x0F
+    codes[:, 1::2] = packed >> 4
+
+    out = np.empty((len(blocks), block_samples), dtype=np.int32)
+    for i in range(block_samples):
+        step = _STEPS[idx]
+        code = codes[:, i]
+        q = code & 7
+        vpdiff = (step >> 3) + (q >> 2) * step + ((q >> 1) & 1) * (step >> 1) + (q & 1) * (step >> 2)
+        pred = np.clip(np.where(code & 8, pred - vpdiff, pred + vpdiff), -32768, 32767)
+        idx = np.clip(idx + _INDEX_ADJUST[q], 0, 88)
+        out[:, i] = pred
+    return out.reshape(-1)[:n].astype("<i2").tobytes()
+
+
+ENCODERS = {
+    ENCODING_PCM16: bytes,
+    ENCODING_MULAW: encode_mulaw,
+    ENCODING_ADPCM: encode_adpcm,
+}
+
+DECODERS = {
+    ENCODING_PCM16: bytes,
+    ENCODING_MULAW: decode_mulaw,
+    ENCODING_ADPCM: decode_adpcm,
+}
+
+
+def encode(pcm, encoding):
+    return ENCODERS[encoding](pcm)
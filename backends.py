@@ -0,0 +1,551 @@
+"""
+Upstream live-session backends.
+
+websocket_endpoint only needs something with `connect(model=..., config=...)`
+returning an async context manager around a session that supports
+`send_client_content(turns=..., turn_complete=...)` and `receive()`.
+
+Backends:
+    gemini - the real Gemini Live API (default)
+    fake   - local stand-in that streams scripted PCM and transcriptions,
+             for load testing and development without an API key
+    replay - plays back captured games (see capture.py and replay.py)
+
+Select with ORACLE_BACKEND=gemini|fake|replay. The fake backend's timing is set with
+FAKE_LIVE_CONNECT_MS (handshake), FAKE_LIVE_FIRST_CHUNK_MS, FAKE_LIVE_CHUNK_MS, FAKE_LIVE_CHUNK_BYTES and
+FAKE_LIVE_CHARS_PER_SEC (speech rate used to size each turn's audio). Sessions
+configured with response_modalities=["TEXT"] stream text only, one word per
+FAKE_LIVE_TOKENS_PER_SEC tick.
+
+The fake session also keeps a token count of its context and delays each turn's
+first chunk by FAKE_LIVE_MS_PER_KTOKEN per 1000 context tokens, so long games slow
+down like they do upstream. It honours the config's sliding-window compression and
+session resumption, reports usage_metadata, and sends go_away once a session is
+FAKE_LIVE_GO_AWAY_S old (0: never).
+
+Each fake backend stands for one API key. FAKE_LIVE_MAX_SESSIONS caps its concurrent
+sessions (0: unlimited); a connect over the cap is refused with a 429
+RESOURCE_EXHAUSTED error, like a key out of quota. Keys listed in
+FAKE_LIVE_FAILING_KEYS (comma-separated) refuse every connect, like an unreachable
+upstream. Together with GOOGLE_GEMINI_API_KEYS these exercise the key pool
+(key_pool.py).
+"""
+import asyncio
+import math
+import os
+import random
+import re
+import secrets
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+
+class LiveBackend:
+    """Interface for opening upstream live sessions."""
+
+    name = "base"
+
+    @property
+    def ready(self):
+        """Whether the upstream client is initialized."""
+        return True
+
+    def warm_up(self):
+        """Slow one-time setup ahead of the first game (blocking; call from a thread)."""
+
+    def connect(self, model, config):
+        """Return an async context manager yielding a live session."""
+        raise NotImplementedError
+
+    def bind_handle(self, session, handle):
+        """Note that resumption `handle` belongs to `session`, so a resume can go to the
+        same place (see key_pool.py)."""
+
+
+class GeminiLiveBackend(LiveBackend):
+    """Gemini Live API via google-genai, sharing one client per process."""
+
+    name = "gemini"
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use rather than at import so each worker process builds
+        # its own client (avoids import-time SSL hangs and issues on reload)
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @property
+    def ready(self):
+        return self._client is not None
+
+    def warm_up(self):
+        # Importing google.genai alone takes ~0.5 s
+        return self.client
+
+    def connect(self, model, config):
+        return self.client.aio.live.connect(model=model, config=config)
+
+
+# Minimal stand-ins for the SDK's LiveServerMessage shape; only the attributes
+# websocket_endpoint reads are provided. Used by the fake backend and for
+# replaying cached greetings.
+
+class LiveTranscription:
+    def __init__(self, text):
+        self.text = text
+
+
+class LivePart:
+    def __init__(self, text):
+        self.text = text
+
+
+class LiveModelTurn:
+    def __init__(self, parts):
+        self.parts = parts
+
+
+class LiveServerContent:
+    def __init__(self, output_transcription=None, turn_complete=False, interrupted=False, model_turn=None):
+        self.output_transcription = output_transcription
+        self.model_turn = model_turn
+        self.turn_complete = turn_complete
+        self.interrupted = interrupted
+
+
+class LiveUsageMetadata:
+    def __init__(self, prompt_token_count=None, response_token_count=None):
+        self.prompt_token_count = prompt_token_count
+        self.response_token_count = response_token_count
+
+
+class LiveResumptionUpdate:
+    def __init__(self, new_handle=None, resumable=False):
+        self.new_handle = new_handle
+        self.resumable = resumable
+
+
+class LiveGoAway:
+    def __init__(self, time_left=None):
+        self.time_left = time_left
+
+
+class LiveMessage:
+    def __init__(self, data=None, server_content=None, usage_metadata=None, go_away=None,
+                 session_resumption_update=None):
+        self.data = data
+        self.server_content = server_content
+        self.usage_metadata = usage_metadata
+        self.go_away = go_away
+        self.session_resumption_update = session_resumption_update
+
+
+# --- Fake backend -----------------------------------------------------------
+
+FAKE_SAMPLE_RATE = 24000
+FAKE_CHARS_PER_TOKEN = 4
+FAKE_AUDIO_TOKENS_PER_SEC = 25  # the Live API's rate for audio in the context
+FAKE_MAX_HANDLES = 10000  # resumption handles kept across all sessions
+
+FAKE_SCRIPT = {
+    "greeting": "Greetings, traveler. I am the oracle, and I will read your mind. Are you ready?",
+    "questions": [
+        "Is your character a real person?",
+        "Is your character male?",
+        "Is your character known for music?",
+        "Has your character appeared in a movie?",
+        "Is your character still alive?",
+        "Is your character from Europe?",
+        "Does your character have magical powers?",
+        "Is your character older than fifty?",
+    ],
+    "reaction_positive": "Excellent, just as I foresaw!",
+    "reaction_negative": "Hmph. Not what I expected.",
+    "guess": "I think of... Sherlock Holmes. Am I correct?",
+    "won": "Ha! The oracle is never wrong. Do you want to play again?",
+    "lost": "Impossible... you have bested me. Who was it?",
+    "reveal": "Ah, a fine choice indeed. Do you want to play again?",
+}
+
+
+class FakeLiveError(Exception):
+    """A refused fake connect, with an HTTP status code like the SDK's API errors."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def _fake_pcm(seconds=1.0, freq=220.0):
+    """One second of a quiet, slowly modulated tone as 16-bit LE PCM."""
+    n = int(FAKE_SAMPLE_RATE * seconds)
+    samples = array("h", (
+        int(6000 * math.sin(2 * math.pi * freq * i / FAKE_SAMPLE_RATE)
+            * (0.6 + 0.4 * math.sin(2 * math.pi * 3 * i / FAKE_SAMPLE_RATE)))
+        for i in range(n)
+    ))
+    return samples.tobytes()
+
+
+class StreamedLiveSession:
+    """Base for local sessions: each completed user turn starts one model turn.
+
+    Like the Live API, the session is one stream of messages and `receive()` yields
+    them up to the next turn_complete. A user turn sent while the model is still
+    speaking cuts the current turn short with an `interrupted` message.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._messages = asyncio.Queue()
+        self._speaking = None  # task streaming the current model turn
+        modalities = getattr(config, "response_modalities", None) or ["AUDIO"]
+        self.text_only = [getattr(m, "value", m) for m in modalities] == ["TEXT"]
+
+    async def _start_turn(self, coro):
+        previous = self._speaking
+        if previous is not None and not previous.done():
+            previous.cancel()
+            try:
+                await previous
+            except asyncio.CancelledError:
+                pass
+            self._messages.put_nowait(LiveMessage(server_content=LiveServerContent(interrupted=True)))
+        self._speaking = asyncio.create_task(coro)
+
+    async def receive(self):
+        while True:
+            message = await self._messages.get()
+            yield message
+            if message.server_content and message.server_content.turn_complete:
+                return
+
+    def close(self):
+        if self._speaking is not None:
+            self._speaking.cancel()
+
+
+class FakeLiveSession(StreamedLiveSession):
+    """Scripted live session answering from FAKE_SCRIPT."""
+
+    def __init__(self, backend, config):
+        super().__init__(config)
+        self.backend = backend
+        self.opened = time.monotonic()
+        self._question_index = 0
+
+        # Context: the system instruction plus the token size of each turn, oldest first
+        instruction = getattr(config, "system_instruction", None)
+        self._system_tokens = sum(len(p.text or "") for p in instruction.parts) // FAKE_CHARS_PER_TOKEN \
+            if instruction is not None else 0
+        self._turns = deque()
+        compression = getattr(config, "context_window_compression", None)
+        self._trigger_tokens = compression.trigger_tokens if compression is not None else None
+        self._target_tokens = (compression.sliding_window.target_tokens
+                               if compression is not None and compression.sliding_window else None)
+        resumption = getattr(config, "session_resumption", None)
+        self.resumable = resumption is not None
+        if resumption is not None and resumption.handle:
+            if resumption.handle not in backend.handles:
+                raise ValueError(f"Unknown session resumption handle {resumption.handle!r}")
+            turns, self._question_index = backend.handles[resumption.handle]
+            self._turns.extend(turns)
+
+    @property
+    def context_tokens(self):
+        return self._system_tokens + sum(self._turns)
+
+    def _add_turn(self, tokens):
+        self._turns.append(tokens)
+        if self._trigger_tokens and self.context_tokens > self._trigger_tokens:
+            # Sliding window: drop whole turns from the start, keep the system instruction
+            target = self._target_tokens or self._trigger_tokens // 2
+            while len(self._turns) > 1 and self.context_tokens > target:
+                self._turns.popleft()
+
+    async def send_client_content(self, turns=None, turn_complete=True):
+        turns = turns if isinstance(turns, list) else [turns or {}]
+        for turn in turns:
+            chars = sum(len(p.get("text", "")) for p in turn.get("parts", []))
+            self._add_turn(max(1, chars // FAKE_CHARS_PER_TOKEN))
+        if not turn_complete:
+            return
+        text = " ".join(p.get("text", "") for p in turns[-1].get("parts", [])) if turns else ""
+        await self._start_turn(self._speak(self._reply_for(text)))
+
+    def _reply_for(self, prompt):
+        script = FAKE_SCRIPT
+        if "Start the game" in prompt:
+            return script["greeting"]
+        if "You WON" in prompt:
+            return script["won"]
+        if "You LOST" in prompt:
+            return script["lost"]
+        if "was thinking of" in prompt:
+            return script["reveal"]
+        if "MUST make a guess" in prompt:
+            return script["guess"]
+        question = script["questions"][self._question_index % len(script["questions"])]
+        self._question_index += 1
+        if "answered positively" in prompt:
+            return f"{script['reaction_positive']} {question}"
+        if "answered negatively" in prompt:
+            return f"{script['reaction_negative']} {question}"
+        return question
+
+    async def _speak(self, text):
+        backend = self.backend
+        put = self._messages.put_nowait
+        prompt_tokens = self.context_tokens
+        await asyncio.sleep((backend.first_chunk_ms + prompt_tokens * backend.ms_per_ktoken / 1000) / 1000)
+        if self.text_only:
+            for i, word in enumerate(text.split(" ")):
+                if i:
+                    await asyncio.sleep(1 / backend.tokens_per_sec)
+                put(LiveMessage(server_content=LiveServerContent(
+                    model_turn=LiveModelTurn([LivePart((" " if i else "") + word)])
+                )))
+            self._end_turn(prompt_tokens, max(1, len(text) // FAKE_CHARS_PER_TOKEN))
+            return
+
+        audio_bytes = int(len(text) / backend.chars_per_sec * FAKE_SAMPLE_RATE) * 2
+        n_chunks = max(1, math.ceil(audio_bytes / backend.chunk_bytes))
+        words = text.split(" ")
+        words_per_chunk = max(1, math.ceil(len(words) / n_chunks))
+
+        pcm = backend.pcm
+        offset = random.randrange(0, len(pcm) // 2) * 2
+        for i in range(n_chunks):
+            if i:
+                await asyncio.sleep(backend.chunk_ms / 1000)
+            size = min(backend.chunk_bytes, audio_bytes - i * backend.chunk_bytes)
+            start = (offset + i * backend.chunk_bytes) % (len(pcm) - size)
+            put(LiveMessage(data=pcm[start:start + size]))
+
+            piece = words[i * words_per_chunk:(i + 1) * words_per_chunk]
+            if piece:
+                lead = " " if i else ""
+                put(LiveMessage(server_content=LiveServerContent(
+                    output_transcription=LiveTranscription(lead + " ".join(piece))
+                )))
+
+        self._end_turn(prompt_tokens, max(1, audio_bytes // 2 * FAKE_AUDIO_TOKENS_PER_SEC // FAKE_SAMPLE_RATE))
+
+    def _end_turn(self, prompt_tokens, response_tokens):
+        backend = self.backend
+        put = self._messages.put_nowait
+        self._add_turn(response_tokens)
+        if self.resumable:
+            handle = secrets.token_hex(8)
+            backend.handles[handle] = (list(self._turns), self._question_index)
+            if len(backend.handles) > FAKE_MAX_HANDLES:
+                backend.handles.popitem(last=False)
+            put(LiveMessage(session_resumption_update=LiveResumptionUpdate(handle, resumable=True)))
+        if backend.go_away_s and time.monotonic() - self.opened >= backend.go_away_s:
+            put(LiveMessage(go_away=LiveGoAway(time_left="10s")))
+        put(LiveMessage(
+            server_content=LiveServerContent(turn_complete=True),
+            usage_metadata=LiveUsageMetadata(prompt_tokens, response_tokens),
+        ))
+
+
+class FakeLiveBackend(LiveBackend):
+    """Local stand-in for the Live API with configurable timing."""
+
+    name = "fake"
+
+    def __init__(self, first_chunk_ms=None, chunk_ms=None, chunk_bytes=None, chars_per_sec=None,
+                 connect_ms=None, tokens_per_sec=None, ms_per_ktoken=None, go_away_s=None,
+                 api_key=None, max_sessions=None, failing_keys=None):
+        self.connect_ms = float(connect_ms if connect_ms is not None
+                                else os.getenv("FAKE_LIVE_CONNECT_MS", 0))
+        self.first_chunk_ms = float(first_chunk_ms if first_chunk_ms is not None
+                                    else os.getenv("FAKE_LIVE_FIRST_CHUNK_MS", 300))
+        self.chunk_ms = float(chunk_ms if chunk_ms is not None
+                              else os.getenv("FAKE_LIVE_CHUNK_MS", 40))
+        # Keep chunks sample-aligned (16-bit PCM)
+        self.chunk_bytes = int(chunk_bytes if chunk_bytes is not None
+                               else os.getenv("FAKE_LIVE_CHUNK_BYTES", 3840)) & ~1
+        self.chars_per_sec = float(chars_per_sec if chars_per_sec is not None
+                                   else os.getenv("FAKE_LIVE_CHARS_PER_SEC", 15))
+        self.tokens_per_sec = float(tokens_per_sec if tokens_per_sec is not None
+                                    else os.getenv("FAKE_LIVE_TOKENS_PER_SEC", 50))
+        self.ms_per_ktoken = float(ms_per_ktoken if ms_per_ktoken is not None
+                                   else os.getenv("FAKE_LIVE_MS_PER_KTOKEN", 0))
+        self.go_away_s = float(go_away_s if go_away_s is not None
+                               else os.getenv("FAKE_LIVE_GO_AWAY_S", 0))
+        self.api_key = api_key
+        self.max_sessions = int(max_sessions if max_sessions is not None
+                                else os.getenv("FAKE_LIVE_MAX_SESSIONS", 0))
+        failing_keys = failing_keys if failing_keys is not None else os.getenv("FAKE_LIVE_FAILING_KEYS", "")
+        self.failing = api_key is not None and api_key in [k.strip() for k in failing_keys.split(",")]
+        self.sessions = 0
+        self.pcm = _fake_pcm()
+        # Resumption handle -> (context turns, script position), most recent last
+        self.handles = OrderedDict()
+
+    @asynccontextmanager
+    async def _session(self, config):
+        if self.connect_ms:
+            await asyncio.sleep(self.connect_ms / 1000)
+        if self.failing:
+            raise ConnectionRefusedError(f"Fake upstream refused key {self.api_key!r}")
+        if self.max_sessions and self.sessions >= self.max_sessions:
+            raise FakeLiveError(429, f"RESOURCE_EXHAUSTED: {self.max_sessions} concurrent sessions in use")
+        session = FakeLiveSession(self, config)
+        self.sessions += 1
+        try:
+            yield session
+        finally:
+            self.sessions -= 1
+            session.close()
+
+    def connect(self, model, config):
+        return self._session(config)
+
+
+# --- Replay backend ---------------------------------------------------------
+
+# Player names the replay driver uses: "replay:<capture id>:<game number>"
+REPLAY_PLAYER = re.compile(r"replay:([\w-]+):(\d+)")
+REPLAY_MAX_CURSORS = 10000  # replayed games tracked at once; the least recently used are dropped
+
+
+class ReplayCursor:
+    """Position of one replayed game in its capture; shared by the game's sessions."""
+
+    def __init__(self, capture, key=None):
+        self.capture = capture
+        self.key = key  # the game's player name, if the replay driver started it
+        self.next_turn = 0
+
+
+class ReplayLiveSession(StreamedLiveSession):
+    """Plays back the model turns of a capture, one per completed user turn.
+
+    A session binds to a capture on its first user turn, which names the player
+    (the greeting prompt does).
+    """
+
+    def __init__(self, backend, config):
+        super().__init__(config)
+        self.backend = backend
+        self.cursor = None
+
+    async def send_client_content(self, turns=None, turn_complete=True):
+        turns = turns if isinstance(turns, list) else [turns or {}]
+        if self.cursor is None:
+            text = " ".join(p.get("text", "") for turn in turns for p in turn.get("parts", []))
+            self.cursor = self.backend.cursor_for(text)
+        if not turn_complete:
+            return
+        cursor = self.cursor
+        turn = cursor.capture.turns[cursor.next_turn] if cursor.next_turn < len(cursor.capture.turns) else None
+        cursor.next_turn += 1
+        if cursor.next_turn >= len(cursor.capture.turns):
+            self.backend.forget(cursor)  # played out; this session still holds it
+        await self._start_turn(self._play(turn))
+
+    async def _play(self, turn):
+        put = self._messages.put_nowait
+        if turn is None:
+            # Past the end of the capture: answer with an empty turn rather than hang
+            put(LiveMessage(server_content=LiveServerContent(turn_complete=True)))
+            return
+        speed = self.backend.speed
+        started = time.monotonic()
+        for offset, data, text, turn_complete in turn.messages:
+            if speed > 0:
+                delay = started + offset / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            content = None
+            if text or turn_complete:
+                content = LiveServerContent(turn_complete=turn_complete)
+                if text and self.text_only:
+                    content.model_turn = LiveModelTurn([LivePart(text)])
+                elif text:
+                    content.output_transcription = LiveTranscription(text)
+            # Audio is a slice of the mapped capture file; copy it only now it is sent
+            put(LiveMessage(data=bytes(data) if data is not None else None, server_content=content))
+        if not turn.complete:
+            # Cut short by barge-in in the capture, so the rest was never recorded. End it
+            # here; a barge-in that arrives sooner interrupts it as usual.
+            put(LiveMessage(server_content=LiveServerContent(turn_complete=True)))
+
+
+class ReplayBackend(LiveBackend):
+    """Replays captured games (capture.py) instead of calling the Live API.
+
+    ORACLE_REPLAY_CAPTURES names the capture files or directories (separated by the
+    OS path separator). ORACLE_REPLAY_SPEED scales the recorded timing: 1 plays in
+    real time, 2 twice as fast, and 0 sends every message as soon as it can.
+    """
+
+    name = "replay"
+
+    def __init__(self, paths=None, speed=None):
+        from capture import Capture, capture_paths
+        paths = paths if paths is not None else os.getenv("ORACLE_REPLAY_CAPTURES", "").split(os.pathsep)
+        self.captures = {}
+        for path in capture_paths(p for p in paths if p):
+            capture = Capture.load(path)
+            self.captures[capture.id] = capture
+        if not self.captures:
+            raise ValueError("ORACLE_BACKEND=replay needs capture files in ORACLE_REPLAY_CAPTURES")
+        self.speed = float(speed if speed is not None else os.getenv("ORACLE_REPLAY_SPEED", 1))
+        self._cursors = OrderedDict()  # player name -> ReplayCursor, least recently used first
+
+    def cursor_for(self, prompt):
+        match = REPLAY_PLAYER.search(prompt)
+        if match is None or match.group(1) not in self.captures:
+            # Not started by the replay driver: play the first capture from the start
+            return ReplayCursor(next(iter(self.captures.values())))
+        key = match.group(0)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            cursor = self._cursors[key] = ReplayCursor(self.captures[match.group(1)], key)
+            if len(self._cursors) > REPLAY_MAX_CURSORS:
+                self._cursors.popitem(last=False)
+        else:
+            self._cursors.move_to_end(key)
+        return cursor
+
+    def forget(self, cursor):
+        if cursor.key is not None and self._cursors.get(cursor.key) is cursor:
+            del self._cursors[cursor.key]
+
+    @asynccontextmanager
+    async def _session(self, config):
+        session = ReplayLiveSession(self, config)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def connect(self, model, config):
+        return self._session(config)
+
+
+def create_backend(name=None, api_keys=None):
+    """Build the backend named by ORACLE_BACKEND (default: gemini). The gemini and fake
+    backends get one instance per API key, behind a KeyPool."""
+    name = (name or os.getenv("ORACLE_BACKEND", "gemini")).lower()
+    if name == "fake":
+        backend_for = lambda key: FakeLiveBackend(api_key=key)
+    elif name == "gemini":
+        backend_for = GeminiLiveBackend
+    elif name == "replay":
+        return ReplayBackend()  # answers from the captures; no keys involved
+    else:
+        raise ValueError(f"Unknown ORACLE_BACKEND: {name}")
+    from key_pool import KeyPool
+    return KeyPool(api_keys or [None], backend_for)
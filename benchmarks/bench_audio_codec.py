@@ -0,0 +1,87 @@
+"""
+Per-chunk cost of the compressed audio encodings versus the bandwidth they save.
+
+    python benchmarks/bench_audio_codec.py [--repeat 200]
+
+For each encoding (and ADPCM block size; * marks the default) and chunk size this reports the encoder cost per chunk, the
+compression ratio, bytes saved per chunk, how many KB are saved per ms of server
+CPU, and the round-trip SNR.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_codec  # noqa: E402
+
+SAMPLE_RATE = 24000
+CHUNK_BYTES = (1920, 3840, 9600, 32768)  # 40 ms, 80 ms, 200 ms, merged frame
+
+
+def speech_like_pcm(seconds=5.0, seed=1):
+    """Band-limited noise with a syllable-rate envelope, roughly speech-shaped."""
+    rng = np.random.default_rng(seed)
+    n = int(SAMPLE_RATE * seconds)
+    noise = rng.standard_normal(n)
+    kernel = np.hanning(9)
+    voiced = np.convolve(noise, kernel / kernel.sum(), mode="same")
+    t = np.arange(n) / SAMPLE_RATE
+    pitch = np.sin(2 * np.pi * 140 * t) + 0.5 * np.sin(2 * np.pi * 280 * t)
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    signal = (0.6 * pitch + 2.0 * voiced) * envelope
+    signal = signal / np.abs(signal).max() * 12000
+    return signal.astype("<i2").tobytes()
+
+
+def snr_db(ref, decoded):
+    x = np.frombuffer(ref, dtype="<i2").astype(np.float64)
+    y = np.frombuffer(decoded, dtype="<i2").astype(np.float64)
+    noise = ((x - y) ** 2).sum()
+    return float("inf") if noise == 0 else 10 * np.log10((x ** 2).sum() / noise)
+
+
+def bench(encoder, chunk, repeat):
+    encoder(chunk)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = encoder(chunk)
+    per_chunk = (time.perf_counter() - start) / repeat
+    return per_chunk, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pcm = speech_like_pcm()
+    print(f"{'encoding':<10} {'chunk':>7} {'audio':>7} {'us/chunk':>9} {'ratio':>6} "
+          f"{'saved B':>8} {'KB saved/CPU ms':>16} {'SNR dB':>7}")
+    variants = [
+        (audio_codec.ENCODING_PCM16, audio_codec.ENCODING_PCM16, bytes),
+        (audio_codec.ENCODING_MULAW, audio_codec.ENCODING_MULAW, audio_codec.encode_mulaw),
+    ]
+    for block in (16, 32, 64, 128):
+        label = f"adpcm/{block}" + ("*" if block == audio_codec.ADPCM_BLOCK_SAMPLES else "")
+        variants.append((label, audio_codec.ENCODING_ADPCM,
+                         lambda pcm, block=block: audio_codec.encode_adpcm(pcm, block)))
+
+    for label, encoding, encoder in variants:
+        for size in CHUNK_BYTES:
+            chunk = pcm[:size]
+            per_chunk, encoded = bench(encoder, chunk, args.repeat)
+            saved = len(chunk) - len(encoded)
+            decoded = audio_codec.DECODERS[encoding](encoded)
+            kb_per_ms = (saved / 1024) / (per_chunk * 1000) if saved > 0 else 0.0
+            audio_ms = size / 2 / SAMPLE_RATE * 1000
+            print(f"{label:<10} {size:>7} {audio_ms:>5.0f}ms {per_chunk * 1e6:>9.1f} "
+                  f"{len(chunk) / len(encoded):>6.2f} {saved:>8} {kb_per_ms:>16.1f} "
+                  f"{snr_db(chunk, decoded):>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
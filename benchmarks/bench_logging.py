@@ -0,0 +1,147 @@
+"""
+Per-turn cost of the server log on the thread that runs the games (the event loop).
+
+    python benchmarks/bench_logging.py [--turns 1000] [--rate 0] [--drain-kbps 16]
+
+Logs one turn's worth of output --turns times, back to back or paced at --rate turns
+per second, to two sinks: /dev/null and a pipe read by a thread at --drain-kbps (a
+slow log collector). Paced runs include cache misses after each idle gap, which on
+some machines cost more than the logging itself. For each variant this reports the time a turn spent on the
+calling thread (mean, p99, max), plus the records dropped because the log queue
+was full:
+
+    print banners   the '='*60 banners with answer and prompt that main.py printed per turn
+    logs INFO       the turn's structured records through logs.configure()'s queue
+    logs DEBUG      the same plus prompts and transcripts
+    logs INFO 10%   INFO with ORACLE_LOG_SAMPLE=0.1
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logs  # noqa: E402
+from metrics import LOG_RECORDS_DROPPED  # noqa: E402
+
+ANSWER = "Probably Not"
+PROMPT = ("[Answered 7/20] Probably Not (The user answered negatively. Express disappointment "
+          "briefly, then ask your next question.)")
+TRANSCRIPT = ("Hmm, the spirits grow restless with your answers... Very well. Tell me, "
+              "is your character known for their work in music?")
+
+
+class FakeGame:
+    def __init__(self, number):
+        self.id = f"bench-game-{number:06d}"
+        self.persona_id = "genie"
+        self.question_count = 7
+
+
+def print_turn(out, game):
+    # What a regular turn printed before logs.py
+    print(f"\n{'='*60}", file=out)
+    print(f"[{game.question_count}/20] QUESTION - Regular turn", file=out)
+    print(f"User Answer: {ANSWER}", file=out)
+    print(f"Prompt: {PROMPT}", file=out)
+    print(f"{'='*60}\n", file=out)
+
+
+def log_turn(log):
+    log.info("Answer received", phase="question", answer=ANSWER, speculative=False)
+    log.debug("Prompt", phase="question", prompt=PROMPT)
+    log.info("Turn complete", phase="question", end="complete", elapsed_ms=812, first_audio_ms=304)
+    log.debug("Transcript", phase="question", transcript=TRANSCRIPT)
+
+
+class SlowReader(threading.Thread):
+    """Drains a pipe at a fixed rate, like a log collector that can't keep up."""
+
+    def __init__(self, fd, kbps):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.chunk = 1024
+        self.interval = self.chunk / (kbps * 1024)
+
+    def run(self):
+        while os.read(self.fd, self.chunk):
+            time.sleep(self.interval)
+
+
+def open_sink(kind, drain_kbps):
+    if kind == "devnull":
+        return open(os.devnull, "w"), None
+    read_fd, write_fd = os.pipe()
+    reader = SlowReader(read_fd, drain_kbps)
+    reader.start()
+    return os.fdopen(write_fd, "w", buffering=1), reader
+
+
+def run(variant, sink, args):
+    """Seconds spent on the calling thread per turn."""
+    out, reader = open_sink(sink, args.drain_kbps)
+    level, sample = variant[1], variant[2]
+    if level is not None:
+        logs.configure(level=level, stream=out)
+    games = [FakeGame(i) for i in range(100)]
+    loggers = [logs.game_logger(game, sample=sample) for game in games]
+    dropped_before = sum(LOG_RECORDS_DROPPED._values.values())
+
+    costs = []
+    interval = 1 / args.rate if args.rate > 0 else 0
+    next_turn = time.perf_counter()
+    for i in range(args.turns):
+        t0 = time.perf_counter()
+        if level is None:
+            print_turn(out, games[i % len(games)])
+        else:
+            log_turn(loggers[i % len(loggers)])
+        t1 = time.perf_counter()
+        costs.append(t1 - t0)
+        # Spin rather than sleep until the next turn: a busy event loop stays hot, and
+        # code run right after a sleep is slowed down by cold caches
+        next_turn += interval
+        while time.perf_counter() < next_turn:
+            pass
+
+    dropped = sum(LOG_RECORDS_DROPPED._values.values()) - dropped_before
+    if reader is not None:
+        reader.interval = 0  # measured; let the writer catch up
+    if level is not None:
+        logs.stop()
+        logging.getLogger().handlers = []
+    out.close()
+    return costs, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0, help="turns per second; 0 back to back")
+    parser.add_argument("--drain-kbps", type=float, default=16, help="read rate of the slow pipe")
+    args = parser.parse_args()
+
+    variants = [
+        ("print banners", None, 1.0),
+        ("logs INFO", "INFO", 1.0),
+        ("logs DEBUG", "DEBUG", 1.0),
+        ("logs INFO 10%", "INFO", 0.1),
+    ]
+    pace = f"at {args.rate:g}/s" if args.rate > 0 else "back to back"
+    print(f"{args.turns} turns {pace}; slow pipe drained at {args.drain_kbps:g} KB/s")
+    print(f"{'variant':<16} {'sink':<10} {'mean us':>9} {'p99 us':>9} {'max ms':>8} {'dropped':>8}")
+    for sink in ("devnull", "slow pipe"):
+        for variant in variants:
+            costs, dropped = run(variant, sink, args)
+            costs.sort()
+            p99 = costs[int(len(costs) * 0.99) - 1]
+            print(f"{variant[0]:<16} {sink:<10} {statistics.mean(costs) * 1e6:>9.1f} {p99 * 1e6:>9.1f} "
+                  f"{costs[-1] * 1e3:>8.2f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
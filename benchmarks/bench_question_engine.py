@@ -0,0 +1,92 @@
+"""
+Question engine cost per turn and guessing quality on a synthetic knowledge base.
+
+    python benchmarks/bench_question_engine.py [--characters 100000] [--attributes 1000] [--games 50]
+
+Simulated players answer from the knowledge base's own probabilities (with the
+engine's answer noise). Reported per step: Bayesian update and next-question
+selection time (p50/p99 in µs) split by the size of the posterior being scored,
+and the share of games the engine guessed correctly within the question limit.
+
+Expected accuracy with the default seed: about 16/50 games. Telling 100k
+characters apart takes about 17 bits, and a noisy five-way answer carries well
+under one, so 20 questions are rarely enough. With --questions 40 expect about
+48/50; with --characters 10000, about 29/50. Selection should stay under 1 ms at
+p50 for every posterior size.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_engine import ANSWERS, FALSE_PROFILE, TRUE_PROFILE, KnowledgeBase, QuestionEngine  # noqa: E402
+
+
+def simulated_answer(rng, q):
+    profile = FALSE_PROFILE + (TRUE_PROFILE - FALSE_PROFILE) * q
+    return int(rng.choice(len(ANSWERS), p=profile / profile.sum()))
+
+
+def play(kb, rng, question_limit, timings):
+    secret = int(rng.integers(kb.shape[0]))
+    engine = QuestionEngine(kb, seed=int(rng.integers(1 << 31)))
+    for turn in range(question_limit + 1):
+        t0 = time.perf_counter()
+        move = engine.next_move(must_guess=turn == question_limit)
+        select_s = time.perf_counter() - t0
+        if move.is_guess:
+            if move.index == secret:
+                return True, turn + 1
+            if turn == question_limit:
+                return False, turn + 1
+            engine.reject(move.index)
+            continue
+        timings.append(("select", len(engine.weights), select_s))
+        answer = simulated_answer(rng, kb.by_character[secret, move.index] / 255)
+        t0 = time.perf_counter()
+        engine.update(move.index, answer)
+        timings.append(("update", len(engine.weights), time.perf_counter() - t0))
+    return False, question_limit + 1
+
+
+def report(timings):
+    bands = ((10_000, float("inf"), ">10k"), (1_000, 10_000, "1k-10k"), (0, 1_000, "<1k"))
+    for step in ("update", "select"):
+        for lo, hi, label in bands:
+            values = [t * 1e6 for s, n, t in timings if s == step and lo <= n < hi]
+            if values:
+                print(f"  {step:6s} posterior {label:7s} p50 {np.percentile(values, 50):7.0f} us   "
+                      f"p99 {np.percentile(values, 99):7.0f} us   (n={len(values)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--characters", type=int, default=100_000)
+    parser.add_argument("--attributes", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=20, help="question limit per game")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    kb = KnowledgeBase.synthetic(args.characters, args.attributes, seed=args.seed)
+    print(f"Knowledge base {args.characters} x {args.attributes} built in {time.perf_counter() - t0:.1f}s "
+          f"({kb.by_character.nbytes * 2 / 1e6:.0f} MB)")
+
+    rng = np.random.default_rng(args.seed + 1)
+    timings, wins, turns = [], 0, []
+    for _ in range(args.games):
+        won, n = play(kb, rng, args.questions, timings)
+        wins += won
+        turns.append(n)
+    print(f"Guessed correctly: {wins}/{args.games} games, {np.mean(turns):.1f} turns on average "
+          f"(limit {args.questions} questions)")
+    report(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Micro-benchmarks of the relay hot path, checked against stored baselines.
+
+    python benchmarks/bench_relay.py [--turns 300] [--tolerance 0.3] [--update]
+
+The relay cases run main.play_game in-process, the same code that serves /ws, with
+two stand-ins: a synthetic upstream that streams prebuilt model turns, and a client
+socket that only counts what it is sent and answers every question. A turn is
+--turn-chars of transcript at 15 chars/s of 24 kHz PCM, in --chunk-bytes chunks,
+with a transcription chunk every few audio chunks, as the Live API streams them.
+Each upstream message costs one event-loop iteration, as a socket read would.
+
+    relay          binary audio frames (current clients)
+    relay_json     base64 JSON audio (older clients)
+    relay_adpcm    binary frames in IMA-ADPCM, encoded in a worker thread
+        us_per_chunk             wall time per upstream message, relay and send pump included
+        peak_kb_per_turn         tracemalloc peak above the start of the turn (median)
+        retained_blocks_per_turn memory blocks still allocated after the turns, per turn
+    loop_lag       --games games at once, upstream paced at --pace-ms per message
+        p99_ms                   lateness of a 5 ms timer on the event loop
+    encode_frame, encode_json, parser_feed, answer_prompt
+        us                       one audio frame header, one base64 JSON audio message,
+                                 one transcription chunk through TurnParser, one answer prompt
+
+Every result is compared with benchmarks/baselines.json. A result worse than
+baseline * (1 + --tolerance), plus a small absolute slack per metric, is a
+regression and the exit status is 1. Baselines are machine-specific: record them
+with --update on the machine that runs the check.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+from contextlib import asynccontextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # main mounts static/ and templates/ relative to the working directory
+os.environ.update(ORACLE_BACKEND="fake", ORACLE_HISTORY_DB="", ORACLE_CAPTURE_DIR="", ORACLE_REGISTRY_DB="",
+                  ORACLE_GREETING_CACHE_MAX_MB="0", ORACLE_SPECULATE_ANSWERS="", ORACLE_LOG_LEVEL="WARNING")
+
+import main  # noqa: E402
+from audio_codec import ENCODING_ADPCM, ENCODING_PCM16  # noqa: E402
+from backends import LiveMessage, LiveServerContent, LiveTranscription, LiveUsageMetadata  # noqa: E402
+from game_session import GameSession  # noqa: E402
+from protocol import TRANSPORT_BINARY, TRANSPORT_JSON, encode_audio_frame, encode_audio_json  # noqa: E402
+from relay import ClientSender  # noqa: E402
+from turn_parser import TurnParser  # noqa: E402
+from upstream import Upstream  # noqa: E402
+
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines.json")
+
+TURN_TEXT = ("Hmph. Not what I expected, but the spirits are patient. "
+             "Tell me, is your character known for their work in music?")
+
+# Absolute slack per metric, so noise around small values isn't a regression
+SLACK = {
+    "us_per_chunk": 2.0,
+    "peak_kb_per_turn": 16.0,
+    "retained_blocks_per_turn": 1.0,  # a leak of even one block per turn must fail
+    "p99_ms": 2.0,
+    "us": 0.5,
+}
+
+
+def synthetic_turn(text, chunk_bytes, chars_per_sec=15.0, sample_rate=24000):
+    """The messages of one model turn: PCM chunks interleaved with transcription."""
+    pcm_bytes = int(len(text) / chars_per_sec * sample_rate) * 2
+    chunks = max(1, pcm_bytes // chunk_bytes)
+    words = text.split(" ")
+    every = max(1, chunks // len(words))  # audio chunks per transcription chunk
+    pcm = bytes(chunk_bytes)
+    messages = []
+    for i in range(chunks):
+        messages.append(LiveMessage(data=pcm))
+        if i % every == every - 1 and words:
+            word = words.pop(0)
+            messages.append(LiveMessage(server_content=LiveServerContent(
+                output_transcription=LiveTranscription(word + (" " if words else "")))))
+    if words:
+        messages.append(LiveMessage(server_content=LiveServerContent(
+            output_transcription=LiveTranscription(" ".join(words)))))
+    messages.append(LiveMessage(server_content=LiveServerContent(turn_complete=True),
+                                usage_metadata=LiveUsageMetadata(1200, len(text) // 4)))
+    return messages
+
+
+class SyntheticSession:
+    """Upstream session that answers every prompt with the same prebuilt turn."""
+
+    def __init__(self, turn, pace_s):
+        self.turn = turn
+        self.pace_s = pace_s
+        self._prompts = 0
+        self._prompted = asyncio.Event()
+
+    async def send_client_content(self, turns=None, turn_complete=True):
+        if turn_complete:
+            self._prompts += 1
+            self._prompted.set()
+
+    async def receive(self):
+        while not self._prompts:
+            self._prompted.clear()
+            await self._prompted.wait()
+        self._prompts -= 1
+        for message in self.turn:
+            await asyncio.sleep(self.pace_s)  # 0: one loop iteration, like a socket read
+            yield message
+
+
+class SyntheticPool:
+    def __init__(self, turn, pace_s):
+        self.turn = turn
+        self.pace_s = pace_s
+
+    @asynccontextmanager
+    async def session(self, key, config=None):
+        yield SyntheticSession(self.turn, self.pace_s)
+
+    def bind_handle(self, session, handle):
+        pass
+
+
+class CountingClient:
+    """Client end of the WebSocket: counts what it is sent, answers each turn."""
+
+    def __init__(self, game, turns, on_turn=None):
+        self.game = game
+        self.turns_left = turns
+        self.on_turn = on_turn
+        self.frames = 0
+        self.bytes = 0
+        self.done = asyncio.Event()
+
+    async def send_bytes(self, data):
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def send_json(self, message):
+        self.frames += 1
+        if message.get("type") != "turn_complete":
+            return
+        if self.on_turn is not None:
+            self.on_turn()
+        self.turns_left -= 1
+        if self.turns_left <= 0:
+            self.done.set()
+        elif message.get("awaiting_ready"):
+            self.game.inbox.put_nowait({"type": "answer", "message": "Yes", "question_number": 0})
+        else:
+            self.game.inbox.put_nowait({"type": "answer", "message": "Probably Not",
+                                        "question_number": message["question_count"]})
+
+    async def close(self, code=None):
+        pass
+
+
+async def play(turn, turns, transport=TRANSPORT_BINARY, pace_s=0.0, on_turn=None, encoding=ENCODING_PCM16):
+    """Relay `turns` model turns of one game through main.play_game."""
+    game = GameSession("genie", "Bench Player", 10000)
+    client = CountingClient(game, turns, on_turn)
+    sender = ClientSender(client, transport, encoding).start()
+    game.attach(sender)
+    link = Upstream(SyntheticPool(turn, pace_s), ("genie", main.MODE_VOICE), main.build_resume_config)
+    connecting = asyncio.create_task(main.open_upstream(link))
+    task = asyncio.create_task(main.play_game(game, link, connecting))
+    try:
+        await client.done.wait()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, connecting, return_exceptions=True)
+        await link.close()
+        await sender.close()
+    return client
+
+
+def relay_case(turn, turns, transport, encoding=ENCODING_PCM16):
+    messages = len(turn) * turns
+    asyncio.run(play(turn, 5, transport, encoding=encoding))  # warm up
+    gc.collect()
+    started = time.perf_counter()
+    asyncio.run(play(turn, turns, transport, encoding=encoding))
+    us_per_chunk = (time.perf_counter() - started) / messages * 1e6
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    asyncio.run(play(turn, turns, transport, encoding=encoding))
+    gc.collect()
+    retained = (sys.getallocatedblocks() - blocks) / turns
+
+    peaks = []
+    base = [0]
+
+    def on_turn():
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base[0])
+        tracemalloc.reset_peak()
+        base[0] = current
+
+    tracemalloc.start()
+    try:
+        asyncio.run(play(turn, min(turns, 50), transport, on_turn=on_turn, encoding=encoding))
+    finally:
+        tracemalloc.stop()
+    return {
+        "us_per_chunk": us_per_chunk,
+        "peak_kb_per_turn": statistics.median(peaks[1:] or peaks) / 1024,
+        "retained_blocks_per_turn": max(0.0, retained),
+    }
+
+
+async def lag_case(turn, games, turns, pace_s, interval_s=0.005):
+    lags = []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval_s)
+            lags.append(time.perf_counter() - started - interval_s)
+
+    prober = asyncio.create_task(probe())
+    await asyncio.gather(*(play(turn, turns, pace_s=pace_s) for _ in range(games)))
+    stop.set()
+    await prober
+    lags.sort()
+    return {"p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000}
+
+
+def per_call_us(func, repeat=5):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def component_cases(chunk_bytes):
+    pcm = bytes(chunk_bytes)
+    game = GameSession("genie", "Bench Player", 20)
+    game.question_count = 7
+    words = TURN_TEXT.split(" ")
+
+    def parse_turn():
+        parser = TurnParser()
+        for word in words:
+            parser.feed(word + " ")
+
+    return {
+        "encode_frame": {"us": per_call_us(lambda: encode_audio_frame(pcm, 0, 12, 48000))},
+        "encode_json": {"us": per_call_us(lambda: json.dumps(encode_audio_json(pcm)))},
+        "parser_feed": {"us": per_call_us(parse_turn) / len(words)},
+        "answer_prompt": {"us": per_call_us(lambda: main.answer_prompt(game, "Probably Not"))},
+    }
+
+
+def check(results, baselines, tolerance):
+    """Lines of the report, and whether any result regressed."""
+    lines = []
+    regressed = False
+    for case, values in results.items():
+        for metric, value in values.items():
+            baseline = baselines.get(case, {}).get(metric)
+            if baseline is None:
+                lines.append(f"  {case + '.' + metric:<40} {value:>10.2f}   (no baseline)")
+                continue
+            limit = baseline * (1 + tolerance) + SLACK[metric]
+            status = "ok" if value <= limit else "REGRESSION"
+            regressed |= value > limit
+            lines.append(f"  {case + '.' + metric:<40} {value:>10.2f}   baseline {baseline:>9.2f}"
+                         f"   limit {limit:>9.2f}   {status}")
+    return lines, regressed
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300, help="model turns per relay measurement")
+    parser.add_argument("--chunk-bytes", type=int, default=3840, help="PCM bytes per upstream audio message")
+    parser.add_argument("--turn-chars", type=int, default=len(TURN_TEXT), help="transcript length of a turn")
+    parser.add_argument("--games", type=int, default=20, help="concurrent games in the loop lag case")
+    parser.add_argument("--pace-ms", type=float, default=20, help="upstream message interval in the loop lag case")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown over the baseline")
+    parser.add_argument("--update", action="store_true", help="store these results as the new baselines")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    text = (TURN_TEXT * (args.turn_chars // len(TURN_TEXT) + 1))[:args.turn_chars]
+    turn = synthetic_turn(text, args.chunk_bytes)
+    print(f"{len(turn)} upstream messages per turn ({args.chunk_bytes}-byte audio chunks)")
+    results = {
+        "relay": relay_case(turn, args.turns, TRANSPORT_BINARY),
+        "relay_json": relay_case(turn, args.turns, TRANSPORT_JSON),
+        "relay_adpcm": relay_case(turn, args.turns // 3, TRANSPORT_BINARY, ENCODING_ADPCM),
+        "loop_lag": asyncio.run(lag_case(turn, args.games, 3, args.pace_ms / 1000)),
+        **component_cases(args.chunk_bytes),
+    }
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    lines, regressed = check(results, baselines, args.tolerance)
+    print("\n".join(lines))
+
+    if args.update:
+        with open(BASELINES, "w") as f:
+            json.dump({case: {metric: round(value, 2) for metric, value in values.items()}
+                       for case, values in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {os.path.relpath(BASELINES, ROOT)}")
+    elif regressed:
+        print("Slower than the baselines")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,128 @@
+"""
+Worker cold-start cost: importing main, and booting uvicorn until it is live and ready.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--backend fake]
+
+Each measurement runs in a fresh process. Reported (medians over --repeat runs):
+
+    import main          wall time of `import main` alone
+    /healthz             process start -> first successful /healthz (serving requests)
+    /readyz              process start -> /readyz 200 (upstream client initialized)
+    first GET /          latency of the first page request after boot, then of a repeat
+                         request and of a revalidation (If-None-Match -> 304)
+
+plus the slowest imports (cumulative) from one `python -X importtime` run. The fake
+backend needs no API key; with --backend gemini, /readyz includes creating the real client.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def env_for(backend):
+    return dict(os.environ, ORACLE_BACKEND=backend, ORACLE_HISTORY_DB="")
+
+
+def import_time(backend):
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env_for(backend),
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(backend, top=10):
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                         env=env_for(backend), capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(url, headers=None):
+    """(status, seconds) of one GET."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=5) as r:
+            r.read()
+            status = r.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def wait_for(url, status, started, timeout=60.0):
+    while time.perf_counter() - started < timeout:
+        try:
+            if request(url)[0] == status:
+                return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not return {status} within {timeout}s")
+
+
+def boot(backend):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env_for(backend), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        live = wait_for(f"{base}/healthz", 200, started)
+        ready = wait_for(f"{base}/readyz", 200, started)
+        _, first = request(f"{base}/", {"Accept-Encoding": "gzip"})
+        _, repeat = request(f"{base}/", {"Accept-Encoding": "gzip"})
+        etag = urllib.request.urlopen(f"{base}/").headers["ETag"]
+        status, revalidate = request(f"{base}/", {"If-None-Match": etag})
+        if status != 304:
+            print(f"warning: revalidation returned {status}, expected 304")
+        return live, ready, first, repeat, revalidate
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini"])
+    args = parser.parse_args()
+
+    imports = [import_time(args.backend) for _ in range(args.repeat)]
+    boots = [boot(args.backend) for _ in range(args.repeat)]
+
+    def ms(values):
+        return f"{statistics.median(values) * 1000:8.1f} ms  (min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})"
+
+    print(f"Backend: {args.backend}, {args.repeat} runs each (median)")
+    print(f"  import main       {ms(imports)}")
+    for i, label in enumerate(("/healthz", "/readyz", "first GET /", "repeat GET /", "GET / -> 304")):
+        print(f"  {label:<17} {ms([b[i] for b in boots])}")
+    print("\nSlowest imports (cumulative):")
+    for cumulative, name in slowest_imports(args.backend):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Throughput and latency of serve.py at different worker counts, on the fake backend.
+
+    python benchmarks/bench_workers.py [--workers 1,2,4,8] [--sessions 200] [--concurrency 64]
+                                       [--clients 4] [--resumes 20]
+
+For each worker count this starts `serve.py --workers N`, waits until every worker is
+ready, and plays --sessions games (as in loadtest.py) with --concurrency in flight.
+The games are split over --clients load-generator processes, so the load generator
+doesn't become the bottleneck. The fake upstream answers quickly by default
+(FAKE_LIVE_FIRST_CHUNK_MS=20, FAKE_LIVE_CHUNK_MS=2, overridable in the environment),
+so the workers' CPU is what limits throughput. Reported per worker count:
+
+    games/s             completed games per wall-clock second
+    first audio         start_game -> first audio, p50 and p99
+    answer -> audio     answer -> first audio, p50 and p99
+    CPU ms/game         user+sys CPU of all workers per completed game (Linux only)
+    resumes             games dropped after the greeting and resumed on a new
+                        connection; with N > 1 most reconnects land on another
+                        worker and are routed to the owner
+
+Scaling needs free cores: on a machine with fewer cores than workers, games/s stays
+flat and latency grows with the extra processes.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import websockets  # noqa: E402
+
+import loadtest  # noqa: E402
+from loadtest import percentile, process_cpu_seconds  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def workers_cpu_seconds(pid):
+    seconds = [process_cpu_seconds(child) for child in worker_pids(pid)]
+    return None if not seconds or None in seconds else sum(seconds)
+
+
+def start_server(workers, port):
+    env = dict(os.environ, ORACLE_BACKEND="fake", ORACLE_HISTORY_DB="", ORACLE_CAPTURE_DIR="",
+               ORACLE_GREETING_CACHE_MAX_MB="0", ORACLE_SPECULATE_ANSWERS="", ORACLE_REGISTRY_DB="")
+    env.setdefault("FAKE_LIVE_FIRST_CHUNK_MS", "20")
+    env.setdefault("FAKE_LIVE_CHUNK_MS", "2")
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # /readyz answers from whichever worker accepts; wait until every one has said ready
+    ready = set()
+    deadline = time.monotonic() + 60
+    while len(ready) < workers:
+        if time.monotonic() > deadline or proc.poll() is not None:
+            proc.terminate()
+            raise RuntimeError(f"{workers} workers did not become ready ({len(ready)} did)")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as r:
+                ready.add(json.load(r)["worker"])
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.05)
+    return proc
+
+
+def play(url, sessions, concurrency, questions):
+    """Load-generator process: play `sessions` games, `concurrency` at a time."""
+    args = argparse.Namespace(url=url, persona="genie", questions=questions, think_ms=0,
+                              mode="voice", json_audio=False, encoding="pcm16")
+    stats = loadtest.Stats()
+    remaining = [sessions]
+
+    async def run():
+        await asyncio.gather(*(loadtest.worker(args, stats, remaining) for _ in range(concurrency)))
+
+    asyncio.run(run())
+    return stats.completed, stats.failed, stats.first_output, stats.turn_output, stats.errors
+
+
+async def resume_game(url):
+    """Start a game, drop it after the greeting and resume it on a new connection."""
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "start_game", "persona_id": "genie",
+                                  "player_name": "Resume Tester", "binary_audio": True}))
+        session_id = None
+        async for raw in ws:
+            if isinstance(raw, str):
+                msg = json.loads(raw)
+                session_id = msg.get("session_id", session_id)
+                if msg["type"] == "turn_complete":
+                    break
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "resume_game", "session_id": session_id, "binary_audio": True}))
+        async for raw in ws:
+            if isinstance(raw, str):
+                return json.loads(raw)["type"] == "game_resumed"
+    return False
+
+
+async def resume_games(url, count):
+    results = await asyncio.gather(*(resume_game(url) for _ in range(count)), return_exceptions=True)
+    return sum(1 for ok in results if ok is True)
+
+
+def measure(workers, args):
+    port = free_port()
+    url = f"ws://127.0.0.1:{port}/ws"
+    proc = start_server(workers, port)
+    try:
+        cpu_before = workers_cpu_seconds(proc.pid)
+        shares = [args.sessions // args.clients + (i < args.sessions % args.clients) for i in range(args.clients)]
+        per_client = max(1, args.concurrency // args.clients)
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap(play, [(url, n, per_client, args.questions) for n in shares])
+        elapsed = time.perf_counter() - started
+        cpu_after = workers_cpu_seconds(proc.pid)
+        resumed = asyncio.run(resume_games(url, args.resumes)) if args.resumes else 0
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    completed = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    first = [v for r in results for v in r[2]]
+    turns = [v for r in results for v in r[3]]
+    errors = {}
+    for r in results:
+        for key, n in r[4].items():
+            errors[key] = errors.get(key, 0) + n
+    cpu = (cpu_after - cpu_before) / completed * 1000 if None not in (cpu_before, cpu_after) and completed else None
+    return {
+        "workers": workers, "completed": completed, "failed": failed, "rate": completed / elapsed,
+        "first": (percentile(first, 50), percentile(first, 99)),
+        "turn": (percentile(turns, 50), percentile(turns, 99)),
+        "cpu": cpu, "resumed": resumed, "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--sessions", type=int, default=200, help="games per worker count")
+    parser.add_argument("--concurrency", type=int, default=64, help="games in flight, over all clients")
+    parser.add_argument("--clients", type=int, default=4, help="load-generator processes")
+    parser.add_argument("--questions", type=int, default=3, help="question_count_limit per game")
+    parser.add_argument("--resumes", type=int, default=20, help="games to drop and resume per worker count")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs; {args.sessions} games, {args.concurrency} in flight, "
+          f"{args.clients} client processes")
+    print(f"{'workers':>7} {'games/s':>8} {'first audio p50/p99 ms':>23} {'answer->audio p50/p99 ms':>25} "
+          f"{'CPU ms/game':>11} {'resumes':>8}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        r = measure(workers, args)
+        cpu = f"{r['cpu']:.1f}" if r["cpu"] is not None else "n/a"
+        print(f"{r['workers']:>7} {r['rate']:>8.1f} "
+              f"{r['first'][0] * 1000:>11.0f} / {r['first'][1] * 1000:<9.0f} "
+              f"{r['turn'][0] * 1000:>12.0f} / {r['turn'][1] * 1000:<10.0f} "
+              f"{cpu:>11} {r['resumed']:>3}/{args.resumes:<4}")
+        if r["failed"]:
+            print(f"        {r['failed']} games failed: {r['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Build content-hashed, precompressed static assets into static/dist.
+
+    python build_assets.py
+
+Writes:
+    script.<hash>.js, player-worklet.<hash>.js, style.<hash>.css    plus .gz and .br siblings
+    images/.../<name>-<width>.<hash>.webp  persona faces resized for the cards and the avatar
+    manifest.json                          source path (or "<path>@<width>") -> URL
+
+The server serves static/dist with immutable caching and links the hashed URLs
+(see assets.py), so rerun this after changing anything in static/. The output
+directory is replaced on every build.
+
+WebP images need Pillow (pip install pillow) and .br files need the brotli module.
+Without Pillow the original PNGs are copied under hashed names instead. Without
+brotli only .gz files are written.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+from assets import DIST_DIR, DIST_URL, MANIFEST_NAME, STATIC_DIR
+
+TEXT_ASSETS = ("script.js", "player-worklet.js", "style.css")
+FACES_DIR = "images/characters/faces"
+# Cards show faces at 60 px and the avatar at 200 px; variants cover 2x displays
+FACE_WIDTHS = (120, 400)
+WEBP_QUALITY = 80
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def hashed_name(path, data, ext=None):
+    root, source_ext = os.path.splitext(path)
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f"{root}.{digest}{ext or source_ext}"
+
+
+def write(out_dir, rel_path, data):
+    full_path = os.path.join(out_dir, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def precompress(out_dir, rel_path, data):
+    """Write .gz (and .br) siblings when they are smaller than the file itself."""
+    sizes = {}
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            sizes[suffix] = write(out_dir, rel_path + suffix, compressed)
+    return sizes
+
+
+def resize_webp(source, width):
+    with Image.open(source) as image:
+        image = image.convert("RGBA")
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+        return out.getvalue()
+
+
+def build(static_dir=STATIC_DIR, out_dir=DIST_DIR):
+    shutil.rmtree(out_dir, ignore_errors=True)
+    manifest = {}
+
+    for rel_path in TEXT_ASSETS:
+        with open(os.path.join(static_dir, rel_path), "rb") as f:
+            data = f.read()
+        name = hashed_name(rel_path, data)
+        write(out_dir, name, data)
+        sizes = precompress(out_dir, name, data)
+        manifest[rel_path] = f"{DIST_URL}/{name}"
+        compressed = ", ".join(f"{suffix} {size / 1024:.1f} KB" for suffix, size in sizes.items())
+        print(f"{rel_path}: {len(data) / 1024:.1f} KB -> {name} ({compressed})")
+
+    if Image is None:
+        print("Pillow not installed: copying face PNGs without resizing (pip install pillow for WebP)")
+    faces = sorted(f for f in os.listdir(os.path.join(static_dir, FACES_DIR)) if f.endswith(".png"))
+    for filename in faces:
+        source = os.path.join(static_dir, FACES_DIR, filename)
+        rel_path = f"{FACES_DIR}/{filename}"
+        with open(source, "rb") as f:
+            original = f.read()
+        if Image is None:
+            name = hashed_name(rel_path, original)
+            write(out_dir, name, original)
+            for width in FACE_WIDTHS:
+                manifest[f"{rel_path}@{width}"] = f"{DIST_URL}/{name}"
+            continue
+        sizes = []
+        for width in FACE_WIDTHS:
+            data = resize_webp(source, width)
+            root, _ = os.path.splitext(rel_path)
+            name = hashed_name(f"{root}-{width}.webp", data)
+            write(out_dir, name, data)
+            manifest[f"{rel_path}@{width}"] = f"{DIST_URL}/{name}"
+            sizes.append(f"{width}px {len(data) / 1024:.1f} KB")
+        print(f"{rel_path}: {len(original) / 1024:.1f} KB -> {', '.join(sizes)}")
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(manifest)} entries to {os.path.join(out_dir, MANIFEST_NAME)}")
+    return manifest
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    if brotli is None:
+        print("brotli not installed: writing .gz only (pip install brotli for .br)")
+    build()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
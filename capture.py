@@ -0,0 +1,239 @@
+"""
+Capture files: a game's upstream messages and client messages, recorded for replay.
+
+With ORACLE_CAPTURE_DIR set, each game (or a sample of games) writes
+<dir>/<game id>.ocap as it runs. The file is append-only: a magic header followed by
+records, each a fixed 18-byte header and its payload:
+
+    kind     u8    START (game settings, JSON), UPSTREAM (one relayed upstream message)
+                   or CLIENT (one client message, JSON)
+    flags    u8    UPSTREAM only: TURN_COMPLETE
+    t        f64   seconds since the game started, on arrival
+    data_len u32   audio bytes (UPSTREAM)
+    text_len u32   UTF-8 text: transcript or model text (UPSTREAM), JSON (START, CLIENT)
+
+Records are written through a large buffer, so the event loop only copies bytes
+until the buffer fills. A truncated last record, from a crash, is ignored on read.
+
+Reading memory-maps the file, so the audio of a record is a slice of the map and is
+not copied until it is used. A loaded Capture keeps its file mapped, and replay copies
+a message's audio only as it sends it. Capture.load() splits a file into model turns and the
+client messages between them. Turns are cut at turn_complete, or at a client message
+that arrived mid-turn (barge-in). The replay backend (backends.py) and the replay
+driver (replay.py) build on this.
+
+Configuration (environment):
+    ORACLE_CAPTURE_DIR     directory for capture files; empty disables capturing (default: empty)
+    ORACLE_CAPTURE_SAMPLE  fraction of games captured (default: 1)
+"""
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import time
+
+MAGIC = b"OCAP\x01\n"
+HEADER = struct.Struct("<BBdII")
+
+START = 1
+UPSTREAM = 2
+CLIENT = 3
+
+TURN_COMPLETE = 0x01
+
+CAPTURE_SUFFIX = ".ocap"
+
+
+class CaptureWriter:
+    def __init__(self, path, buffer_bytes=1 << 20):
+        self.path = path
+        self._file = open(path, "ab", buffering=buffer_bytes)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._start = time.monotonic()
+
+    def _write(self, kind, flags=0, data=b"", text=""):
+        encoded = text.encode("utf-8")
+        self._file.write(HEADER.pack(kind, flags, time.monotonic() - self._start, len(data), len(encoded)))
+        if data:
+            self._file.write(data)
+        if encoded:
+            self._file.write(encoded)
+
+    def start(self, info):
+        self._write(START, text=json.dumps(info))
+
+    def upstream(self, response):
+        """Record one upstream message as relayed: audio, text and turn_complete."""
+        content = response.server_content
+        text = ""
+        flags = 0
+        if content is not None:
+            if content.output_transcription and content.output_transcription.text:
+                text += content.output_transcription.text
+            if content.model_turn:
+                text += "".join(part.text for part in content.model_turn.parts if part.text)
+            if content.turn_complete:
+                flags |= TURN_COMPLETE
+        if response.data is None and not text and not flags:
+            return
+        self._write(UPSTREAM, flags, response.data or b"", text)
+
+    def client(self, message):
+        self._write(CLIENT, text=json.dumps(message))
+
+    def close(self):
+        """Flush and close (blocking; call from a thread)."""
+        self._file.close()
+
+
+def open_capture(game_id, directory=None, sample=None):
+    """A CaptureWriter for a new game, or None if capturing is off or the game is not sampled."""
+    directory = os.getenv("ORACLE_CAPTURE_DIR", "") if directory is None else directory
+    sample = float(os.getenv("ORACLE_CAPTURE_SAMPLE", 1) if sample is None else sample)
+    if not directory or random.random() >= sample:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return CaptureWriter(os.path.join(directory, game_id + CAPTURE_SUFFIX))
+    except OSError as e:
+        logging.warning(f"Not capturing game {game_id}: {e}")
+        return None
+
+
+# --- reading -------------------------------------------------------------------
+
+class Record:
+    __slots__ = ("kind", "flags", "t", "data", "text")
+
+    def __init__(self, kind, flags, t, data, text):
+        self.kind = kind
+        self.flags = flags
+        self.t = t
+        self.data = data  # memoryview into the mapped file, valid until the next record is read
+        self.text = text
+
+    @property
+    def turn_complete(self):
+        return bool(self.flags & TURN_COMPLETE)
+
+
+def map_capture(path):
+    """Memory-map a capture file, or return None if it holds no records."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # outlives the file object
+    if mapped[:len(MAGIC)] != MAGIC:
+        mapped.close()
+        raise ValueError(f"{path} is not a capture file")
+    return mapped
+
+
+def _records(view):
+    offset, end = len(MAGIC), len(view)
+    while offset + HEADER.size <= end:
+        kind, flags, t, data_len, text_len = HEADER.unpack_from(view, offset)
+        offset += HEADER.size
+        if offset + data_len + text_len > end:
+            break  # truncated last record
+        data = view[offset:offset + data_len]
+        offset += data_len
+        text = str(view[offset:offset + text_len], "utf-8")
+        offset += text_len
+        yield Record(kind, flags, t, data, text)
+
+
+def read_records(path):
+    """Yield the records of a capture file, memory-mapped."""
+    mapped = map_capture(path)
+    if mapped is None:
+        return
+    with mapped:
+        view = memoryview(mapped)
+        try:
+            for record in _records(view):
+                try:
+                    yield record
+                finally:
+                    record.data.release()
+        finally:
+            view.release()
+
+
+class Turn:
+    """One model turn of a capture: messages with their delay after the turn's prompt."""
+
+    def __init__(self):
+        self.messages = []   # (offset_s, audio memoryview into the mapped file or None, text, turn_complete)
+        self.complete = False
+
+    @property
+    def text(self):
+        return "".join(text for _, _, text, _ in self.messages)
+
+
+class ClientMessage:
+    def __init__(self, message, after_turns, cut, delay):
+        self.message = message
+        self.after_turns = after_turns  # model turns that ended before it was sent
+        self.cut = cut                  # sent mid-turn: the turn after `after_turns` was cut short
+        self.delay = delay              # seconds since the last upstream message
+
+
+class Capture:
+    """A loaded capture. It keeps the file mapped: its turns' audio are slices of the map."""
+
+    def __init__(self, path, info, turns, client_messages, mapped=None):
+        self.path = path
+        self._mapped = mapped
+        self.id = os.path.basename(path)[:-len(CAPTURE_SUFFIX)]
+        self.info = info
+        self.turns = turns
+        self.client_messages = client_messages
+
+    @classmethod
+    def load(cls, path):
+        info, turns, client_messages = {}, [], []
+        current = None
+        prompt_t = last_t = 0.0
+        mapped = map_capture(path)
+        for record in _records(memoryview(mapped)) if mapped is not None else ():
+            if record.kind == START:
+                info = json.loads(record.text)
+                prompt_t = last_t = record.t
+            elif record.kind == CLIENT:
+                cut = current is not None
+                if cut:
+                    turns.append(current)
+                    current = None
+                client_messages.append(ClientMessage(
+                    json.loads(record.text), len(turns) - cut, cut, record.t - last_t))
+                prompt_t = record.t
+            elif record.kind == UPSTREAM:
+                if current is None:
+                    current = Turn()
+                current.messages.append((record.t - prompt_t, record.data if record.data else None,
+                                         record.text, record.turn_complete))
+                last_t = record.t
+                if record.turn_complete:
+                    current.complete = True
+                    turns.append(current)
+                    current = None
+        if current is not None:
+            turns.append(current)
+        return cls(path, info, turns, client_messages, mapped)
+
+
+def capture_paths(paths):
+    """Capture files named by `paths`: files, or directories of .ocap files."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(CAPTURE_SUFFIX))
+        else:
+            found.append(path)
+    return found
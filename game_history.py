@@ -0,0 +1,270 @@
+"""
+Game history: every finished game's turn log, stored in a local SQLite database.
+
+The game loop only appends to an in-memory GameLog. When the game ends the log is
+queued for a background writer thread, which inserts games in batches, one
+transaction per batch. The event loop never waits on disk. The database runs in
+WAL mode, so stats reads don't block the writer.
+
+Aggregates are kept in rollup tables, updated in the same transaction as the
+inserts:
+
+    daily_stats      (day, persona, outcome) -> games, questions, seconds played
+    revealed_counts  character -> times revealed by players who beat the oracle
+    question_counts  question -> times asked
+
+Stats reads therefore touch a few hundred rows however many games are stored.
+
+Configuration (environment):
+    ORACLE_HISTORY_DB        database path; empty disables history (default: game_history.db)
+    ORACLE_HISTORY_BATCH     games per insert transaction at most (default: 200)
+    ORACLE_HISTORY_FLUSH_MS  longest a finished game waits before being written (default: 500)
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import HISTORY_DROPPED, HISTORY_WRITTEN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    persona TEXT NOT NULL,
+    player_name TEXT,
+    question_limit INTEGER,
+    questions INTEGER,
+    outcome TEXT NOT NULL,
+    guess TEXT,
+    revealed TEXT,
+    started_at REAL NOT NULL,
+    duration_s REAL
+);
+CREATE INDEX IF NOT EXISTS games_started_at ON games (started_at);
+CREATE TABLE IF NOT EXISTS turns (
+    game_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    answer TEXT,
+    text TEXT,
+    question_count INTEGER,
+    kind TEXT,
+    first_audio_ms REAL,
+    complete_ms REAL,
+    PRIMARY KEY (game_id, turn)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT NOT NULL,
+    persona TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    questions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (day, persona, outcome)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revealed_counts (
+    character TEXT PRIMARY KEY,
+    games INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS revealed_counts_games ON revealed_counts (games);
+CREATE TABLE IF NOT EXISTS question_counts (
+    question TEXT PRIMARY KEY,
+    asked INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS question_counts_asked ON question_counts (asked);
+"""
+
+OUTCOMES = ("ai_won", "player_won", "declined", "abandoned", "error")
+
+
+def normalize_question(question):
+    """Lowercased, whitespace-collapsed question text, for counting."""
+    return " ".join(question.lower().split())
+
+
+class GameLog:
+    """Turn log of one game, built up in memory by the game loop."""
+
+    def __init__(self, game_id, persona, player_name, question_limit):
+        self.game_id = game_id
+        self.persona = persona
+        self.player_name = player_name
+        self.question_limit = question_limit
+        self.started_at = time.time()
+        self.turns = []
+        self.asked = []  # normalized questions, for question_counts
+        self.questions = 0
+        self.outcome = None
+        self.guess = None
+        self.revealed = None
+        self.duration_s = None
+
+    def turn(self, answer, text, question_count, kind, first_audio_s=None, complete_s=None,
+             question=None, guess=None):
+        """Record one model turn and the player answer that led to it. `question` and
+        `guess` are what the turn parser found in the text."""
+        if kind == "guess" and guess:
+            self.guess = guess
+        elif kind == "question" and question:
+            self.asked.append(normalize_question(question))
+        self.questions = question_count
+        self.turns.append((
+            len(self.turns), answer, text, question_count, kind,
+            first_audio_s * 1000 if first_audio_s is not None else None,
+            complete_s * 1000 if complete_s is not None else None,
+        ))
+
+    def finish(self, outcome="abandoned"):
+        """Close the log; an outcome set earlier in the game takes precedence."""
+        if self.outcome is None:
+            self.outcome = outcome
+        self.duration_s = time.time() - self.started_at
+        return self
+
+
+class GameHistory:
+    def __init__(self, path=None, batch_size=None, flush_ms=None, max_pending=10000):
+        self.path = os.getenv("ORACLE_HISTORY_DB", "game_history.db") if path is None else path
+        self.batch_size = int(batch_size if batch_size is not None
+                              else os.getenv("ORACLE_HISTORY_BATCH", 200))
+        self.flush_s = int(flush_ms if flush_ms is not None
+                           else os.getenv("ORACLE_HISTORY_FLUSH_MS", 500)) / 1000
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+        self._thread = threading.Thread(target=self._run, name="game-history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write out everything queued and stop the writer (blocking; call from a thread)."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def record(self, log):
+        """Queue a finished game for writing. Never blocks; drops the game if the writer is far behind."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(log)
+        except queue.Full:
+            HISTORY_DROPPED.inc()
+            logging.warning(f"Game history writer is behind; dropped game {log.game_id}")
+
+    # --- writer thread ----------------------------------------------------------
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                batch = []
+                deadline = time.monotonic() + self.flush_s
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                stopping = item is None
+                if batch:
+                    try:
+                        self._write(conn, batch)
+                        HISTORY_WRITTEN.inc(len(batch))
+                    except sqlite3.Error as e:
+                        HISTORY_DROPPED.inc(len(batch))
+                        logging.error(f"Game history write failed ({len(batch)} games): {e}")
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        games, turns, daily, revealed, questions = [], [], {}, {}, {}
+        for log in batch:
+            games.append((log.game_id, log.persona, log.player_name, log.question_limit, log.questions,
+                          log.outcome, log.guess, log.revealed, log.started_at, log.duration_s))
+            turns.extend((log.game_id,) + turn for turn in log.turns)
+            for question in log.asked:
+                questions[question] = questions.get(question, 0) + 1
+            day = time.strftime("%Y-%m-%d", time.gmtime(log.started_at))
+            games_n, questions_n, seconds = daily.get((day, log.persona, log.outcome), (0, 0, 0.0))
+            daily[(day, log.persona, log.outcome)] = (games_n + 1, questions_n + log.questions,
+                                                      seconds + (log.duration_s or 0.0))
+            if log.revealed:
+                name = " ".join(log.revealed.split()).title()
+                revealed[name] = revealed.get(name, 0) + 1
+
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", games)
+            conn.executemany("INSERT OR IGNORE INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)", turns)
+            conn.executemany(
+                "INSERT INTO daily_stats VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (day, persona, outcome) DO UPDATE SET "
+                "games = games + excluded.games, questions = questions + excluded.questions, "
+                "seconds = seconds + excluded.seconds",
+                [key + value for key, value in daily.items()])
+            conn.executemany(
+                "INSERT INTO revealed_counts VALUES (?, ?) ON CONFLICT (character) DO UPDATE SET "
+                "games = games + excluded.games", list(revealed.items()))
+            conn.executemany(
+                "INSERT INTO question_counts VALUES (?, ?) ON CONFLICT (question) DO UPDATE SET "
+                "asked = asked + excluded.asked", list(questions.items()))
+
+    # --- reads (blocking; call from a thread) ------------------------------------
+
+    def stats(self, days=None, top=10):
+        """Per-persona outcome counts and averages, plus the most revealed characters
+        and most asked questions. `days` limits the per-persona figures to recent days."""
+        conn = self._connect()
+        try:
+            since = (time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+                     if days else "")
+            rows = conn.execute(
+                "SELECT persona, outcome, SUM(games), SUM(questions), SUM(seconds) FROM daily_stats "
+                "WHERE day >= ? GROUP BY persona, outcome", (since,)).fetchall()
+            personas = {}
+            for persona, outcome, games, questions, seconds in rows:
+                entry = personas.setdefault(persona, {"games": 0, "questions": 0, "seconds": 0.0,
+                                                      "outcomes": dict.fromkeys(OUTCOMES, 0)})
+                entry["games"] += games
+                entry["questions"] += questions
+                entry["seconds"] += seconds
+                entry["outcomes"][outcome] = games
+            for entry in personas.values():
+                decided = entry["outcomes"]["ai_won"] + entry["outcomes"]["player_won"]
+                entry["ai_win_rate"] = round(entry["outcomes"]["ai_won"] / decided, 4) if decided else None
+                entry["avg_questions"] = round(entry.pop("questions") / entry["games"], 2)
+                entry["avg_duration_s"] = round(entry.pop("seconds") / entry["games"], 1)
+            revealed = conn.execute(
+                "SELECT character, games FROM revealed_counts ORDER BY games DESC LIMIT ?", (top,)).fetchall()
+            questions = conn.execute(
+                "SELECT question, asked FROM question_counts ORDER BY asked DESC LIMIT ?", (top,)).fetchall()
+            return {
+                "days": days,
+                "games": sum(entry["games"] for entry in personas.values()),
+                "personas": personas,
+                "top_revealed": [{"character": c, "games": n} for c, n in revealed],
+                "top_questions": [{"question": q, "asked": n} for q, n in questions],
+            }
+        finally:
+            conn.close()
@@ -0,0 +1,230 @@
+"""
+Game sessions that outlive a single WebSocket connection.
+
+Each game gets a GameSession holding its state and a random session id, sent to
+the client in game_started. The game runs in its own task against the upstream
+live session; WebSocket connections only attach to it. When a client drops, the
+game is kept for a grace period: whatever it sends meanwhile (the rest of the
+current turn, turn_complete, ...) is buffered and replayed once the client
+reconnects with {"type": "resume_game", "session_id": ...}. If nobody re-attaches
+in time the game task is cancelled, which closes its upstream session.
+
+Configuration (environment):
+    ORACLE_RESUME_GRACE_S       seconds a detached game is kept (0 disables resuming)
+    ORACLE_RESUME_BUFFER_BYTES  audio buffered for a detached game (default: ~20 s of PCM)
+"""
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+
+from relay import END_OF_TURN, SlowClientError
+from game_history import GameLog
+from game_summary import GameSummary
+from logs import game_logger
+from metrics import AUDIO_DROPPED_BYTES, RESUMES
+
+
+class GameSession:
+    def __init__(self, persona_id, player_name, question_limit, buffer_bytes=None, mode="voice"):
+        self.id = secrets.token_urlsafe(16)
+        self.persona_id = persona_id
+        self.player_name = player_name
+        self.question_limit = question_limit
+        self.mode = mode  # "voice" or "text"
+
+        self.question_count = 0
+        self.player_won = False
+        self.is_final_guess = False
+        self.awaiting_play_again = False
+        self.awaiting_ready = True
+        self.engine = None       # QuestionEngine when a knowledge base is configured
+        self.engine_move = None  # the engine's question or guess awaiting an answer
+        self.log = GameLog(self.id, persona_id, player_name, question_limit)
+        self.logger = game_logger(self)  # structured server log (logs.py)
+        self.summary = GameSummary(player_name, question_limit)  # reseeds a trimmed upstream context
+        self.capture = None      # CaptureWriter when the game is being recorded
+        self.speculation = None  # Speculation on the answer to the question just asked
+
+        self.inbox = asyncio.Queue()  # client messages, in arrival order
+        self.sender = None            # ClientSender of the attached client, if any
+        self.task = None
+        self.detached_at = None
+        self.buffer_bytes = int(buffer_bytes if buffer_bytes is not None
+                                else os.getenv("ORACLE_RESUME_BUFFER_BYTES", 24000 * 2 * 20))
+        self._backlog = deque()       # PCM bytes / JSON dicts / END_OF_TURN sent while detached
+        self._backlog_audio = 0
+        self._expiry = None
+
+    def state(self):
+        """Game state a resuming client needs to redraw its controls."""
+        return {
+            "mode": self.mode,
+            "question_count": self.question_count,
+            "question_limit": self.question_limit,
+            "player_won": self.player_won,
+            "is_final_guess": self.is_final_guess,
+            "awaiting_play_again": self.awaiting_play_again,
+            "awaiting_ready": self.awaiting_ready,
+        }
+
+    # --- outgoing messages --------------------------------------------------
+
+    def send_audio(self, pcm):
+        if self.sender is not None:
+            try:
+                self.sender.send_audio(pcm)
+                return
+            except SlowClientError:
+                raise
+            except Exception as e:
+                self._lost(e)
+        self._backlog.append(bytes(pcm))
+        self._backlog_audio += len(pcm)
+        if self._backlog_audio > self.buffer_bytes:
+            self._trim_backlog()
+
+    def end_audio_turn(self):
+        """Mark the end of the model turn's audio (an end-of-turn frame for clients
+        that sequence their audio)."""
+        if self.sender is not None:
+            try:
+                self.sender.end_turn()
+                return
+            except Exception as e:
+                self._lost(e)
+        self._backlog.append(END_OF_TURN)
+
+    def send_json(self, message):
+        if self.sender is not None:
+            try:
+                self.sender.send_json(message)
+                return
+            except Exception as e:
+                self._lost(e)
+        self._backlog.append(message)
+
+    def drop_audio(self):
+        """Discard audio not yet delivered to the client, queued or buffered."""
+        dropped = self.sender.drop_audio() if self.sender is not None else 0
+        if self._backlog_audio:
+            dropped += self._backlog_audio
+            self._backlog = deque(item for item in self._backlog if not isinstance(item, bytes))
+            self._backlog_audio = 0
+        return dropped
+
+    def _lost(self, error):
+        # The socket died before the handler noticed; buffer from here on
+        self.logger.info(f"Client send failed ({error}), buffering", phase="connection")
+        self.detach(self.sender)
+
+    def _trim_backlog(self):
+        # Drop the oldest buffered audio; control and text messages are kept
+        kept = deque()
+        while self._backlog and self._backlog_audio > self.buffer_bytes:
+            item = self._backlog.popleft()
+            if isinstance(item, bytes):
+                self._backlog_audio -= len(item)
+                AUDIO_DROPPED_BYTES.inc(len(item))
+            else:
+                kept.append(item)
+        kept.extend(self._backlog)
+        self._backlog = kept
+
+    # --- attaching clients --------------------------------------------------
+
+    def attach(self, sender):
+        """Route output to a client, replaying anything buffered while detached."""
+        if self.sender is not None:
+            self.detach(self.sender)
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        self.sender = sender
+        self.detached_at = None
+        backlog, self._backlog, self._backlog_audio = self._backlog, deque(), 0
+        for item in backlog:
+            if isinstance(item, bytes):
+                self.send_audio(item)
+            elif item is END_OF_TURN:
+                self.end_audio_turn()
+            else:
+                self.send_json(item)
+
+    def detach(self, sender):
+        """Stop sending to `sender`; its unsent messages go back into the backlog."""
+        if sender is None or self.sender is not sender:
+            return False
+        self.sender = None
+        self.detached_at = time.monotonic()
+        pending = sender.take_pending()
+        if pending:
+            # Unsent messages are older than anything buffered since
+            self._backlog.extendleft(reversed(pending))
+            self._backlog_audio += sum(len(item) for item in pending if isinstance(item, bytes))
+            if self._backlog_audio > self.buffer_bytes:
+                self._trim_backlog()
+        return True
+
+
+class GameRegistry:
+    """Games by session id, with a grace period for detached ones."""
+
+    def __init__(self, grace_s=None):
+        self.grace_s = float(grace_s if grace_s is not None
+                             else os.getenv("ORACLE_RESUME_GRACE_S", 30))
+        self._games = {}
+
+    @property
+    def enabled(self):
+        return self.grace_s > 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def detached_count(self):
+        return sum(1 for game in self._games.values() if game.sender is None)
+
+    def start(self, game, coro):
+        """Register a game and run it in its own task until it ends or expires."""
+        self._games[game.id] = game
+        game.task = asyncio.create_task(coro)
+        game.task.add_done_callback(lambda _: self._forget(game))
+        return game.task
+
+    def get(self, session_id):
+        game = self._games.get(session_id)
+        if game is None or game.task is None or game.task.done():
+            return None
+        return game
+
+    def release(self, game, sender):
+        """A client left. Keep the game for the grace period, or end it now."""
+        game.detach(sender)
+        if game.sender is not None or game.task.done() or game._expiry is not None:
+            return
+        if not self.enabled:
+            game.task.cancel()
+            return
+        game._expiry = asyncio.get_running_loop().call_later(self.grace_s, self._expire, game)
+
+    def _expire(self, game):
+        game._expiry = None
+        if game.sender is None and not game.task.done():
+            game.logger.info(f"Expired after {self.grace_s:.0f}s without a client", phase="connection")
+            RESUMES.inc(result="expired")
+            game.task.cancel()
+
+    def _forget(self, game):
+        if game._expiry is not None:
+            game._expiry.cancel()
+            game._expiry = None
+        self._games.pop(game.id, None)
+
+    async def close_all(self):
+        """Cancel every game and wait for them to wind down (server shutdown)."""
+        tasks = [game.task for game in self._games.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,74 @@
+"""
+Compact summary of what a game has established, for reseeding the upstream context.
+
+The Live session drops its oldest turns once the context window is compressed, and a
+replacement session (see upstream.py) starts with no turns at all. Either way the
+model would lose the opening instructions and the early answers. The game keeps the
+facts learned so far in a few hundred characters and sends them along with the next
+prompt:
+
+    summary = GameSummary("Ada", 20)
+    summary.asked("Is your character a real person?")
+    summary.answered("Yes")
+    summary.render(question_count=1)
+    # [Game so far: you are playing with Ada and have asked 1 of at most 20 questions.
+    #  Known: real person: yes. ...]
+"""
+import re
+
+# "Is your character a ...", "Does the person ..." -> the rest of the question
+_LEAD = re.compile(
+    r"^(?:is|are|was|were|does|do|did|has|have|had|can|could|would|will)\s+"
+    r"(?:your|the|this)\s+(?:character|person)\s+(?:(?:a|an|the)\s+)?",
+    re.IGNORECASE,
+)
+_MAX_FACT = 60
+
+
+def fact_for(question):
+    """Short label for a yes/no question: "Is your character a real person?" -> "real person"."""
+    fact = _LEAD.sub("", " ".join(question.split())).rstrip("?!. ").lower()
+    if len(fact) > _MAX_FACT:
+        fact = fact[:_MAX_FACT].rsplit(" ", 1)[0] + "..."
+    return fact
+
+
+class GameSummary:
+    def __init__(self, player_name, question_limit):
+        self.player_name = player_name
+        self.question_limit = question_limit
+        self.facts = {}          # fact -> latest answer, in the order first asked
+        self.wrong_guesses = []
+        self._pending = None     # ("question", fact) or ("guess", name) awaiting an answer
+
+    def asked(self, question):
+        self._pending = ("question", fact_for(question))
+
+    def guessed(self, name):
+        self._pending = ("guess", name)
+
+    def answered(self, answer):
+        """Record the player's answer to the question or guess awaiting one."""
+        if self._pending is None:
+            return
+        kind, subject = self._pending
+        self._pending = None
+        answer = " ".join(answer.lower().split())
+        if kind == "question":
+            self.facts.pop(subject, None)  # a repeated question moves to the end
+            self.facts[subject] = answer
+        elif answer != "yes" and subject not in self.wrong_guesses:
+            self.wrong_guesses.append(subject)
+
+    def render(self, question_count):
+        lines = [
+            f"[Game so far: you are playing with {self.player_name} and have asked "
+            f"{question_count} of at most {self.question_limit} questions."
+        ]
+        if self.facts:
+            lines.append("Known: " + "; ".join(f"{fact}: {answer}" for fact, answer in self.facts.items()) + ".")
+        if self.wrong_guesses:
+            lines.append("Wrong guesses: " + ", ".join(self.wrong_guesses) + ".")
+        lines.append("Earlier turns may be missing from your context; rely on this summary "
+                     "and don't repeat its questions.]")
+        return " ".join(lines)
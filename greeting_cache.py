@@ -0,0 +1,173 @@
+"""
+On-disk, size-bounded LRU cache of persona greetings (PCM audio + transcript).
+
+The opening turn is nearly identical for every game of a persona, so the first
+generated greeting is stored and later games replay it immediately while the
+live session is still connecting.
+
+Entries are keyed by persona, or by persona and player name when
+ORACLE_GREETING_CACHE_BY_NAME=1. Each entry is two files in the cache directory:
+<hash>.pcm (16-bit 24 kHz mono) and <hash>.json (transcript and metadata). File
+mtimes record recency, so the LRU order survives restarts.
+
+Configuration (environment):
+    ORACLE_GREETING_CACHE_DIR      cache directory (default: greeting_cache)
+    ORACLE_GREETING_CACHE_MAX_MB   total size bound; 0 disables the cache (default: 50)
+    ORACLE_GREETING_CACHE_BY_NAME  key greetings by player name too (default: 0)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from backends import LiveMessage, LiveServerContent, LiveTranscription
+
+
+class CachedGreeting:
+    def __init__(self, pcm, transcript):
+        self.pcm = pcm
+        self.transcript = transcript
+
+    async def replay(self, chunk_bytes=9600):
+        """Yield the greeting as live-session messages, ending with turn_complete."""
+        yield LiveMessage(server_content=LiveServerContent(
+            output_transcription=LiveTranscription(self.transcript)
+        ))
+        for i in range(0, len(self.pcm), chunk_bytes):
+            yield LiveMessage(data=self.pcm[i:i + chunk_bytes])
+        yield LiveMessage(server_content=LiveServerContent(turn_complete=True))
+
+
+class GreetingCache:
+    def __init__(self, directory=None, max_bytes=None, by_name=None):
+        self.directory = directory or os.getenv("ORACLE_GREETING_CACHE_DIR", "greeting_cache")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("ORACLE_GREETING_CACHE_MAX_MB", 50)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        if by_name is None:
+            by_name = os.getenv("ORACLE_GREETING_CACHE_BY_NAME", "0") == "1"
+        self.by_name = by_name
+        # digest -> entry size in bytes, least recently used first
+        self._index = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        # get/put run in worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, persona_id, player_name=None):
+        raw = f"{persona_id}\n{player_name}" if self.by_name else persona_id
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, digest):
+        base = os.path.join(self.directory, digest)
+        return base + ".pcm", base + ".json"
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files on disk (oldest mtime first)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pcm"):
+                continue
+            digest = name[:-4]
+            pcm_path, meta_path = self._paths(digest)
+            try:
+                st = os.stat(pcm_path)
+                size = st.st_size + os.path.getsize(meta_path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, digest, size))
+        for _, digest, size in sorted(entries):
+            self._index[digest] = size
+            self._total += size
+
+    def _read(self, digest):
+        pcm_path, meta_path = self._paths(digest)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(pcm_path, "rb") as f:
+            pcm = f.read()
+        now = time.time()
+        os.utime(pcm_path, (now, now))
+        return CachedGreeting(pcm, meta["transcript"])
+
+    def _write(self, digest, pcm, transcript, label):
+        os.makedirs(self.directory, exist_ok=True)
+        pcm_path, meta_path = self._paths(digest)
+        meta = json.dumps({"key": label, "transcript": transcript, "created": time.time()})
+        # Write to temp files and rename so readers never see partial entries
+        for path, data, mode in ((meta_path, meta, "w"), (pcm_path, pcm, "wb")):
+            tmp = path + ".tmp"
+            with open(tmp, mode, **({"encoding": "utf-8"} if mode == "w" else {})) as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return len(pcm) + len(meta.encode("utf-8"))
+
+    def _remove(self, digest):
+        for path in self._paths(digest):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _get_sync(self, digest):
+        with self._lock:
+            return self._get_locked(digest)
+
+    def _get_locked(self, digest):
+        self._load_index()
+        if digest not in self._index:
+            return None
+        try:
+            greeting = self._read(digest)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Dropping unreadable greeting cache entry {digest}: {e}")
+            self._total -= self._index.pop(digest)
+            self._remove(digest)
+            return None
+        self._index.move_to_end(digest)
+        return greeting
+
+    def _put_sync(self, digest, pcm, transcript, label):
+        with self._lock:
+            self._put_locked(digest, pcm, transcript, label)
+
+    def _put_locked(self, digest, pcm, transcript, label):
+        self._load_index()
+        size = self._write(digest, pcm, transcript, label)
+        self._total -= self._index.pop(digest, 0)
+        self._index[digest] = size
+        self._total += size
+        while self._total > self.max_bytes and len(self._index) > 1:
+            old, old_size = self._index.popitem(last=False)
+            self._total -= old_size
+            self._remove(old)
+
+    async def get(self, persona_id, player_name=None):
+        """Return the cached greeting for a persona (and name), or None."""
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._get_sync, self.key(persona_id, player_name))
+
+    async def put(self, persona_id, player_name, pcm, transcript):
+        """Store a freshly generated greeting, evicting least recently used entries."""
+        if not self.enabled or not pcm or not transcript:
+            return
+        label = f"{persona_id}/{player_name}" if self.by_name else persona_id
+        try:
+            await asyncio.to_thread(self._put_sync, self.key(persona_id, player_name),
+                                    pcm, transcript, label)
+        except OSError as e:
+            logging.warning(f"Could not store greeting for {label}: {e}")
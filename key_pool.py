@@ -0,0 +1,197 @@
+"""
+Pool of upstream API keys, each with its own limit on concurrent live sessions.
+
+Every live session (a game's, a pooled one, a speculative one) is opened on the
+usable key with the lowest utilization, so load spreads across the keys' quotas. A
+key is usable while it is under its session limit and not cooling down. When a
+connect is refused for quota (429 / RESOURCE_EXHAUSTED), authentication, or a
+connection error, the key is taken out of rotation and the connect is retried on
+the next key. The cooldown doubles with each consecutive failure of the same key,
+up to ORACLE_KEY_MAX_COOLDOWN_S, and resets after a successful connect. When no key
+is usable, the connect fails with KeysExhaustedError.
+
+Only connect failures are held against a key. A session that fails later takes its
+game down as before.
+
+A resumed session goes back to the key its handle came from (see Upstream.observe).
+If that resume is refused for any reason other than quota, the key is not held
+responsible, and the game falls back to a fresh session.
+
+Keys are read from key.txt (or the environment). GOOGLE_GEMINI_API_KEYS takes
+comma-separated keys, each optionally followed by its own session limit:
+
+    GOOGLE_GEMINI_API_KEYS=key-a,key-b:20,key-c:5
+
+Without it, the single GOOGLE_GEMINI_API_KEY is used. Keys are reported as key0,
+key1, ... in config order and never logged.
+
+Configuration (environment):
+    ORACLE_KEY_MAX_SESSIONS    concurrent sessions per key without a limit of its own; 0 = unlimited (default: 0)
+    ORACLE_KEY_COOLDOWN_S      time a key is out of rotation after its first failure (default: 5)
+    ORACLE_KEY_MAX_COOLDOWN_S  longest cooldown for a key that keeps failing (default: 300)
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from websockets.exceptions import WebSocketException
+
+from backends import LiveBackend
+from metrics import UPSTREAM_KEY_FAILURES, UPSTREAM_KEYS_EXHAUSTED
+
+MAX_HANDLES = 10000  # resumption handles remembered across all sessions
+
+QUOTA = "quota"
+AUTH = "auth"
+CONNECTION = "connection"
+
+
+class KeysExhaustedError(Exception):
+    """Every API key is at its session limit or cooling down; try again later."""
+
+
+def load_keys():
+    """(key, session limit or None) pairs from GOOGLE_GEMINI_API_KEYS, else GOOGLE_GEMINI_API_KEY."""
+    keys = []
+    for entry in os.getenv("GOOGLE_GEMINI_API_KEYS", "").split(","):
+        key, _, limit = entry.strip().partition(":")
+        if key:
+            keys.append((key, int(limit) if limit else None))
+    if not keys and os.getenv("GOOGLE_GEMINI_API_KEY"):
+        keys.append((os.getenv("GOOGLE_GEMINI_API_KEY"), None))
+    return keys
+
+
+def failure_reason(error):
+    """Why a connect failure counts against its key (QUOTA, AUTH, CONNECTION), or None."""
+    code = getattr(error, "code", None)
+    text = str(error).upper()
+    if code == 429 or "RESOURCE_EXHAUSTED" in text or "QUOTA" in text:
+        return QUOTA
+    if code in (401, 403) or "API KEY NOT VALID" in text or "PERMISSION_DENIED" in text:
+        return AUTH
+    if isinstance(error, (OSError, WebSocketException)):
+        return CONNECTION  # includes timeouts
+    return None
+
+
+class ApiKey:
+    """One API key's backend, load and health."""
+
+    def __init__(self, name, backend, max_sessions):
+        self.name = name
+        self.backend = backend
+        self.max_sessions = max_sessions  # 0 = unlimited
+        self.active = 0             # sessions open or connecting
+        self.failures = 0           # consecutive connect failures
+        self.cooling_until = 0.0
+
+    @property
+    def utilization(self):
+        return self.active / self.max_sessions if self.max_sessions else 0.0
+
+    def usable(self, now):
+        return now >= self.cooling_until and (not self.max_sessions or self.active < self.max_sessions)
+
+
+class KeyPool(LiveBackend):
+    """A LiveBackend that spreads sessions over one backend per API key."""
+
+    def __init__(self, keys, backend_for, max_sessions=None, cooldown_s=None, max_cooldown_s=None):
+        default_max = int(max_sessions if max_sessions is not None
+                          else os.getenv("ORACLE_KEY_MAX_SESSIONS", 0))
+        self.cooldown_s = float(cooldown_s if cooldown_s is not None
+                                else os.getenv("ORACLE_KEY_COOLDOWN_S", 5))
+        self.max_cooldown_s = float(max_cooldown_s if max_cooldown_s is not None
+                                    else os.getenv("ORACLE_KEY_MAX_COOLDOWN_S", 300))
+        self.keys = []
+        for i, entry in enumerate(keys):
+            key, limit = entry if isinstance(entry, tuple) else (entry, None)
+            self.keys.append(ApiKey(f"key{i}", backend_for(key), default_max if limit is None else limit))
+        if not self.keys:
+            raise ValueError("KeyPool needs at least one key")
+        self.name = self.keys[0].backend.name
+        self._session_keys = {}         # id(session) -> ApiKey, while the session is open
+        self._handles = OrderedDict()   # resumption handle -> ApiKey of its session
+
+    @property
+    def ready(self):
+        return all(key.backend.ready for key in self.keys)
+
+    def warm_up(self):
+        for key in self.keys:
+            key.backend.warm_up()
+
+    def connect(self, model, config):
+        return self._session(model, config)
+
+    def bind_handle(self, session, handle):
+        key = self._session_keys.get(id(session))
+        if key is not None:
+            self._handles[handle] = key
+            if len(self._handles) > MAX_HANDLES:
+                self._handles.popitem(last=False)
+
+    def _pick(self, tried, prefer=None):
+        now = time.monotonic()
+        if prefer is not None and prefer not in tried and prefer.usable(now):
+            return prefer
+        best = None
+        for key in self.keys:
+            if key in tried or not key.usable(now):
+                continue
+            if best is None or (key.utilization, key.active) < (best.utilization, best.active):
+                best = key
+        return best
+
+    def _cool_down(self, key, reason, error):
+        key.failures += 1
+        cooldown = min(self.cooldown_s * 2 ** min(key.failures - 1, 16), self.max_cooldown_s)
+        key.cooling_until = time.monotonic() + cooldown
+        UPSTREAM_KEY_FAILURES.inc(key=key.name, reason=reason)
+        logging.warning(f"Upstream {key.name} refused a connect ({reason}: {error}); "
+                        f"out of rotation for {cooldown:.0f}s")
+
+    @asynccontextmanager
+    async def _session(self, model, config):
+        resumption = getattr(config, "session_resumption", None)
+        handle = resumption.handle if resumption is not None else None
+        tried = set()
+        while True:
+            key = self._pick(tried, self._handles.get(handle) if handle else None)
+            if key is None:
+                UPSTREAM_KEYS_EXHAUSTED.inc()
+                raise KeysExhaustedError(f"All {len(self.keys)} API keys are at their session limit "
+                                         f"or cooling down ({len(tried)} tried)")
+            tried.add(key)
+            key.active += 1  # held while connecting, so concurrent connects spread out
+            stack = AsyncExitStack()
+            try:
+                session = await stack.enter_async_context(key.backend.connect(model=model, config=config))
+                break
+            except BaseException as e:
+                key.active -= 1
+                reason = failure_reason(e) if isinstance(e, Exception) else None
+                # A refused resume is usually the handle's fault, not the key's
+                if reason is None or (handle and reason != QUOTA):
+                    raise
+                self._cool_down(key, reason, e)
+
+        key.failures = 0
+        self._session_keys[id(session)] = key
+        try:
+            async with stack:
+                yield session
+        finally:
+            del self._session_keys[id(session)]
+            key.active -= 1
+
+    def stats(self, attr):
+        """{(key name,): value} of an ApiKey attribute, for the per-key gauges."""
+        return {(key.name,): getattr(key, attr) for key in self.keys}
+
+    def cooling(self):
+        now = time.monotonic()
+        return {(key.name,): 1 if key.cooling_until > now else 0 for key in self.keys}
@@ -0,0 +1,281 @@
+"""
+Concurrent-session load generator for the /ws game endpoint.
+
+Opens N games against a running server, drives the ready/answer/reveal/restart
+protocol like a real player and reports throughput and latency:
+
+    # Terminal 1: server with the local fake upstream (no API key needed)
+    ORACLE_BACKEND=fake python -m uvicorn main:app --port 8000
+
+    # Terminal 2
+    python loadtest.py --sessions 200 --concurrency 50 --server-pid <uvicorn pid>
+
+Or let the tool start the fake-backed server itself:
+
+    python loadtest.py --spawn --sessions 200 --concurrency 50
+
+`--mode text` plays text-only games; `--mode both` runs voice then text games
+with the same settings and compares them.
+
+Reported:
+    sessions/sec           completed games per wall-clock second
+    time-to-first-output   start_game -> first audio frame (text message in text mode),
+                           and answer -> first output per turn
+    server CPU/session     (user+sys CPU of the server process) / completed games, Linux only
+    games/core             average game length / server CPU per game: concurrent games one
+                           fully busy core could sustain at this pace
+    by question            answer -> first output p50 for questions 1-10, 11-20, ... of long
+                           games (--questions 50), to check that it stays flat as they go on
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import websockets
+
+ANSWERS = ["Yes", "No", "Probably", "Probably Not", "Don't Know"]
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def process_cpu_seconds(pid):
+    """User+system CPU seconds of a process from /proc (None if unavailable)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        # utime, stime, cutime, cstime (fields 14-17, offset by pid/comm)
+        return sum(int(x) for x in fields[11:15]) / ticks
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Stats:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.first_output = []  # start_game -> first audio, or first text in text mode (s)
+        self.turn_output = []   # answer -> first audio / text (s)
+        self.by_question = {}   # question number -> answer -> first output latencies (s)
+        self.durations = []     # whole game (s)
+        self.turns = 0
+        self.audio_bytes = 0
+        self.text_bytes = 0
+        self.cpu_per_session = None
+        self.elapsed = 0.0
+        self.errors = {}
+
+
+async def play_game(args, stats):
+    msg_start = {
+        "type": "start_game",
+        "persona_id": args.persona,
+        "player_name": "Load Tester",
+        "question_count_limit": args.questions,
+        "mode": args.mode,
+        "binary_audio": not args.json_audio,
+        "audio_encoding": args.encoding,
+    }
+    text_mode = args.mode == "text"
+    async with websockets.connect(args.url, max_size=None) as ws:
+        t_start = t_sent = time.perf_counter()
+        await ws.send(json.dumps(msg_start))
+        waiting_first_output = True
+        is_greeting = True
+        revealed = False
+        next_question = None  # number of the question the pending turn should ask
+
+        async for raw in ws:
+            if isinstance(raw, bytes):
+                stats.audio_bytes += len(raw)
+                is_audio = True
+            else:
+                msg = json.loads(raw)
+                is_audio = msg.get("type") == "audio"
+                if is_audio:
+                    stats.audio_bytes += len(msg.get("audio", "")) * 3 // 4
+                elif msg.get("type") == "text":
+                    stats.text_bytes += len(msg["text"].encode("utf-8"))
+
+            if is_audio or (text_mode and msg.get("type") == "text"):
+                if waiting_first_output:
+                    latency = time.perf_counter() - t_sent
+                    (stats.first_output if is_greeting else stats.turn_output).append(latency)
+                    if next_question is not None:
+                        stats.by_question.setdefault(next_question, []).append(latency)
+                    waiting_first_output = False
+                continue
+
+            if msg.get("type") != "turn_complete":
+                continue
+
+            stats.turns += 1
+            is_greeting = False
+            if args.think_ms:
+                await asyncio.sleep(random.uniform(0, args.think_ms) / 1000)
+
+            if msg.get("awaiting_ready"):
+                reply = {"type": "answer", "message": "Yes", "question_number": 0}
+            elif msg.get("player_won") and not revealed:
+                revealed = True
+                reply = {"type": "reveal", "character_name": "Ada Lovelace"}
+            elif msg.get("awaiting_play_again"):
+                await ws.send(json.dumps({"type": "restart"}))
+                stats.durations.append(time.perf_counter() - t_start)
+                break
+            elif msg.get("is_final_guess"):
+                reply = {"type": "answer", "message": random.choice(["Yes", "No"]),
+                         "question_number": msg["question_count"]}
+            elif msg.get("is_emotional_response"):
+                reply = {"type": "answer", "message": "Continue",
+                         "question_number": msg["question_count"]}
+            else:
+                reply = {"type": "answer", "message": random.choice(ANSWERS),
+                         "question_number": msg["question_count"]}
+
+            next_question = (reply["question_number"] + 1
+                             if reply.get("type") == "answer" and not msg.get("is_final_guess") else None)
+            t_sent = time.perf_counter()
+            waiting_first_output = True
+            await ws.send(json.dumps(reply))
+
+
+async def worker(args, stats, remaining):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        try:
+            await play_game(args, stats)
+            stats.completed += 1
+        except Exception as e:
+            stats.failed += 1
+            key = type(e).__name__
+            stats.errors[key] = stats.errors.get(key, 0) + 1
+
+
+async def run(args):
+    stats = Stats()
+    remaining = [args.sessions]
+    cpu_before = process_cpu_seconds(args.server_pid) if args.server_pid else None
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(args, stats, remaining) for _ in range(args.concurrency)))
+    elapsed = stats.elapsed = time.perf_counter() - t0
+    cpu_after = process_cpu_seconds(args.server_pid) if args.server_pid else None
+
+    output = "first text" if args.mode == "text" else "first audio"
+    print(f"\n{'='*60}")
+    print(f"Mode: {args.mode}")
+    print(f"Sessions: {stats.completed} completed, {stats.failed} failed in {elapsed:.1f}s "
+          f"(concurrency {args.concurrency})")
+    print(f"Sessions/sec: {stats.completed / elapsed:.2f}")
+    print(f"Turns: {stats.turns}, audio relayed: {stats.audio_bytes / 1e6:.1f} MB, "
+          f"text relayed: {stats.text_bytes / 1e3:.1f} kB")
+    for label, values in ((f"start_game -> {output}", stats.first_output),
+                          (f"answer -> {output}", stats.turn_output)):
+        print(f"{label}: p50 {percentile(values, 50)*1000:.0f} ms, "
+              f"p90 {percentile(values, 90)*1000:.0f} ms, "
+              f"p99 {percentile(values, 99)*1000:.0f} ms (n={len(values)})")
+    if len(stats.by_question) > 10:
+        bands = []
+        for low in range(1, max(stats.by_question) + 1, 10):
+            values = [v for q in range(low, low + 10) for v in stats.by_question.get(q, ())]
+            if values:
+                bands.append(f"{low}-{low + 9}: {percentile(values, 50)*1000:.0f}")
+        print(f"answer -> {output} p50 by question (ms): {', '.join(bands)}")
+    if cpu_before is not None and cpu_after is not None and stats.completed:
+        cpu = cpu_after - cpu_before
+        stats.cpu_per_session = cpu / stats.completed
+        print(f"Server CPU: {cpu:.2f}s total, {stats.cpu_per_session * 1000:.1f} ms/session")
+        if stats.durations and stats.cpu_per_session > 0:
+            print(f"Games/core: {games_per_core(stats):.0f} "
+                  f"(average game {sum(stats.durations) / len(stats.durations):.1f}s)")
+    elif args.server_pid:
+        print("Server CPU: unavailable (needs /proc)")
+    if stats.errors:
+        print(f"Errors: {stats.errors}")
+    print(f"{'='*60}\n")
+    return stats
+
+
+def games_per_core(stats):
+    return sum(stats.durations) / len(stats.durations) / stats.cpu_per_session
+
+
+def compare(results):
+    voice, text = results["voice"], results["text"]
+    print(f"{'='*60}")
+    print("Voice vs text")
+    for label, a, b in (
+        ("sessions/sec", voice.completed / voice.elapsed, text.completed / text.elapsed),
+        ("server CPU ms/session", (voice.cpu_per_session or 0) * 1000, (text.cpu_per_session or 0) * 1000),
+        ("bytes relayed/session", (voice.audio_bytes + voice.text_bytes) / max(voice.completed, 1),
+         (text.audio_bytes + text.text_bytes) / max(text.completed, 1)),
+    ):
+        print(f"{label:>24}: voice {a:10.1f}   text {b:10.1f}")
+    if voice.cpu_per_session and text.cpu_per_session and voice.durations and text.durations:
+        print(f"{'games/core':>24}: voice {games_per_core(voice):10.0f}   text {games_per_core(text):10.0f}")
+    print(f"{'='*60}\n")
+
+
+def spawn_server(port):
+    env = dict(os.environ, ORACLE_BACKEND=os.getenv("ORACLE_BACKEND", "fake"))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    time.sleep(2.0)
+    return proc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--sessions", type=int, default=50, help="total games to play")
+    parser.add_argument("--concurrency", type=int, default=10, help="games in flight at once")
+    parser.add_argument("--persona", default="genie")
+    parser.add_argument("--questions", type=int, default=5, help="question_count_limit per game")
+    parser.add_argument("--think-ms", type=float, default=0, help="max random player think time per turn")
+    parser.add_argument("--mode", default="voice", choices=["voice", "text", "both"],
+                        help="game mode requested in start_game; both runs voice then text and compares")
+    parser.add_argument("--json-audio", action="store_true", help="use the legacy base64 JSON audio path")
+    parser.add_argument("--encoding", default="pcm16", choices=["pcm16", "mulaw", "adpcm"],
+                        help="audio_encoding requested in start_game")
+    parser.add_argument("--server-pid", type=int, help="server process id for CPU accounting")
+    parser.add_argument("--spawn", action="store_true", help="start a fake-backed server on --port")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    proc = None
+    if args.spawn:
+        proc = spawn_server(args.port)
+        args.url = f"ws://127.0.0.1:{args.port}/ws"
+        args.server_pid = proc.pid
+    try:
+        if args.mode == "both":
+            results = {}
+            for mode in ("voice", "text"):
+                args.mode = mode
+                results[mode] = asyncio.run(run(args))
+            compare(results)
+        else:
+            asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
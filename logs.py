@@ -0,0 +1,202 @@
+"""
+Structured logging with formatting and I/O kept off the event loop.
+
+configure() sends the root logger's records through a bounded queue to a writer
+thread. Every ORACLE_LOG_FLUSH_MS, the thread formats what has queued up and writes
+it to stdout in one write. Logging from a game costs a record and a queue put.
+Batching also keeps the writer from taking the GIL from the event loop once per
+record. A slow stdout (e.g. a pipe to a log collector) only backs up the queue. When the queue is full, new records are dropped and counted in
+oracle_log_records_dropped_total, so games never wait on the log.
+
+A game's records carry its session id, persona and turn (the question count), plus
+any keyword arguments given. By convention these include a phase:
+
+    log = game_logger(game)
+    log.info("Answer received", phase="question", answer="Yes")
+    log.debug("Prompt", phase="question", prompt=prompt_text)
+
+Prompts and transcripts are logged at DEBUG only. With ORACLE_LOG_SAMPLE below 1,
+only that fraction of games log at INFO and DEBUG. The choice is made once per game,
+so a sampled game's log is complete. Warnings and errors are always logged.
+
+Configuration (environment):
+    ORACLE_LOG_LEVEL   DEBUG, INFO, WARNING, ... (default: INFO)
+    ORACLE_LOG_FORMAT  text (message, then key=value fields) or json, one object per line (default: text)
+    ORACLE_LOG_SAMPLE  fraction of games whose INFO and DEBUG records are logged (default: 1)
+    ORACLE_LOG_QUEUE   records waiting for the writer before new ones are dropped (default: 10000)
+    ORACLE_LOG_FLUSH_MS  how long the writer lets records accumulate before writing them (default: 50)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from metrics import LOG_RECORDS_DROPPED
+
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+
+_writer = None
+_STOP = object()
+
+
+class QueueingHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread unformatted; drops them when it is behind."""
+
+    def prepare(self, record):
+        # QueueHandler would format here, on the caller's thread. The writer does it
+        # instead, so arguments must not change after the call (ours are strings and numbers).
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def _text_value(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class TextFormatter(logging.Formatter):
+    """time level [logger] message | key=value ..."""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname} [{record.name}] {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " | " + " ".join(f"{key}={_text_value(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, msg and the fields."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogWriter(threading.Thread):
+    """Formats queued records and writes them in batches, one write per batch."""
+
+    def __init__(self, records, formatter, stream, interval):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.formatter = formatter
+        self.stream = stream
+        self.interval = interval
+
+    def run(self):
+        while True:
+            batch = [self.records.get()]
+            if batch[0] is not _STOP:
+                time.sleep(self.interval)  # let the batch fill while the games run
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                if record is _STOP:
+                    continue
+                try:
+                    lines.append(self.formatter.format(record))
+                except Exception as e:
+                    lines.append(f"Unformattable log record {record.msg!r}: {e}")
+            try:
+                if lines:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass  # stdout closed; nowhere left to log to
+            if _STOP in batch:
+                return
+
+    def stop(self):
+        self.records.put(_STOP)  # blocks if full: only at shutdown, and the writer is draining
+        self.join()
+
+
+def configure(level=None, fmt=None, queue_size=None, stream=None, flush_ms=None):
+    """Route the root logger through the queue to a writer thread (once per process)."""
+    global _writer
+    if _writer is not None:
+        return _writer
+    level = level or os.getenv("ORACLE_LOG_LEVEL", "INFO").upper()
+    fmt = fmt or os.getenv("ORACLE_LOG_FORMAT", FORMAT_TEXT)
+    queue_size = int(queue_size if queue_size is not None else os.getenv("ORACLE_LOG_QUEUE", 10000))
+    flush_ms = float(flush_ms if flush_ms is not None else os.getenv("ORACLE_LOG_FLUSH_MS", 50))
+
+    # Not shown by either formatter; skip looking them up for every record
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    logging.logAsyncioTasks = False
+
+    records = queue.Queue(maxsize=queue_size)
+    root = logging.getLogger()
+    root.handlers = [QueueingHandler(records)]
+    root.setLevel(level)
+    formatter = JsonFormatter() if fmt == FORMAT_JSON else TextFormatter()
+    _writer = LogWriter(records, formatter, stream or sys.stdout, flush_ms / 1000)
+    _writer.start()
+    atexit.register(stop)
+    return _writer
+
+
+def stop():
+    """Write out what is queued and stop the writer thread."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+# Keyword arguments of a logging call that are not fields
+_RECORD_KWARGS = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+class GameLogger(logging.LoggerAdapter):
+    """Logger for one game. Every record carries the session, persona and turn."""
+
+    def __init__(self, logger, game, sampled=True):
+        super().__init__(logger, {})
+        self.game = game
+        self.sampled = sampled
+
+    def isEnabledFor(self, level):
+        if level < logging.WARNING and not self.sampled:
+            return False
+        return self.logger.isEnabledFor(level)
+
+    def process(self, msg, kwargs):
+        fields = {"session": self.game.id, "persona": self.game.persona_id, "turn": self.game.question_count}
+        for key in [key for key in kwargs if key not in _RECORD_KWARGS]:
+            fields[key] = kwargs.pop(key)
+        kwargs["extra"] = {"fields": fields}
+        return msg, kwargs
+
+
+def game_logger(game, sample=None):
+    sample = float(os.getenv("ORACLE_LOG_SAMPLE", 1) if sample is None else sample)
+    return GameLogger(logging.getLogger("game"), game, sampled=sample >= 1 or random.random() < sample)
@@ -1,36 +1,122 @@
 import os
 import uvicorn
-import base64
 import wave
 import io
 import json
 import asyncio
 import logging
+import time
+import hmac
+import threading
+from contextlib import asynccontextmanager, AsyncExitStack
+from functools import lru_cache
 from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
+import logs
+from protocol import negotiate_sequencing, negotiate_transport
+from audio_codec import negotiate_encoding
+from backends import create_backend
+from key_pool import KeyPool, KeysExhaustedError, load_keys
+from session_pool import SessionPool
+from greeting_cache import GreetingCache
+from relay import ClientSender, SlowClientError
+from game_session import GameSession, GameRegistry
+from admission import AdmissionController, QueueFullError
+from shared_registry import SharedRegistry
+import routing
+from question_engine import KnowledgeBase, QuestionEngine
+from game_history import GameHistory
+from turn_parser import TurnParser
+from capture import open_capture
+from speculation import Speculator
+from upstream import Upstream, CONTEXT_TARGET_TOKENS, CONTEXT_TRIGGER_TOKENS
+from assets import AssetManifest, ImmutableStaticFiles, PrerenderedPage, DIST_DIR
+import metrics
+from metrics import TurnTimer
+import profiler
 
 # Load environment variables
 load_dotenv("key.txt")
-GOOGLE_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY")
+# GOOGLE_GEMINI_API_KEYS (a pool, with per-key session limits) or GOOGLE_GEMINI_API_KEY
+API_KEYS = load_keys()
 
-if not GOOGLE_API_KEY:
-    print("Warning: GOOGLE_GEMINI_API_KEY not found in key.txt")
+# Log records are formatted and written by a background thread, never on the event loop
+logs.configure()
 
-# Configure Gemini (New SDK)
-# client = genai.Client(api_key=GOOGLE_API_KEY) # Moved to inside websocket endpoint to avoid import-time SSL hangs
+if not API_KEYS and os.getenv("ORACLE_BACKEND", "gemini") == "gemini":
+    logging.warning("GOOGLE_GEMINI_API_KEY not found in key.txt")
+
+# Upstream live backend (ORACLE_BACKEND=gemini|fake|replay)
+# One process-wide backend, spreading sessions over the API keys; each key's Gemini
+# client is created lazily on first use
+backend = create_backend(api_keys=API_KEYS)
+
+# Take the client IP from X-Forwarded-For (only behind a trusted reverse proxy)
+TRUST_FORWARDED_FOR = os.getenv("ORACLE_TRUST_FORWARDED_FOR", "") == "1"
+
+MODEL_NAME = "gemini-2.5-flash-native-audio-preview-09-2025"
+
+# Game modes: "voice" streams spoken audio plus its transcription; "text" streams text only,
+# from a Live model that can answer in text (the native-audio model can't)
+MODE_VOICE = "voice"
+MODE_TEXT = "text"
+TEXT_MODEL_NAME = os.getenv("ORACLE_TEXT_MODEL", "gemini-live-2.5-flash-preview")
+
+def model_for(key):
+    persona_id, mode = key
+    return TEXT_MODEL_NAME if mode == MODE_TEXT else MODEL_NAME
+
+# Optional local question engine: a knowledge base (.npz or .csv) of characters x yes/no questions
+KNOWLEDGE_BASE_PATH = os.getenv("ORACLE_KNOWLEDGE_BASE")
+knowledge_base = None
+
+# The SDK import, client and Live configs are prepared in the background after startup,
+# so a new worker accepts connections right away; /readyz reports when this is done
+upstream_warm_up = None
+
+# index.html has no per-request data: rendered once at startup
+index_page = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global knowledge_base, upstream_warm_up, index_page
+    upstream_warm_up = asyncio.create_task(warm_up_upstream())
+    if KNOWLEDGE_BASE_PATH:
+        knowledge_base = await asyncio.to_thread(KnowledgeBase.load, KNOWLEDGE_BASE_PATH)
+        logging.info(f"Question engine: {knowledge_base.shape[0]} characters x {knowledge_base.shape[1]} questions")
+    await asyncio.to_thread(game_history.start)
+    index_page = PrerenderedPage(templates.get_template("index.html").render(personas=PERSONAS))
+    yield
+    upstream_warm_up.cancel()
+    await asyncio.gather(upstream_warm_up, return_exceptions=True)
+    await game_registry.close_all()
+    await asyncio.gather(*greeting_writes, return_exceptions=True)
+    await admission.close()
+    if shared_registry is not None:
+        shared_registry.close()
+    await session_pool.stop()
+    await asyncio.to_thread(game_history.stop)
 
 # Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Hashed, precompressed build output (python build_assets.py), cached as immutable
+asset_manifest = AssetManifest()
+if asset_manifest.built:
+    app.mount("/static/dist", ImmutableStaticFiles(directory=DIST_DIR), name="dist")
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_manifest.url
+
+def face_url(filename):
+    # Avatar-sized face (shown at 200 px)
+    return asset_manifest.url(f"images/characters/faces/{filename}", 400)
 
 # Personas Configuration
 PERSONAS = {
@@ -39,35 +125,35 @@ PERSONAS = {
         "voice": "Enceladus",
         "style": "dark, menacing, and growling voice",
         "system_prompt": "You are a dark Demon trying to guess the user's character. Be menacing and arrogant. Talk faster",
-        "image": "/static/images/characters/faces/outlined/demon.png"
+        "image": face_url("demon.png")
     },
     "genie": {
         "name": "The Genie",
         "voice": "Enceladus",
         "style": "mysterious and mystical voice",
         "system_prompt": "You are a genie similar to Akinator but definitely not him. Be polite, mysterious, and engaging. Talk faster",
-        "image": "/static/images/characters/faces/outlined/genie.png"
+        "image": face_url("genie.png")
     },
     "wizard": {
         "name": "The Wizard",
         "voice": "Orus",
         "style": "wise, scholarly, and ancient voice",
         "system_prompt": "You are a wise and powerful Wizard. Speak with wisdom and arcane knowledge. Talk faster",
-        "image": "/static/images/characters/faces/outlined/wizard.png"
+        "image": face_url("wizard.png")
     },
     "fortune_teller": {
         "name": "The Fortune Teller",
         "voice": "Aoede",
         "style": "mystical, enigmatic, female voice",
         "system_prompt": "You are a mystical Gypsy Fortune Teller. Be enigmatic, spiritual, and all-knowing. Talk faster",
-        "image": "/static/images/characters/faces/outlined/fortune-teller.png"
+        "image": face_url("fortune-teller.png")
     },
     "monster": {
         "name": "The Monster",
         "voice": "Algenib",
         "style": "deep and monstrous voice",
         "system_prompt": "You are a scary Monster with a deep and monstrous voice. Speak moody and grouchy. Talk faster",
-        "image": "/static/images/characters/faces/outlined/monster.png"
+        "image": face_url("monster.png")
     }
 }
 
@@ -92,278 +178,882 @@ Rules:
 11. React emotionally to the user's answers. If the answer is 'No', be disappointed and grow increasingly frustrated/angry over time. If the answer is 'Yes', be pleased and grow increasingly excited/giddy.
 """
 
+@lru_cache(maxsize=None)
+def build_live_config(persona_id, mode=MODE_VOICE):
+    """Live API config for a persona. Built once per persona and mode and shared by every
+    game; per-game details (player name, question limit) go into the opening turn instead."""
+    from google.genai import types  # deferred: the SDK import dominates startup (see warm_up_upstream)
+
+    persona = PERSONAS[persona_id]
+    system_prompt = f"{persona['system_prompt']}\n{BASE_SYSTEM_PROMPT}"
+
+    # Long games: the server drops the oldest turns instead of letting the context, and
+    # the time to first audio, keep growing; resumption handles let a game reconnect
+    # without losing its context (see upstream.py)
+    context = dict(
+        context_window_compression=types.ContextWindowCompressionConfig(
+            trigger_tokens=CONTEXT_TRIGGER_TOKENS,
+            sliding_window=types.SlidingWindow(target_tokens=CONTEXT_TARGET_TOKENS),
+        ) if CONTEXT_TRIGGER_TOKENS > 0 else None,
+        session_resumption=types.SessionResumptionConfig(),
+    )
+
+    if mode == MODE_TEXT:
+        # No speech generation, voice or transcription: text parts stream as they are generated
+        return types.LiveConnectConfig(
+            response_modalities=["TEXT"],
+            system_instruction=types.Content(parts=[types.Part(text=system_prompt)]),
+            **context
+        )
+
+    # Live API Config - use types.LiveConnectConfig for proper configuration
+    return types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        system_instruction=types.Content(parts=[types.Part(text=system_prompt)]),
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=persona['voice']
+                )
+            )
+        ),
+        output_audio_transcription={},  # Enable transcription (empty dict)
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=0  # Disable thinking
+        ),
+        **context
+    )
+
+def build_resume_config(key, handle):
+    """Live config for (persona, mode) that resumes the upstream session `handle`."""
+    from google.genai import types
+    return build_live_config(*key).model_copy(
+        update={"session_resumption": types.SessionResumptionConfig(handle=handle)}
+    )
+
+def prepare_upstream():
+    """Import the SDK, create the upstream client and build every Live config (blocking)."""
+    backend.warm_up()
+    for persona_id in PERSONAS:
+        for mode in (MODE_VOICE, MODE_TEXT):
+            build_live_config(persona_id, mode)
+
+async def warm_up_upstream():
+    started = time.perf_counter()
+    await asyncio.to_thread(prepare_upstream)
+    logging.info(f"Upstream {backend.name} client ready in {time.perf_counter() - started:.2f}s")
+    await session_pool.start()
+
+def build_greeting_prompt(player_name, question_limit, use_name=True):
+    # Greetings cached per persona are shared between players, so they must not use the name
+    greet = f"Greet {player_name}" if use_name else "Greet the player (do not use their name)"
+    return (
+        f"You are talking to {player_name}. You may ask at most {question_limit} questions "
+        f"before you MUST make a guess. "
+        f"Start the game. {greet} in your persona and ask if they are ready."
+    )
+
+def engine_line(game, must_guess=False):
+    """Let the question engine choose the next question or guess, worded for the model to speak."""
+    move = game.engine.next_move(must_guess=must_guess)
+    game.engine_move = move
+    game.logger.info("Engine move", phase="engine", kind=move.kind, text=move.text,
+                     confidence=round(move.confidence, 3), candidates=game.engine.candidates)
+    if move.is_guess:
+        return f' Make your guess now, naming exactly this character: "I think of... {move.text}. Am I correct?"'
+    return f' Your next question must ask exactly this, reworded only to fit your persona: "{move.text}"'
+
+def announce_turn_event(game, event):
+    """Forward an early question/guess detection with the count the turn will end on,
+    so the client can show the answer buttons or guess card before the audio finishes."""
+    if game.awaiting_ready or game.awaiting_play_again or game.player_won:
+        return
+    question_count = game.question_count + 1
+    game.send_json({
+        **event,
+        "question_count": question_count,
+        "is_final_guess": question_count > game.question_limit
+    })
+
+def _is_bare_turn_complete(response):
+    content = response.server_content
+    return (response.data is None and content is not None and content.turn_complete
+            and not content.output_transcription and not content.model_turn)
+
+async def receive_turn(link, drain=False):
+    """Messages of the upstream session's next model turn, up to its turn_complete.
+    Every message, drained ones included, is shown to `link` first.
+
+    With `drain`, first discard what is left of a turn cut short by barge-in: everything
+    up to its `interrupted` flag (sent when our answer reached the model mid-generation)
+    or its turn_complete (sent when generation had already finished). A bare
+    turn_complete right after `interrupted` still belongs to the cut turn.
+    """
+    session = link.session
+    after_interrupt = False
+    if drain:
+        async for response in session.receive():
+            link.observe(response)
+            content = response.server_content
+            if content and content.interrupted:
+                after_interrupt = not content.turn_complete
+                break
+            if content and content.turn_complete:
+                break
+    while True:
+        async for response in session.receive():
+            link.observe(response)
+            if after_interrupt:
+                after_interrupt = False
+                if _is_bare_turn_complete(response):
+                    break  # receive() ends at a turn_complete; the reply follows in the next one
+            yield response
+        else:
+            return
+
+# Pre-connected idle sessions per persona (disabled unless ORACLE_POOL_SIZE > 0)
+# Keyed by (persona, mode); only voice sessions are kept warm, text sessions are dialed per game
+session_pool = SessionPool(backend, model_for, lambda key: build_live_config(*key),
+                           [(persona_id, MODE_VOICE) for persona_id in PERSONAS])
+
+# Replies to likely answers, generated on side sessions while the question plays (ORACLE_SPECULATE_ANSWERS)
+speculator = Speculator(lambda key: session_pool.session(key, config=build_live_config(*key)))
+
+# Generated greetings, replayed while the live session connects
+greeting_cache = GreetingCache()
+# Greeting writes in flight; the loop only keeps weak references to tasks
+greeting_writes = set()
+
+# Games by session id; a dropped client can re-attach within the grace period
+game_registry = GameRegistry()
+
+# Finished games' turn logs, written to SQLite in the background (ORACLE_HISTORY_DB)
+game_history = GameHistory()
+
+# With several workers (serve.py): game owners and global admission limits, shared in SQLite
+shared_registry = SharedRegistry.from_env()
+WORKER_ID = shared_registry.worker if shared_registry is not None else None
+
+# Concurrent-game limits (ORACLE_MAX_GAMES, ORACLE_MAX_GAMES_PER_IP) with a FIFO wait queue
+admission = AdmissionController(shared=shared_registry)
+
+metrics.callback_gauge("oracle_games_admitted", "Games holding an admission slot", lambda: admission.active)
+metrics.callback_gauge("oracle_admission_queue_depth", "Players waiting for a game slot", admission.queue_depth)
+metrics.callback_gauge("oracle_games_detached", "Games waiting for their client to reconnect", game_registry.detached_count)
+metrics.callback_gauge("oracle_session_pool_idle", "Idle pre-connected live sessions", session_pool.idle_count)
+metrics.callback_gauge("oracle_speculations_active", "Side sessions generating speculative turns", lambda: speculator.active)
+if isinstance(backend, KeyPool):
+    metrics.callback_gauge("oracle_upstream_key_sessions", "Live sessions open or connecting per API key",
+                           lambda: backend.stats("active"), ["key"])
+    metrics.callback_gauge("oracle_upstream_key_utilization", "Share of each API key's session limit in use",
+                           lambda: backend.stats("utilization"), ["key"])
+    metrics.callback_gauge("oracle_upstream_key_cooling", "API keys out of rotation after refused connects",
+                           backend.cooling, ["key"])
+GREETING_CACHE = metrics.counter("oracle_greeting_cache_total", "Greeting cache lookups", ["result"])
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return index_page.response(request)
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up and serving requests
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: the upstream client is initialized, so games can start without the import stall
+    if upstream_warm_up is not None and upstream_warm_up.done() and not upstream_warm_up.cancelled():
+        error = upstream_warm_up.exception()
+        if error is None and backend.ready:
+            return {"status": "ready", "backend": backend.name, "worker": WORKER_ID}
+        if error is not None:
+            return JSONResponse({"status": "failed", "error": str(error)}, status_code=503)
+    return JSONResponse({"status": "starting"}, status_code=503)
+
+async def owner_url(session_id):
+    """Private URL of the other worker running a game, or None (it's ours or unknown)."""
+    if shared_registry is None:
+        return None
+    owner = await shared_registry.run(shared_registry.owner, session_id)
+    if owner is None or owner[0] == WORKER_ID:
+        return None
+    return owner[1]
+
+async def routed_response(url, timeout=5.0, headers=None):
+    status, body, content_type = await routing.fetch(url, timeout, headers)
+    return Response(body, status_code=status, media_type=content_type)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request, worker: int = None):
+    # Each worker has its own metrics; ?worker=N reads another worker's
+    if worker is not None and shared_registry is not None and worker != WORKER_ID \
+            and routing.ROUTED_HEADER not in request.headers:
+        url = await shared_registry.run(shared_registry.worker_url, worker)
+        if url is None:
+            raise HTTPException(status_code=404, detail="Unknown worker")
+        return await routed_response(f"{url}/metrics")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/games/{session_id}")
+async def get_game(session_id: str, request: Request):
+    """Status of a running game, from whichever worker runs it."""
+    game = game_registry.get(session_id)
+    if game is None and routing.ROUTED_HEADER not in request.headers:
+        url = await owner_url(session_id)
+        if url is not None:
+            return await routed_response(f"{url}/games/{session_id}")
+    if game is None:
+        raise HTTPException(status_code=404, detail="Unknown or finished game")
+    return {
+        "session_id": game.id,
+        "persona_id": game.persona_id,
+        "connected": game.sender is not None,
+        "worker": WORKER_ID,
+        **game.state()
+    }
+
+@app.get("/stats")
+async def get_stats(days: int = None):
+    if not game_history.enabled:
+        raise HTTPException(status_code=404, detail="Game history is disabled")
+    return JSONResponse(await asyncio.to_thread(game_history.stats, days))
+
+# Admin endpoints are off unless ORACLE_ADMIN_TOKEN is set; requests send it as a Bearer token
+ADMIN_TOKEN = os.getenv("ORACLE_ADMIN_TOKEN", "")
+PROFILE_MAX_S = float(os.getenv("ORACLE_PROFILE_MAX_S", 60))
+profiling = asyncio.Lock()
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(request: Request, seconds: float = 10, interval_ms: float = 10, worker: int = None):
+    """Sample this worker's event loop for `seconds`: collapsed stacks for a flame graph."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Admin token required")
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_S)
+    interval_ms = max(interval_ms, 1.0)
+    if worker is not None and shared_registry is not None and worker != WORKER_ID \
+            and routing.ROUTED_HEADER not in request.headers:
+        url = await shared_registry.run(shared_registry.worker_url, worker)
+        if url is None:
+            raise HTTPException(status_code=404, detail="Unknown worker")
+        return await routed_response(f"{url}/admin/profile?seconds={seconds}&interval_ms={interval_ms}",
+                                     timeout=seconds + 10, headers={"Authorization": authorization})
+    if profiling.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    async with profiling:
+        # This handler runs on the event loop thread, which is the one to sample
+        profile = await asyncio.to_thread(profiler.sample, threading.get_ident(), seconds, interval_ms / 1000)
+    logging.info(f"Profiled the event loop for {seconds:.1f}s: {profile.samples} samples")
+    return PlainTextResponse(profile.collapsed())
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    sender = None
+    game = None
+    counted = False
     
     try:
-        # Wait for the start_game message to get the persona
+        # Wait for start_game (new game) or resume_game (reconnect after a drop)
         data = await websocket.receive_json()
-        if data.get("type") != "start_game":
+        if data.get("type") == "resume_game":
+            game = game_registry.get(data.get("session_id"))
+            url = await owner_url(data.get("session_id")) if game is None and not data.get("routed") else None
+            if url is not None:
+                # The game runs on another worker: relay this connection to it
+                await routing.proxy_websocket(websocket, data, url.replace("http://", "ws://", 1) + "/ws")
+                return
+            if game is None:
+                metrics.RESUMES.inc(result="unknown")
+                await websocket.send_json({"type": "resume_failed"})
+                await websocket.close(code=1000)
+                return
+        elif data.get("type") != "start_game":
             await websocket.close(code=1003)
             return
 
-        persona_id = data.get("persona_id", "genie")
-        player_name = data.get("player_name", "Traveler")
-        question_limit = data.get("question_count_limit", 20)
+        audio_transport = negotiate_transport(data)
+        audio_encoding = negotiate_encoding(data)
+        sequenced_audio = negotiate_sequencing(data)
 
-        if persona_id not in PERSONAS:
-            persona_id = "genie"
-        
-        persona = PERSONAS[persona_id]
-        
-        # Inject player name and limit into system prompt
-        customized_prompt = BASE_SYSTEM_PROMPT.replace("The user", f"{player_name}")
-        customized_prompt = customized_prompt.replace("25 questions", f"{question_limit} questions")
-        customized_prompt = customized_prompt.replace("24 questions", f"{question_limit - 1} questions")
-        
-        full_system_prompt = f"You are talking to {player_name}. {persona['system_prompt']}\n{customized_prompt}"
-        
-        # Send initial game state to client
-        await websocket.send_json({
-            "type": "game_started",
-            "session_id": "live-session", 
-            "image": persona["image"],
-            "question_count": 0
-        })
-
-        model_name = "gemini-2.5-flash-native-audio-preview-09-2025"
-        
-        # Live API Config - use types.LiveConnectConfig for proper configuration
-        config = types.LiveConnectConfig(
-            response_modalities=["AUDIO"],
-            system_instruction=types.Content(parts=[types.Part(text=full_system_prompt)]),
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name=persona['voice']
-                    )
-                )
-            ),
-            output_audio_transcription={},  # Enable transcription (empty dict)
-            thinking_config=types.ThinkingConfig(
-                thinking_budget=0  # Disable thinking
-            )
-        )
+        # Outgoing messages go through their own task so a slow client can't stall upstream reads
+        sender = ClientSender(websocket, audio_transport, audio_encoding, sequenced=sequenced_audio).start()
+        metrics.ACTIVE_SESSIONS.inc()
+        counted = True
 
-        # Initialize client per connection to avoid multiprocessing/SSL context issues on reload
-        client = genai.Client(api_key=GOOGLE_API_KEY)
+        if game is not None:
+            away = time.monotonic() - game.detached_at if game.detached_at else 0.0
+            game.logger.info(f"Client resumed after {away:.1f}s away", phase="connection")
+            metrics.RESUMES.inc(result="resumed")
+            sender.send_json({
+                "type": "game_resumed",
+                "session_id": game.id,
+                "image": PERSONAS[game.persona_id]["image"],
+                "audio_transport": audio_transport,
+                "audio_encoding": audio_encoding,
+                "sequenced_audio": sequenced_audio,
+                **game.state()
+            })
+            # Replays whatever the game sent while the client was away
+            game.attach(sender)
+        else:
+            persona_id = data.get("persona_id", "genie")
+            player_name = data.get("player_name", "Traveler")
+            question_limit = data.get("question_count_limit", 20)
+            mode = MODE_TEXT if data.get("mode") == MODE_TEXT else MODE_VOICE
 
-        async with client.aio.live.connect(model=model_name, config=config) as session:
-            
-            question_count = 0
-            player_won = False
-            is_final_guess = False
-            awaiting_play_again = False
-            awaiting_ready = True  # New flag for initial greeting
-            
-            # Initial greeting - use send_client_content instead of deprecated send
-            print(f"\n{'='*60}")
-            print(f"[{question_count}/{question_limit}] INTRODUCTION - Starting game greeting")
-            print(f"{'='*60}\n")
-            await session.send_client_content(
-                turns={"role": "user", "parts": [{"text": "Start the game. Greet the user in your persona and ask if they are ready."}]},
-                turn_complete=True
-            )
+            if persona_id not in PERSONAS:
+                persona_id = "genie"
             
-            # Main Game Loop
-            while True:
-                # Receive response from Gemini (Streamed)
-                text_accumulated = ""
-                
-                async for response in session.receive():
-                    if response.data is not None:
-                        # Audio data received (PCM)
-                        audio_b64 = base64.b64encode(response.data).decode('utf-8')
-                        await websocket.send_json({
-                            "type": "audio",
-                            "audio": audio_b64
-                        })
-                    
-                    text_chunk = ""
-                    # Get transcription if available
-                    if response.server_content and response.server_content.output_transcription:
-                        text_chunk += response.server_content.output_transcription.text
-                    
-                    # Also check model_turn for text parts
-                    server_content = response.server_content
-                    if server_content and server_content.model_turn:
-                        for part in server_content.model_turn.parts:
-                            if part.text:
-                                text_chunk += part.text
-                    
-                    if text_chunk:
-                        text_accumulated += text_chunk
-                        await websocket.send_json({
-                            "type": "text",
-                            "text": text_chunk
-                        })
-
-                    if server_content and server_content.turn_complete:
-                        # Increment question count only for actual questions or guesses
-                        # Skip counting during initial greeting
-                        is_emotional_response = False
-                        if not awaiting_ready:
-                            text_lower = text_accumulated.lower()
-                            is_question = "?" in text_accumulated
-                            is_guess = "i think" in text_lower
-                            
-                            if is_question or is_guess:
-                                question_count += 1
-                            else:
-                                # No question mark and not a guess = emotional response
-                                is_emotional_response = True
-                        
-                        # Check if this is the final guess
-                        is_final_guess = (question_count > question_limit)
-                        
-                        await websocket.send_json({
-                            "type": "turn_complete",
-                            "question_count": question_count,
-                            "player_won": player_won,
-                            "is_final_guess": is_final_guess,
-                            "awaiting_play_again": awaiting_play_again,
-                            "awaiting_ready": awaiting_ready,
-                            "is_emotional_response": is_emotional_response
-                        })
-                        break
-                
-                # Wait for user input
+            persona = PERSONAS[persona_id]
+
+            try:
+                ticket = await wait_for_admission(websocket, sender)
+            except QueueFullError as e:
+                logging.warning(f"Turning away {client_ip(websocket)}: {e}")
+                sender.send_json({"type": "server_busy", "message": "The oracle is overwhelmed. Please try again later."})
+                await sender.close(code=1013)
+                return
+            if ticket is None:
+                logging.info("Client left the wait queue")
+                return
+
+            game = GameSession(persona_id, player_name, question_limit, mode=mode)
+            if knowledge_base is not None:
+                game.engine = QuestionEngine(knowledge_base)
+            game.attach(sender)
+
+            # Send initial game state to client
+            game.send_json({
+                "type": "game_started",
+                "session_id": game.id, 
+                "image": persona["image"],
+                "question_count": 0,
+                "mode": mode,
+                "audio_transport": audio_transport,
+                "audio_encoding": audio_encoding,
+                "sequenced_audio": sequenced_audio
+            })
+            game_registry.start(game, run_game(game))
+            # The slot is held for the game's whole life, including any resume grace period
+            game.task.add_done_callback(lambda _: admission.release(ticket))
+            await admission.bind(ticket, game.id)
+
+        # Feed client messages to the game until the client leaves or the game ends
+        reader = asyncio.create_task(read_client(websocket, game))
+        try:
+            await asyncio.wait({reader, game.task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            reader.cancel()
+        if game.task.done() and game.sender is sender:
+            code = 1011 if game.task.cancelled() else game.task.result()
+            if code == 1008:
+                # Don't flush the backlog that made the client too slow in the first place
+                await sender.close()
                 try:
-                    user_msg = await websocket.receive_json()
-                except WebSocketDisconnect:
-                    break
-                
-                if user_msg.get("type") == "answer":
-                    user_answer = user_msg.get("message", "")
-                    client_question_num = user_msg.get("question_number", 0)
-                    
-                    # Handle initial ready response
-                    if awaiting_ready:
-                        ans_lower = user_answer.lower()
-                        if ans_lower == "no":
-                            # Player chose not to play, close connection
-                            print(f"\n[{question_count}/{question_limit}] Player declined to play")
-                            await websocket.close(code=1000)
-                            break
-                        # Player said Yes, continue with first question
-                        awaiting_ready = False
-                        prompt_text = "The user is ready. Ask your first question to start narrowing down who they're thinking of."
-                        print(f"\n{'='*60}")
-                        print(f"[{question_count + 1}/{question_limit}] FIRST QUESTION - Starting interrogation")
-                        print(f"Prompt: {prompt_text}")
-                        print(f"{'='*60}\n")
-                        await session.send_client_content(
-                            turns={"role": "user", "parts": [{"text": prompt_text}]},
-                            turn_complete=True
-                        )
-                        continue
-                    
-                    # Validate sync - if client is out of sync, resync
-                    if client_question_num != question_count:
-                        logging.warning(f"Question count mismatch! Backend: {question_count}, Client: {client_question_num}. Resyncing...")
-                        # Send resync message
-                        await websocket.send_json({
-                            "type": "resync",
-                            "question_count": question_count,
-                            "message": "Question count out of sync. Resyncing..."
-                        })
-                        # Don't process this answer, wait for resync
-                        continue
-                    
-                    # Handle "Continue" button for emotional responses
-                    if user_answer.lower() == "continue":
-                        prompt_text = f"[Answered {question_count}/{question_limit}] Ask your next question."
-                        print(f"\n{'='*60}")
-                        print(f"[{question_count}/{question_limit}] CONTINUE - After emotional response")
-                        print(f"Prompt: {prompt_text}")
-                        print(f"{'='*60}\n")
-                    else:
-                        prompt_text = f"[Answered {question_count}/{question_limit}] {user_answer}"
-                        
-                        # Add emotional context based on answer
-                        ans_lower = user_answer.lower()
-                        if ans_lower in ["no", "probably not", "don't know"]:
-                            prompt_text += " (The user answered negatively. Express disappointment briefly, then ask your next question.)"
-                        elif ans_lower in ["yes", "probably"]:
-                            prompt_text += " (The user answered positively! Express excitement briefly, then ask your next question.)"
-                        else:
-                            prompt_text += " (Ask your next question.)"
-                    
-                    # Handle final guess response
-                    if is_final_guess:
-                        if ans_lower in ["yes"]:
-                            # AI won! Set flag for play again
-                            awaiting_play_again = True
-                            prompt_text += " (You WON! Boast about your victory, make a joke or taunt, and ask 'Do you want to play again?')"
-                            print(f"\n{'='*60}")
-                            print(f"[{question_count}/{question_limit}] AI WON - Guess was correct!")
-                            print(f"Prompt: {prompt_text}")
-                            print(f"{'='*60}\n")
-                        else:
-                            # AI lost, ask who it was
-                            player_won = True
-                            prompt_text += " (You LOST. Admit defeat and ask 'Who was it?')"
-                            print(f"\n{'='*60}")
-                            print(f"[{question_count}/{question_limit}] PLAYER WON - Guess was wrong")
-                            print(f"Prompt: {prompt_text}")
-                            print(f"{'='*60}\n")
-                        is_final_guess = False  # Reset the flag
-                    elif question_count == question_limit:
-                        prompt_text += f" (This is question {question_limit}/{question_limit}. You MUST make a guess now.)"
-                        print(f"\n{'='*60}")
-                        print(f"[{question_count}/{question_limit}] LAST CHANCE - Must make a guess!")
-                        print(f"User Answer: {user_answer}")
-                        print(f"Prompt: {prompt_text}")
-                        print(f"{'='*60}\n")
-                    else:
-                        # Regular question
-                        print(f"\n{'='*60}")
-                        print(f"[{question_count}/{question_limit}] QUESTION - Regular turn")
-                        print(f"User Answer: {user_answer}")
-                        print(f"Prompt: {prompt_text}")
-                        print(f"{'='*60}\n")
-
-                    await session.send_client_content(
-                        turns={"role": "user", "parts": [{"text": prompt_text}]},
-                        turn_complete=True
-                    )
-                
-                elif user_msg.get("type") == "reveal":
-                    character_name = user_msg.get("character_name")
-                    prompt = f"The user was thinking of: {character_name}. Make a comment about the character and ask 'Do you want to play again?'"
-                    
-                    print(f"\n{'='*60}")
-                    print(f"[CHARACTER REVEALED] Player told us: {character_name}")
-                    print(f"Prompt: {prompt}")
-                    print(f"{'='*60}\n")
-                    
-                    # Reset player_won and set awaiting_play_again
-                    player_won = False
-                    awaiting_play_again = True
-                    
-                    await session.send_client_content(
-                        turns={"role": "user", "parts": [{"text": prompt}]},
-                        turn_complete=True
-                    )
-                
-                elif user_msg.get("type") == "restart":
-                    # Break the inner loop to restart the connection/session logic if needed
-                    # For now, we can just close and let client reconnect
-                    break
+                    await asyncio.wait_for(websocket.close(code=code), 1.0)
+                except:
+                    pass
+            else:
+                await sender.close(code=code)
 
     except WebSocketDisconnect:
-        print("Client disconnected")
+        logging.info("Client disconnected")
     except Exception as e:
         logging.error(f"Error in websocket: {e}")
         try:
             await websocket.close(code=1011)
         except:
             pass
+    finally:
+        if game is not None and game.task is not None:
+            game_registry.release(game, sender)
+        if sender:
+            await sender.close()
+        if counted:
+            metrics.ACTIVE_SESSIONS.dec()
+
+def greeting_written(game, task):
+    greeting_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        game.logger.warning(f"Could not cache greeting: {task.exception()}", phase="greeting")
+
+def client_ip(websocket):
+    if TRUST_FORWARDED_FOR:
+        forwarded = websocket.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return websocket.client.host if websocket.client else "unknown"
+
+async def wait_for_admission(websocket, sender):
+    """Take a game slot, queueing if the server or this IP is at its limit.
+    Returns None if the client disconnects while waiting."""
+    ip = client_ip(websocket)
+    ticket = await admission.try_acquire(ip)
+    if ticket is not None:
+        return ticket
+
+    def on_update(position, eta_s):
+        sender.send_json({"type": "queued", "position": position, "eta_s": round(eta_s)})
+
+    waiting = asyncio.create_task(admission.acquire(ip, on_update))
+    leaving = asyncio.create_task(discard_until_disconnect(websocket))
+    try:
+        await asyncio.wait({waiting, leaving}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        leaving.cancel()
+        if not waiting.done():
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+    if waiting.cancelled():
+        return None
+    return waiting.result()
+
+async def discard_until_disconnect(websocket):
+    # Queued players have nothing to say yet; this only notices them leaving
+    try:
+        while True:
+            await websocket.receive_json()
+    except WebSocketDisconnect:
+        pass
+
+async def read_client(websocket, game):
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") == "audio_stats":
+                record_audio_stats(game, message)  # telemetry, not a move in the game
+                continue
+            game.inbox.put_nowait(message)
+    except WebSocketDisconnect:
+        game.logger.info("Client disconnected", phase="connection")
+
+def record_audio_stats(game, message):
+    """Count the playback underruns a client reports after a model turn."""
+    try:
+        underruns = min(max(int(message.get("underruns", 0)), 0), 1000)
+        underrun_s = min(max(float(message.get("underrun_ms", 0)), 0.0), 600000.0) / 1000
+    except (TypeError, ValueError):
+        return
+    if underruns:
+        metrics.CLIENT_AUDIO_UNDERRUNS.inc(underruns, persona=game.persona_id)
+        metrics.CLIENT_AUDIO_UNDERRUN_SECONDS.inc(underrun_s, persona=game.persona_id)
+
+async def open_upstream(link):
+    if upstream_warm_up is not None:
+        await asyncio.shield(upstream_warm_up)  # a game arriving during warm-up waits for it
+    return await link.open()
+
+async def send_prompt(game, link, text, reply=None):
+    """Send the player's turn upstream. If the upstream context lost its opening turns
+    (compressed, or a fresh session), the game summary goes first. With a `reply`
+    (a speculative turn already relayed) both are added to the history without
+    generating."""
+    parts = [{"text": text}]
+    if link.needs_summary:
+        link.needs_summary = False
+        parts.insert(0, {"text": game.summary.render(game.question_count)})
+    if reply is not None:
+        await link.session.send_client_content(
+            turns=[{"role": "user", "parts": parts}, {"role": "model", "parts": [{"text": reply}]}],
+            turn_complete=False
+        )
+        return
+    await link.session.send_client_content(
+        turns={"role": "user", "parts": parts},
+        turn_complete=True
+    )
+
+def answer_prompt(game, answer):
+    """Prompt for the player's answer to a regular question (not a guess)."""
+    prompt_text = f"[Answered {game.question_count}/{game.question_limit}] {answer}"
+    # Add emotional context based on answer
+    ans_lower = answer.lower()
+    if ans_lower in ["no", "probably not", "don't know"]:
+        prompt_text += " (The user answered negatively. Express disappointment briefly, then ask your next question.)"
+    elif ans_lower in ["yes", "probably"]:
+        prompt_text += " (The user answered positively! Express excitement briefly, then ask your next question.)"
+    else:
+        prompt_text += " (Ask your next question.)"
+    return prompt_text
+
+def last_question_note(question_limit):
+    return f" (This is question {question_limit}/{question_limit}. You MUST make a guess now.)"
+
+def speculate(game, question):
+    """Start generating the replies to the likely answers to `question`, which the
+    player is still listening to (see speculation.py)."""
+    if (not speculator.enabled or game.engine is not None or game.is_final_guess
+            or game.awaiting_play_again or game.player_won):
+        return None
+    last_question = game.question_count == game.question_limit
+    seed = [
+        {"role": "user", "parts": [{"text": game.summary.render(game.question_count)}]},
+        {"role": "model", "parts": [{"text": question}]},
+    ]
+    return speculator.start(
+        (game.persona_id, game.mode), seed,
+        lambda answer: answer_prompt(game, answer) + (last_question_note(game.question_limit) if last_question else "")
+    )
+
+async def run_game(game):
+    """Play one game on its own upstream session. Returns the close code for the client."""
+    outcome = "abandoned"
+    try:
+        # Opt-in recording of the game's upstream and client messages (ORACLE_CAPTURE_DIR)
+        game.capture = await asyncio.to_thread(open_capture, game.id)
+        if game.capture is not None:
+            game.capture.start({
+                "game_id": game.id,
+                "started_at": time.time(),
+                "backend": backend.name,
+                "persona_id": game.persona_id,
+                "player_name": game.player_name,
+                "question_count_limit": game.question_limit,
+                "mode": game.mode,
+            })
+        async with AsyncExitStack() as stack:
+            link = Upstream(session_pool, (game.persona_id, game.mode), build_resume_config)
+            stack.push_async_callback(link.close)
+            # Connect in the background so a cached greeting can play meanwhile
+            connecting = asyncio.create_task(open_upstream(link))
+            try:
+                await play_game(game, link, connecting)
+            finally:
+                # Don't leave a half-open upstream session behind if the game ended early
+                connecting.cancel()
+                if game.speculation is not None:
+                    game.speculation.cancel()
+                await asyncio.gather(connecting, return_exceptions=True)
+        return 1000
+    except SlowClientError as e:
+        game.logger.warning(f"Disconnecting slow client: {e}", phase="connection")
+        return 1008
+    except KeysExhaustedError as e:
+        game.logger.warning(f"No upstream capacity: {e}", phase="upstream")
+        game.send_json({"type": "server_busy", "message": "The oracle is overwhelmed. Please try again later."})
+        outcome = "error"
+        return 1013
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        game.logger.error(f"Error in game: {e}", phase="game")
+        outcome = "error"
+        return 1011
+    finally:
+        game_history.record(game.log.finish(outcome))
+        if game.capture is not None:
+            await asyncio.to_thread(game.capture.close)
+
+async def play_game(game, link, connecting):
+    persona_id = game.persona_id
+    question_limit = game.question_limit
+    voice = game.mode == MODE_VOICE
+
+    greeting_prompt = build_greeting_prompt(
+        game.player_name, question_limit,
+        use_name=greeting_cache.by_name or not greeting_cache.enabled
+    )
+    cached_greeting = await greeting_cache.get(persona_id, game.player_name)
+    greeting_pcm = []  # Collected on a cache miss so the greeting can be stored
+    GREETING_CACHE.inc(result="hit" if cached_greeting else "miss")
+    turn = TurnTimer(persona_id, "greeting")
+    last_answer = None  # what the player said before the current model turn
+    speculative = None  # SpeculativeTurn being relayed instead of a turn of our own session
+
+    if cached_greeting:
+        # Replay the cached greeting right away; the live session is still connecting
+        game.logger.info("Replaying cached greeting", phase="greeting")
+        session = None
+        upstream = cached_greeting.replay()
+    else:
+        session = await connecting
+        # Initial greeting - use send_client_content instead of deprecated send
+        game.logger.info("Starting game greeting", phase="greeting")
+        game.logger.debug("Prompt", phase="greeting", prompt=greeting_prompt)
+        await session.send_client_content(
+            turns={"role": "user", "parts": [{"text": greeting_prompt}]},
+            turn_complete=True
+        )
+        upstream = receive_turn(link)
+    
+    # Main Game Loop
+    while True:
+        # Receive response from Gemini (Streamed)
+        text_accumulated = ""
+        parser = TurnParser()  # spots the question or guess while the turn streams
+        turn_end = None  # "complete", or "interrupted" when the player barged in
+        
+        async for response in upstream:
+            # Barge-in: the player answered the detected question (or guess) while it
+            # was still being spoken. Stop relaying and finish the turn here. A
+            # turn_complete ends the turn anyway: handled normally, nothing is left to drain.
+            server_content = response.server_content
+            if parser.kind is not None and not game.awaiting_ready and not game.inbox.empty() \
+                    and not (server_content and server_content.turn_complete):
+                turn_end = "interrupted"
+                break
+            if game.capture is not None:
+                game.capture.upstream(response)
+
+            if response.data is not None and voice:
+                # Audio data received (PCM); a text game replaying a cached greeting skips it
+                game.send_audio(response.data)
+                turn.audio(len(response.data))
+                if game.awaiting_ready and session is not None:
+                    greeting_pcm.append(response.data)
+            
+            text_chunk = ""
+            # Get transcription if available
+            if response.server_content and response.server_content.output_transcription:
+                text_chunk += response.server_content.output_transcription.text
+            
+            # Also check model_turn for text parts
+            server_content = response.server_content
+            if server_content and server_content.model_turn:
+                for part in server_content.model_turn.parts:
+                    if part.text:
+                        text_chunk += part.text
+            
+            if text_chunk:
+                turn.text()
+                text_accumulated += text_chunk
+                game.send_json({
+                    "type": "text",
+                    "text": text_chunk
+                })
+                for event in parser.feed(text_chunk):
+                    announce_turn_event(game, event)
+
+            if server_content and server_content.turn_complete:
+                turn_end = "complete"
+                break
+
+        if turn_end is not None:
+            if turn_end == "interrupted":
+                elapsed = turn.interrupted()
+                game.logger.info("Player answered mid-turn", phase="barge_in")
+            else:
+                elapsed = turn.complete()
+                for event in parser.finish():
+                    announce_turn_event(game, event)
+            # Increment question count only for actual questions or guesses
+            # Skip counting during initial greeting
+            is_emotional_response = False
+            kind = "greeting"
+            if not game.awaiting_ready:
+                is_question = parser.kind == "question"
+                is_guess = parser.kind == "guess"
+                
+                if is_question or is_guess:
+                    game.question_count += 1
+                    kind = "guess" if is_guess else "question"
+                    if is_guess:
+                        game.summary.guessed(parser.guess)
+                    else:
+                        game.summary.asked(parser.question)
+                else:
+                    # No question mark and not a guess = emotional response
+                    is_emotional_response = True
+                    kind = "reaction"
+            if game.awaiting_play_again or game.player_won:
+                kind = "ending"  # after the outcome: taunt, "Who was it?", play again
+            game.log.turn(last_answer, text_accumulated, game.question_count, kind,
+                          turn.first_audio, elapsed, question=parser.question, guess=parser.guess)
+            game.logger.info("Turn complete", phase=kind, end=turn_end, elapsed_ms=round(elapsed * 1000),
+                             first_audio_ms=round(turn.first_audio * 1000) if turn.first_audio is not None else None)
+            game.logger.debug("Transcript", phase=kind, transcript=text_accumulated)
+            
+            # Check if this is the final guess
+            game.is_final_guess = (game.question_count > question_limit)
+            if voice:
+                game.end_audio_turn()
+            
+            if game.speculation is not None:
+                game.speculation.cancel()  # prepared for an earlier question
+                game.speculation = None
+            if turn_end == "complete" and kind == "question":
+                game.speculation = speculate(game, text_accumulated)
+
+            game.send_json({
+                "type": "turn_complete",
+                "question_count": game.question_count,
+                "player_won": game.player_won,
+                "is_final_guess": game.is_final_guess,
+                "awaiting_play_again": game.awaiting_play_again,
+                "awaiting_ready": game.awaiting_ready,
+                "is_emotional_response": is_emotional_response,
+                "interrupted": turn_end == "interrupted",
+                "guess": parser.guess if kind == "guess" else None
+            })
+            if game.awaiting_ready and session is not None and greeting_pcm:
+                write = asyncio.create_task(greeting_cache.put(
+                    persona_id, game.player_name, b"".join(greeting_pcm), text_accumulated
+                ))
+                greeting_writes.add(write)
+                write.add_done_callback(lambda task: greeting_written(game, task))
+                greeting_pcm = []
+
+        if session is None:
+            # Cached greeting finished; seed the live session with it without generating
+            session = await connecting
+            await session.send_client_content(
+                turns=[
+                    {"role": "user", "parts": [{"text": greeting_prompt}]},
+                    {"role": "model", "parts": [{"text": cached_greeting.transcript}]}
+                ],
+                turn_complete=False
+            )
+        # A cut turn is still streaming upstream until our answer interrupts it
+        drain = turn_end == "interrupted"
+        if speculative is not None:
+            # The turn came from a side session: add it to our own session's history
+            speculative.cancel()
+            await send_prompt(game, link, speculative.prompt, reply=text_accumulated)
+            speculative = None
+            drain = False
+        upstream = receive_turn(link, drain=drain)
+        
+        # Wait for user input (possibly from a client that reconnected meanwhile)
+        user_msg = await game.inbox.get()
+        turn = TurnTimer(persona_id)
+        if game.capture is not None:
+            game.capture.client(user_msg)
+        if game.speculation is not None and user_msg.get("type") != "answer":
+            game.speculation.cancel()
+            game.speculation = None
+        if user_msg.get("barge_in"):
+            # The client stopped playback to answer; don't send it the rest of the old turn
+            skipped = game.drop_audio()
+            metrics.BARGE_IN_SKIPPED_BYTES.inc(skipped, persona=persona_id)
+            game.send_json({"type": "interrupted"})
+
+        if link.rotation_due:
+            # Going away, or old enough to rotate: swap sessions before the next prompt
+            reason = "server going away" if link.going_away else f"{link.turns} turns"
+            await link.rotate()
+            session = link.session
+            upstream = receive_turn(link)
+            game.logger.info(f"New upstream session ({reason})", phase="upstream",
+                             resumed=not link.needs_summary)
+        
+        if user_msg.get("type") == "answer":
+            user_answer = user_msg.get("message", "")
+            last_answer = user_answer
+            client_question_num = user_msg.get("question_number", 0)
+            
+            # Handle initial ready response
+            if game.awaiting_ready:
+                ans_lower = user_answer.lower()
+                if ans_lower == "no":
+                    # Player chose not to play, close connection
+                    game.logger.info("Player declined to play", phase="ready")
+                    metrics.GAMES.inc(outcome="declined")
+                    game.log.outcome = "declined"
+                    break
+                # Player said Yes, continue with first question
+                game.awaiting_ready = False
+                prompt_text = "The user is ready. Ask your first question to start narrowing down who they're thinking of."
+                if game.engine is not None:
+                    prompt_text += engine_line(game)
+                game.logger.info("Starting interrogation", phase="ready")
+                game.logger.debug("Prompt", phase="ready", prompt=prompt_text)
+                await send_prompt(game, link, prompt_text)
+                continue
+            
+            # Validate sync - if client is out of sync, resync
+            if client_question_num != game.question_count:
+                game.logger.warning(f"Question count mismatch, resyncing (client is at {client_question_num})",
+                                    phase="resync")
+                # Send resync message
+                game.send_json({
+                    "type": "resync",
+                    "question_count": game.question_count,
+                    "message": "Question count out of sync. Resyncing..."
+                })
+                # Don't process this answer, wait for resync
+                continue
+            
+            # Handle "Continue" button for emotional responses
+            if user_answer.lower() == "continue":
+                prompt_text = f"[Answered {game.question_count}/{question_limit}] Ask your next question."
+                phase = "continue"
+            else:
+                prompt_text = answer_prompt(game, user_answer)
+                game.summary.answered(user_answer)
+                ans_lower = user_answer.lower()
+                phase = "question"
+            
+            # Feed the answer to the question engine
+            if game.engine is not None and game.engine_move is not None and user_answer.lower() != "continue":
+                move, game.engine_move = game.engine_move, None
+                if not move.is_guess:
+                    game.engine.update(move.index, user_answer)
+                elif user_answer.lower() == "yes":
+                    game.is_final_guess = True  # The engine's guess was right
+                else:
+                    game.engine.reject(move.index)
+                    if game.question_count >= question_limit:
+                        game.is_final_guess = True  # Wrong guess with no questions left
+
+            # Handle final guess response
+            if game.is_final_guess:
+                if ans_lower in ["yes"]:
+                    # AI won! Set flag for play again
+                    game.awaiting_play_again = True
+                    metrics.GAMES.inc(outcome="ai_won")
+                    game.log.outcome = "ai_won"
+                    prompt_text += " (You WON! Boast about your victory, make a joke or taunt, and ask 'Do you want to play again?')"
+                    phase = "ai_won"
+                else:
+                    # AI lost, ask who it was
+                    game.player_won = True
+                    metrics.GAMES.inc(outcome="player_won")
+                    game.log.outcome = "player_won"
+                    prompt_text += " (You LOST. Admit defeat and ask 'Who was it?')"
+                    phase = "player_won"
+                game.is_final_guess = False  # Reset the flag
+            elif game.question_count == question_limit:
+                prompt_text += last_question_note(question_limit)
+                phase = "last_chance"
+
+            if game.engine is not None and not (game.awaiting_play_again or game.player_won):
+                prompt_text += engine_line(game, must_guess=game.question_count >= question_limit)
+
+            if game.speculation is not None:
+                speculative = game.speculation.take(prompt_text)
+                game.speculation = None
+            game.logger.info("Answer received", phase=phase, answer=user_answer, speculative=speculative is not None)
+            game.logger.debug("Prompt", phase=phase, prompt=prompt_text)
+            if speculative is not None:
+                # The reply to this answer is already being generated on a side session
+                upstream = speculative.replay(persona_id)
+            else:
+                await send_prompt(game, link, prompt_text)
+        
+        elif user_msg.get("type") == "reveal":
+            character_name = user_msg.get("character_name")
+            game.log.revealed = character_name
+            last_answer = character_name
+            prompt = f"The user was thinking of: {character_name}. Make a comment about the character and ask 'Do you want to play again?'"
+            
+            game.logger.info("Character revealed", phase="reveal", character=character_name)
+            game.logger.debug("Prompt", phase="reveal", prompt=prompt)
+            
+            # Reset player_won and set awaiting_play_again
+            game.player_won = False
+            game.awaiting_play_again = True
+            
+            await send_prompt(game, link, prompt)
+        
+        elif user_msg.get("type") == "restart":
+            # Break the inner loop to restart the connection/session logic if needed
+            # For now, we can just close and let client reconnect
+            break
 
 if __name__ == "__main__":
+    # Development server with auto-reload; run serve.py in production
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
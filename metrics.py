@@ -0,0 +1,259 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (served on /metrics).
+
+Counters, gauges and histograms support labels passed as keyword arguments:
+
+    GAMES.inc(outcome="player_won")
+    TURN_FIRST_AUDIO.observe(0.42, persona="genie", kind="answer")
+
+Game metrics used across the server are defined at the bottom of this module.
+"""
+import time
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[n] for n in self.labelnames)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge(Metric):
+    """Gauge whose value is read from a function at scrape time. With labels, the
+    function returns a dict of label value tuples to values."""
+    kind = "gauge"
+
+    def __init__(self, name, help, func, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.func = func
+
+    def samples(self):
+        if not self.labelnames:
+            yield self.name, "", self.func()
+            return
+        for key, value in self.func().items():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames, key, ("le", _format_value(bound))),
+                       cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def callback_gauge(name, help, func, labelnames=()):
+    return REGISTRY.register(CallbackGauge(name, help, func, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+# --- Game metrics -------------------------------------------------------------
+
+ACTIVE_SESSIONS = gauge("oracle_active_sessions", "Games currently connected")
+GAMES = counter("oracle_games_total", "Finished games by outcome (player_won, ai_won, declined)", ["outcome"])
+
+# kind="answer" turns are timed from the player's answer; kind="greeting" from start_game,
+# so they include connecting upstream (or replaying a cached greeting)
+TURN_FIRST_AUDIO = histogram("oracle_turn_first_audio_seconds",
+                             "Player answer (or start_game) to first audio byte relayed", ["persona", "kind"])
+TURN_FIRST_TEXT = histogram("oracle_turn_first_text_seconds",
+                            "Player answer (or start_game) to first transcript text relayed", ["persona", "kind"])
+TURN_COMPLETE = histogram("oracle_turn_complete_seconds",
+                          "Player answer (or start_game) to turn_complete", ["persona", "kind"])
+TURNS = counter("oracle_turns_total", "Model turns relayed", ["persona"])
+AUDIO_BYTES = counter("oracle_audio_bytes_total", "PCM bytes relayed from upstream", ["persona"])
+AUDIO_CHUNKS = counter("oracle_audio_chunks_total", "Audio chunks received from upstream", ["persona"])
+AUDIO_DROPPED_BYTES = counter("oracle_audio_dropped_bytes_total",
+                              "Queued audio discarded for slow clients")
+ADMISSIONS = counter("oracle_admissions_total",
+                     "New-game admission outcomes (immediate, queued, rejected, abandoned)", ["result"])
+ADMISSION_WAIT = histogram("oracle_admission_wait_seconds", "Time queued players waited for a slot",
+                           buckets=(1, 5, 10, 30, 60, 120, 300, 600))
+HISTORY_WRITTEN = counter("oracle_history_games_written_total", "Games written to the history database")
+HISTORY_DROPPED = counter("oracle_history_games_dropped_total",
+                          "Finished games not written (writer backlog full or write error)")
+BARGE_INS = counter("oracle_barge_ins_total",
+                    "Model turns cut short because the player answered mid-speech", ["persona"])
+BARGE_IN_SKIPPED_BYTES = counter("oracle_barge_in_skipped_bytes_total",
+                                 "Queued audio discarded when the player barged in", ["persona"])
+TURN_PROMPT_TOKENS = histogram("oracle_turn_prompt_tokens", "Upstream context size of a model turn (prompt tokens)",
+                               ["persona"], buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000))
+CONTEXT_COMPACTIONS = counter("oracle_context_compactions_total",
+                              "Upstream context compressions detected (prompt tokens fell between turns)", ["persona"])
+UPSTREAM_ROTATIONS = counter("oracle_upstream_rotations_total",
+                             "Upstream sessions replaced mid-game, by reason (go_away, turns) "
+                             "and result (resumed, fresh)", ["reason", "result"])
+SPECULATIONS = counter("oracle_speculations_total",
+                       "Speculative next turns: player answers that used one (hit) or not (miss), and "
+                       "side turns not started for lack of budget (skipped) or that failed", ["result"])
+SPECULATION_SAVED = histogram("oracle_speculation_saved_seconds",
+                              "First-output latency saved by speculative turns that were used", ["persona"])
+CLIENT_AUDIO_UNDERRUNS = counter("oracle_client_audio_underruns_total",
+                                 "Playback underruns reported by clients (jitter buffer ran dry mid-turn)",
+                                 ["persona"])
+CLIENT_AUDIO_UNDERRUN_SECONDS = counter("oracle_client_audio_underrun_seconds_total",
+                                        "Silence heard by players while playback was underrun", ["persona"])
+LOG_RECORDS_DROPPED = counter("oracle_log_records_dropped_total",
+                              "Log records dropped because the log writer fell behind")
+UPSTREAM_KEY_FAILURES = counter("oracle_upstream_key_failures_total",
+                                "Live connects refused on an API key, by reason (quota, auth, connection)",
+                                ["key", "reason"])
+UPSTREAM_KEYS_EXHAUSTED = counter("oracle_upstream_keys_exhausted_total",
+                                  "Live connects refused because no API key had a free session slot")
+RESUMES = counter("oracle_resumes_total",
+                  "Reconnect attempts and detached games (resumed, unknown, expired)", ["result"])
+
+
+class TurnTimer:
+    """Times one model turn from the player's answer (or start_game) to turn_complete.
+    `kind` is "answer", or "greeting" for the turn start_game begins."""
+
+    def __init__(self, persona, kind="answer"):
+        self.persona = persona
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.first_audio = None
+        self.first_text = None
+        self.audio_bytes = 0
+        self.audio_chunks = 0
+
+    def audio(self, nbytes):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter() - self.start
+            TURN_FIRST_AUDIO.observe(self.first_audio, persona=self.persona, kind=self.kind)
+        self.audio_bytes += nbytes
+        self.audio_chunks += 1
+
+    def text(self):
+        if self.first_text is None:
+            self.first_text = time.perf_counter() - self.start
+            TURN_FIRST_TEXT.observe(self.first_text, persona=self.persona, kind=self.kind)
+
+    def complete(self):
+        elapsed = time.perf_counter() - self.start
+        TURN_COMPLETE.observe(elapsed, persona=self.persona, kind=self.kind)
+        TURNS.inc(persona=self.persona)
+        AUDIO_BYTES.inc(self.audio_bytes, persona=self.persona)
+        AUDIO_CHUNKS.inc(self.audio_chunks, persona=self.persona)
+        return elapsed
+
+    def interrupted(self):
+        """The player barged in: count what was relayed, but not as a completed turn."""
+        BARGE_INS.inc(persona=self.persona)
+        AUDIO_BYTES.inc(self.audio_bytes, persona=self.persona)
+        AUDIO_CHUNKS.inc(self.audio_chunks, persona=self.persona)
+        return time.perf_counter() - self.start
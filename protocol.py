@@ -0,0 +1,102 @@
+"""
+Wire format helpers for the /ws game protocol.
+
+Control and text messages are JSON. When the client sets "binary_audio": true in
+its start_game message, audio is sent as raw binary WebSocket frames instead of
+base64 inside JSON:
+
+    offset  size  field
+    0       1     frame type (FRAME_AUDIO)
+    1       1     codec id (audio_codec.CODEC_IDS; 0 = 16-bit PCM)
+    2       2     reserved (keeps the PCM payload 2-byte aligned for Int16Array)
+    4       ...   audio payload, 24 kHz mono, in the negotiated encoding
+
+JSON audio messages carry the same payload base64-encoded, plus "encoding" when it
+isn't pcm16.
+
+Clients that also set "sequenced_audio": true get FRAME_AUDIO_SEQ frames, which
+number the audio and place it within the model turn:
+
+    offset  size  field
+    0       1     frame type (FRAME_AUDIO_SEQ)
+    1       1     codec id
+    2       2     flags (FLAG_END_OF_TURN)
+    4       4     sequence number, counting every audio frame on this connection from 0
+    8       4     offset of the first sample within the model turn
+    12      ...   audio payload
+
+The last frame of every model turn is an empty one with FLAG_END_OF_TURN set; its
+offset is the turn's length in samples. JSON audio messages carry the same fields as
+"seq", "offset" and "end". A gap between one frame's offset plus its samples and
+the next frame's offset is audio the server dropped (slow client, barge-in).
+Offsets restart at 0 when a resumed connection replays the rest of a turn.
+"""
+import asyncio
+import base64
+import struct
+
+from audio_codec import CODEC_IDS, ENCODING_ADPCM, ENCODING_PCM16, encode
+
+FRAME_AUDIO = 0x01
+FRAME_AUDIO_SEQ = 0x02
+
+AUDIO_HEADER = struct.Struct("<BBH")
+AUDIO_SEQ_HEADER = struct.Struct("<BBHII")
+
+FLAG_END_OF_TURN = 0x0001
+
+TRANSPORT_JSON = "json"
+TRANSPORT_BINARY = "binary"
+
+
+def negotiate_transport(start_msg):
+    """Pick the audio transport for a game from the client's start_game message."""
+    if start_msg.get("binary_audio"):
+        return TRANSPORT_BINARY
+    return TRANSPORT_JSON
+
+
+def negotiate_sequencing(start_msg):
+    """Whether the client wants sequence numbers, turn offsets and end-of-turn frames."""
+    return bool(start_msg.get("sequenced_audio"))
+
+
+def encode_audio_frame(payload, codec=0, seq=None, offset=0, end=False):
+    """Build a binary audio frame: fixed header followed by the encoded payload.
+    With a sequence number the frame is a FRAME_AUDIO_SEQ frame."""
+    if seq is None:
+        return AUDIO_HEADER.pack(FRAME_AUDIO, codec, 0) + payload
+    flags = FLAG_END_OF_TURN if end else 0
+    return AUDIO_SEQ_HEADER.pack(FRAME_AUDIO_SEQ, codec, flags, seq, offset) + payload
+
+
+def encode_audio_json(payload, encoding=ENCODING_PCM16, seq=None, offset=0, end=False):
+    """JSON audio message with base64 payload (older clients)."""
+    message = {
+        "type": "audio",
+        "audio": base64.b64encode(payload).decode('utf-8')
+    }
+    if encoding != ENCODING_PCM16:
+        message["encoding"] = encoding
+    if seq is not None:
+        message["seq"] = seq
+        message["offset"] = offset
+        if end:
+            message["end"] = True
+    return message
+
+
+async def send_audio(websocket, transport, pcm, encoding=ENCODING_PCM16, seq=None, offset=0, end=False):
+    """Encode one PCM chunk and send it using the negotiated transport. An end-of-turn
+    frame has no audio."""
+    if encoding == ENCODING_PCM16 or not pcm:
+        payload = pcm
+    elif encoding == ENCODING_ADPCM:
+        # About 1 ms of NumPy per frame: encode in a thread so other games keep relaying
+        payload = await asyncio.to_thread(encode, pcm, encoding)
+    else:
+        payload = encode(pcm, encoding)
+    if transport == TRANSPORT_BINARY:
+        await websocket.send_bytes(encode_audio_frame(payload, CODEC_IDS[encoding], seq, offset, end))
+    else:
+        await websocket.send_json(encode_audio_json(payload, encoding, seq, offset, end))
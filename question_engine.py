@@ -0,0 +1,248 @@
+"""
+Akinator-style question engine: picks the next yes/no question by expected
+information gain over a character x attribute knowledge base.
+
+The knowledge base holds, for every character c and attribute (question) a, the
+probability q[c, a] that the answer is "yes", quantized to uint8 (0..255). Player
+answers are noisy, so each of the five answers has a likelihood that is linear in q:
+
+    P(answer | q) = FALSE[answer] + (TRUE[answer] - FALSE[answer]) * q
+
+A game keeps a posterior over the characters that are still plausible. Answering
+multiplies it by one contiguous knowledge-base column (q is stored attribute-major
+for this) and prunes characters that fell far behind the leader. The next question
+maximizes
+
+    EIG(a) = H(P(answer | a)) - E_c[H(P(answer | q[c, a]))]
+
+The first term only needs the posterior mean of q per attribute. The second uses
+a quadratic fit of the answer entropy in q, so E[q^2] is the only other statistic
+needed. Both come from one matrix product over the candidates. When more than
+`sample_size` candidates remain, a sample of them drawn in proportion to their
+posterior (with replacement) is used instead, each draw weighted equally. This
+keeps selection bounded no matter how large the knowledge base is; see
+benchmarks/bench_question_engine.py.
+
+Knowledge bases are .npz files with `names` (N), `questions` (A) and `probs`
+(N x A uint8), or CSV files with a `name` column followed by one column per
+question holding probabilities in [0, 1].
+"""
+import csv
+
+import numpy as np
+
+ANSWERS = ["yes", "probably", "don't know", "probably not", "no"]
+
+# Answer distributions for a character the attribute is definitely true / false for
+TRUE_PROFILE = np.array([0.75, 0.15, 0.05, 0.03, 0.02], dtype=np.float32)
+FALSE_PROFILE = TRUE_PROFILE[::-1].copy()
+
+GUESS_THRESHOLD = 0.8  # guess once the leading character is this likely
+PRUNE_RATIO = 1e-4     # drop characters this far below the leader
+SAMPLE_SIZE = 256      # candidates scored per selection at most
+SAMPLE_BLOCK = 64      # weights per block when drawing the sample (see _weighted_sample)
+
+
+def _entropy(p, axis=0):
+    return -(p * np.log(np.maximum(p, 1e-12))).sum(axis=axis)
+
+
+def _fit_answer_entropy():
+    # H(P(answer | q)) is symmetric in q around 0.5; fit H0 + k * 4q(1 - q)
+    def h(q):
+        return float(_entropy(FALSE_PROFILE + (TRUE_PROFILE - FALSE_PROFILE) * q))
+    h0 = h(0.0)
+    return h0, h(0.5) - h0
+
+
+_H0, _H_SPREAD = _fit_answer_entropy()
+
+
+def _weighted_sample(weights, k, rng, block=SAMPLE_BLOCK):
+    """k sorted indices drawn with replacement in proportion to `weights`.
+
+    Inverse-CDF sampling in two levels: a draw first picks a block of `block`
+    weights by the blocks' sums, then a weight within its block. Only the blocks
+    drawn get a cumulative sum, which keeps this well under a full np.cumsum over
+    100k candidates (that alone takes about 1 ms).
+    """
+    n = len(weights)
+    starts = np.arange(0, n, block)
+    sums = np.add.reduceat(weights, starts).astype(np.float64)
+    cdf = np.cumsum(sums)
+    u = np.sort(rng.random(k)) * cdf[-1]
+    blocks = np.minimum(np.searchsorted(cdf, u, side="right"), len(cdf) - 1)
+    into = (u - (cdf[blocks] - sums[blocks])).astype(np.float32)  # mass into the block
+    pad = -n % block
+    padded = np.concatenate([weights, np.zeros(pad, weights.dtype)]) if pad else weights
+    local = np.cumsum(padded.reshape(-1, block)[blocks], axis=1)
+    offset = np.count_nonzero(local <= into[:, None], axis=1)
+    return np.minimum(blocks * block + offset, n - 1)
+
+
+def answer_index(answer):
+    """Index of a player's answer in ANSWERS (None for anything else, e.g. "Continue")."""
+    answer = answer.strip().lower()
+    return ANSWERS.index(answer) if answer in ANSWERS else None
+
+
+class KnowledgeBase:
+    def __init__(self, names, questions, probs):
+        probs = np.asarray(probs)
+        if probs.dtype != np.uint8:
+            probs = np.clip(np.rint(probs * 255), 0, 255).astype(np.uint8)
+        if probs.shape != (len(names), len(questions)):
+            raise ValueError(f"probs shape {probs.shape} does not match "
+                             f"{len(names)} names x {len(questions)} questions")
+        self.names = list(names)
+        self.questions = list(questions)
+        self.by_character = np.ascontiguousarray(probs)    # rows gathered for selection
+        self.by_attribute = np.ascontiguousarray(probs.T)  # columns read on every answer
+
+    @property
+    def shape(self):
+        return self.by_character.shape
+
+    @classmethod
+    def load(cls, path):
+        if str(path).endswith(".csv"):
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+            header, body = rows[0], [r for r in rows[1:] if r]
+            probs = np.array([[float(v) for v in r[1:]] for r in body], dtype=np.float32)
+            return cls([r[0] for r in body], header[1:], probs)
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["questions"].tolist(), data["probs"])
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names), questions=np.array(self.questions),
+                 probs=self.by_character)
+
+    @classmethod
+    def synthetic(cls, n_characters, n_attributes, seed=0):
+        """Random, mostly clear-cut knowledge base for benchmarks."""
+        rng = np.random.default_rng(seed)
+        base = (rng.random(n_attributes) * 0.8 + 0.1).astype(np.float32)  # how common each attribute is
+        probs = np.empty((n_characters, n_attributes), dtype=np.uint8)
+        for start in range(0, n_characters, 8192):  # in slices to bound temporary memory
+            block = probs[start:start + 8192]
+            block[:] = (rng.random(block.shape, dtype=np.float32) < base) * np.uint8(235) + np.uint8(10)
+            fuzzy = rng.random(block.shape, dtype=np.float32) < 0.05
+            block[fuzzy] = rng.integers(60, 196, fuzzy.sum(), dtype=np.uint8)
+        return cls([f"Character {i}" for i in range(n_characters)],
+                   [f"Attribute {j}?" for j in range(n_attributes)], probs)
+
+
+class Move:
+    """The engine's next line: a question (attribute index) or a guess (character index)."""
+
+    def __init__(self, kind, index, text, confidence):
+        self.kind = kind
+        self.index = index
+        self.text = text
+        self.confidence = confidence
+
+    @property
+    def is_guess(self):
+        return self.kind == "guess"
+
+
+class QuestionEngine:
+    """Posterior over one game's candidates. Not thread-safe; one per game."""
+
+    def __init__(self, kb, guess_threshold=GUESS_THRESHOLD, sample_size=SAMPLE_SIZE, seed=None):
+        self.kb = kb
+        self.guess_threshold = guess_threshold
+        self.sample_size = sample_size
+        self._rng = np.random.default_rng(seed)
+        n_characters, n_attributes = kb.shape
+        self.active = None  # None: every character, else sorted candidate indices
+        self.weights = np.ones(n_characters, dtype=np.float32)  # unnormalized, max == 1
+        self.asked = np.zeros(n_attributes, dtype=bool)
+        self.rejected = 0
+
+    @property
+    def candidates(self):
+        """Characters still plausible (within PRUNE_RATIO of the leader)."""
+        return int(np.count_nonzero(self.weights >= PRUNE_RATIO))
+
+    def update(self, attribute, answer):
+        """Bayesian update of the posterior for one answered question."""
+        k = answer_index(answer) if isinstance(answer, str) else answer
+        self.asked[attribute] = True
+        if k is None:
+            return
+        column = self.kb.by_attribute[attribute]
+        if self.active is not None:
+            column = column[self.active]
+        slope = (TRUE_PROFILE[k] - FALSE_PROFILE[k]) / 255
+        likelihood = column.astype(np.float32)
+        likelihood *= slope
+        likelihood += FALSE_PROFILE[k]
+        self.weights *= likelihood
+        self._prune()
+
+    def reject(self, character):
+        """The player said a guess was wrong: rule that character out."""
+        self.rejected += 1
+        if self.active is None:
+            self.weights[character] = 0
+        else:
+            self.weights[self.active == character] = 0
+        self._prune()
+
+    def _prune(self):
+        top = self.weights.max()
+        if top <= 0:
+            # Everything ruled out (answers contradict the knowledge base); start over
+            self.active = None
+            self.weights = np.ones(self.kb.shape[0], dtype=np.float32)
+            return
+        self.weights /= top  # keep the leader at 1 so products never underflow
+        keep = self.weights >= PRUNE_RATIO
+        # Compact only when it at least halves the set, so copying stays O(N) per game;
+        # stragglers left behind carry negligible weight
+        if np.count_nonzero(keep) <= len(keep) // 2:
+            kept = np.flatnonzero(keep)
+            self.active = kept if self.active is None else self.active[kept]
+            self.weights = self.weights[kept]
+
+    def _character(self, i):
+        return i if self.active is None else int(self.active[i])
+
+    def leader(self):
+        """(character index, posterior probability) of the most likely character."""
+        i = int(self.weights.argmax())
+        return self._character(i), float(self.weights[i] / self.weights.sum())
+
+    def best_question(self):
+        """Unasked attribute with the highest expected information gain (None if exhausted)."""
+        if self.asked.all():
+            return None
+        if len(self.weights) <= self.sample_size:
+            picks, w = slice(None), self.weights
+        else:
+            # Drawn in proportion to the posterior, so each draw counts equally
+            picks = _weighted_sample(self.weights, self.sample_size, self._rng)
+            w = np.ones(self.sample_size, dtype=np.float32)
+        rows = picks if self.active is None else self.active[picks]
+        w = w / (w.sum() * 255)  # normalized, and folds in the uint8 scale
+        q = self.kb.by_character[rows].astype(np.float32)
+        mean_q = w @ q
+        np.square(q, out=q)
+        mean_q2 = (w / 255) @ q
+
+        predicted = FALSE_PROFILE[:, None] + (TRUE_PROFILE - FALSE_PROFILE)[:, None] * mean_q
+        expected_h = _H0 + _H_SPREAD * 4 * (mean_q - mean_q2)
+        gain = _entropy(predicted) - expected_h
+        gain[self.asked] = -np.inf
+        return int(gain.argmax())
+
+    def next_move(self, must_guess=False):
+        character, confidence = self.leader()
+        if must_guess or confidence >= self.guess_threshold:
+            return Move("guess", character, self.kb.names[character], confidence)
+        attribute = self.best_question()
+        if attribute is None:
+            return Move("guess", character, self.kb.names[character], confidence)
+        return Move("question", attribute, self.kb.questions[attribute], confidence)
@@ -0,0 +1,201 @@
+"""
+Downstream pump: relays queued messages to the game's WebSocket from its own task.
+
+The game loop reads `session.receive()` and hands every chunk to a ClientSender
+without awaiting the client, so one slow client can't stall reads from the
+upstream session. Audio chunks that pile up while the client is behind are
+merged into larger frames. For clients that asked for sequenced audio (see
+protocol.py) the sender numbers the frames it sends, tracks where each one starts
+within the model turn and sends an end-of-turn frame for every end_turn(). Queued audio is bounded; once a client falls further
+behind than that, the slow-client policy applies:
+
+    drop        discard the oldest queued audio (control and text are never dropped)
+    disconnect  close the client with 1008 and end the game
+
+Configuration (environment):
+    ORACLE_SEND_BUFFER_BYTES    queued audio allowed per client (default: ~40 s of PCM)
+    ORACLE_SLOW_CLIENT_POLICY   drop | disconnect (default: drop)
+    ORACLE_AUDIO_MERGE_BYTES    largest merged audio frame (default: 32768)
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+
+from audio_codec import ENCODING_PCM16
+from protocol import send_audio
+from metrics import AUDIO_DROPPED_BYTES
+
+POLICY_DROP = "drop"
+POLICY_DISCONNECT = "disconnect"
+
+_AUDIO = 0
+_JSON = 1
+_CLOSE = 2
+_END = 3
+
+# Stands for an end-of-turn frame in take_pending() results and game backlogs
+END_OF_TURN = object()
+
+
+class SlowClientError(Exception):
+    """The client fell too far behind and the policy is to disconnect it."""
+
+
+class ClientSender:
+    def __init__(self, websocket, transport, encoding=ENCODING_PCM16, max_buffer_bytes=None,
+                 policy=None, merge_bytes=None, sequenced=False):
+        self.websocket = websocket
+        self.transport = transport
+        self.encoding = encoding
+        self.sequenced = sequenced
+        self.max_buffer_bytes = int(max_buffer_bytes if max_buffer_bytes is not None
+                                    else os.getenv("ORACLE_SEND_BUFFER_BYTES", 24000 * 2 * 40))
+        self.policy = policy or os.getenv("ORACLE_SLOW_CLIENT_POLICY", POLICY_DROP)
+        self.merge_bytes = int(merge_bytes if merge_bytes is not None
+                               else os.getenv("ORACLE_AUDIO_MERGE_BYTES", 32768))
+        self._queue = deque()
+        self._buffered = 0  # audio bytes waiting in the queue
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = None
+        self._error = None
+        self.frames_sent = 0
+        self.bytes_dropped = 0
+        self._seq = 0            # next audio frame's sequence number
+        self._turn_samples = 0   # samples queued so far in the current model turn
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def _push(self, item):
+        self._queue.append(item)
+        self._idle.clear()
+        self._wake.set()
+
+    def send_audio(self, pcm):
+        """Queue an audio chunk; never waits on the client."""
+        self._check()
+        tail = self._queue[-1] if self._queue else None
+        if tail is not None and tail[0] == _AUDIO and len(tail[1]) + len(pcm) <= self.merge_bytes:
+            tail[1].extend(pcm)
+        else:
+            self._push([_AUDIO, bytearray(pcm), self._turn_samples])
+        self._turn_samples += len(pcm) // 2
+        self._buffered += len(pcm)
+        if self._buffered > self.max_buffer_bytes:
+            self._overflow()
+
+    def end_turn(self):
+        """Queue the end of the model turn's audio. Never dropped with queued audio."""
+        self._check()
+        self._push([_END, None, self._turn_samples])
+        self._turn_samples = 0
+
+    def send_json(self, message):
+        """Queue a control or text message; these are never dropped."""
+        self._check()
+        self._push([_JSON, message, None])
+
+    def take_pending(self):
+        """Remove and return everything not yet sent: PCM as bytes, JSON as dicts and
+        END_OF_TURN for turn ends."""
+        pending = [bytes(payload) if kind == _AUDIO else END_OF_TURN if kind == _END else payload
+                   for kind, payload, _ in self._queue if kind != _CLOSE]
+        self._queue.clear()
+        self._buffered = 0
+        return pending
+
+    def drop_audio(self):
+        """Discard queued audio (the player barged in); returns the bytes dropped."""
+        dropped = self._buffered
+        self._queue = deque(item for item in self._queue if item[0] != _AUDIO)
+        self._buffered = 0
+        return dropped
+
+    def _overflow(self):
+        if self.policy == POLICY_DISCONNECT:
+            self._error = SlowClientError(
+                f"client is {self._buffered} bytes behind (limit {self.max_buffer_bytes})"
+            )
+            raise self._error
+        # Drop the oldest queued audio until back under the limit
+        kept = deque()
+        while self._queue and self._buffered > self.max_buffer_bytes:
+            item = self._queue.popleft()
+            if item[0] == _AUDIO:
+                self._buffered -= len(item[1])
+                self.bytes_dropped += len(item[1])
+                AUDIO_DROPPED_BYTES.inc(len(item[1]))
+            else:
+                kept.append(item)
+        kept.extend(self._queue)
+        self._queue = kept
+        logging.warning(f"Slow client: dropped queued audio ({self.bytes_dropped} bytes so far)")
+
+    async def _run(self):
+        try:
+            while True:
+                if not self._queue:
+                    self._idle.set()
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                kind, payload, offset = self._queue.popleft()
+                if kind == _AUDIO:
+                    self._buffered -= len(payload)
+                    # Encoded after merging, so compression runs once per outgoing frame
+                    await send_audio(self.websocket, self.transport, bytes(payload), self.encoding,
+                                     *self._sequence(offset))
+                elif kind == _END:
+                    if not self.sequenced:
+                        continue  # older clients only learn of turn ends from turn_complete
+                    await send_audio(self.websocket, self.transport, b"", self.encoding,
+                                     *self._sequence(offset), end=True)
+                elif kind == _JSON:
+                    await self.websocket.send_json(payload)
+                else:
+                    await self.websocket.close(code=payload)
+                    return
+                self.frames_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+            self._idle.set()
+
+    def _sequence(self, offset):
+        # (seq, offset) arguments of send_audio for the next audio frame
+        if not self.sequenced:
+            return None, 0
+        seq, self._seq = self._seq, self._seq + 1
+        return seq, offset
+
+    async def flush(self, timeout=5.0):
+        """Wait until everything queued so far has been sent (or the timeout passes)."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._check()
+
+    async def close(self, code=None, timeout=5.0):
+        """Stop the pump. With a code, send what is queued and then close the socket."""
+        if code is not None and self._error is None and self._task and not self._task.done():
+            self._push([_CLOSE, code, None])
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
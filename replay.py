@@ -0,0 +1,213 @@
+"""
+Replay captured games through the /ws endpoint.
+
+Capture games on any server with ORACLE_CAPTURE_DIR set (see capture.py), then play
+them back against a server on the replay backend:
+
+    # Real time, each capture once
+    python replay.py captures/ --spawn
+
+    # As fast as possible, 20 copies of each capture, 10 games at a time
+    python replay.py captures/ --spawn --speed 0 --repeat 20 --concurrency 10
+
+The driver plays the player's side. It sends the recorded start_game settings, then
+each recorded client message once the server has finished as many model turns as in
+the capture. A barge-in is sent instead once the cut turn's question or guess has
+been detected. At real speed the driver also waits the recorded think time. The
+server (ORACLE_BACKEND=replay) answers with the recorded model turns at the recorded
+pace, scaled by --speed. To replay against a server you started yourself, give it
+ORACLE_REPLAY_CAPTURES and ORACLE_REPLAY_SPEED matching the driver's arguments, and
+disable the greeting cache and speculation.
+
+Reported:
+    games/sec              completed replays per wall-clock second
+    answer -> first output answer to first audio frame (text message in text mode)
+    server CPU/game        as in loadtest.py, Linux only
+    mismatched turns       completed turns whose relayed text differs from the
+                           capture, i.e. a regression in the relay path
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+import websockets
+
+from capture import Capture, capture_paths
+from loadtest import percentile, process_cpu_seconds
+
+DETECTED = ("question_detected", "guess_detected")
+
+
+class Stats:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.turns = 0
+        self.mismatched = 0
+        self.first_mismatch = None
+        self.turn_output = []
+        self.errors = {}
+
+
+async def replay_game(args, capture, number, stats):
+    info = capture.info
+    mode = info.get("mode", "voice")
+    msg_start = {
+        "type": "start_game",
+        "persona_id": info.get("persona_id", "genie"),
+        "player_name": f"replay:{capture.id}:{number}",  # binds the server's replay session
+        "question_count_limit": info.get("question_count_limit", 20),
+        "mode": mode,
+        "binary_audio": True,
+    }
+    pending = deque(capture.client_messages)
+    turns_ended = 0
+    detected = False  # a question or guess was detected in the turn in progress
+    turn_text = []
+    t_sent = None
+
+    async with websockets.connect(args.url, max_size=None) as ws:
+        await ws.send(json.dumps(msg_start))
+        async for raw in ws:
+            msg = None if isinstance(raw, bytes) else json.loads(raw)
+            kind = msg.get("type") if msg else "audio"
+            if t_sent is not None and (kind == "audio" or (mode == "text" and kind == "text")):
+                stats.turn_output.append(time.perf_counter() - t_sent)
+                t_sent = None
+            if kind == "text":
+                turn_text.append(msg["text"])
+            elif kind in DETECTED:
+                detected = True
+            elif kind == "turn_complete":
+                if turns_ended < len(capture.turns) and not msg.get("interrupted"):
+                    expected = capture.turns[turns_ended]
+                    if expected.complete and "".join(turn_text) != expected.text:
+                        stats.mismatched += 1
+                        if stats.first_mismatch is None:
+                            stats.first_mismatch = (capture.id, turns_ended, expected.text, "".join(turn_text))
+                turns_ended += 1
+                stats.turns += 1
+                detected = False
+                turn_text = []
+
+            # Send every client message that is now due
+            while pending and pending[0].after_turns <= turns_ended and (
+                    not pending[0].cut or pending[0].after_turns < turns_ended or detected):
+                client = pending.popleft()
+                if args.speed > 0 and client.delay > 0:
+                    await asyncio.sleep(client.delay / args.speed)
+                await ws.send(json.dumps(client.message))
+                t_sent = time.perf_counter()
+            if not pending and turns_ended >= len(capture.turns):
+                break
+
+
+async def worker(args, jobs, stats):
+    while jobs:
+        capture, number = jobs.popleft()
+        try:
+            await asyncio.wait_for(replay_game(args, capture, number, stats), args.timeout)
+            stats.completed += 1
+        except Exception as e:
+            stats.failed += 1
+            key = type(e).__name__
+            stats.errors[key] = stats.errors.get(key, 0) + 1
+
+
+async def run(args, captures):
+    stats = Stats()
+    jobs = deque((capture, n) for n in range(args.repeat) for capture in captures)
+    cpu_before = process_cpu_seconds(args.server_pid) if args.server_pid else None
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(args, jobs, stats) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+    cpu_after = process_cpu_seconds(args.server_pid) if args.server_pid else None
+
+    speed = "as fast as possible" if args.speed <= 0 else f"{args.speed:g}x real time"
+    print(f"\n{'='*60}")
+    print(f"Replayed {len(captures)} captures x {args.repeat} at {speed} (concurrency {args.concurrency})")
+    print(f"Games: {stats.completed} completed, {stats.failed} failed in {elapsed:.1f}s "
+          f"({stats.completed / elapsed:.2f} games/sec)")
+    values = stats.turn_output
+    print(f"answer -> first output: p50 {percentile(values, 50)*1000:.0f} ms, "
+          f"p90 {percentile(values, 90)*1000:.0f} ms, p99 {percentile(values, 99)*1000:.0f} ms (n={len(values)})")
+    if cpu_before is not None and cpu_after is not None and stats.completed:
+        print(f"Server CPU: {(cpu_after - cpu_before) / stats.completed * 1000:.1f} ms/game")
+    print(f"Turns: {stats.turns}, mismatched: {stats.mismatched}")
+    if stats.first_mismatch:
+        capture_id, turn, expected, got = stats.first_mismatch
+        print(f"  first mismatch: {capture_id} turn {turn}\n    expected {expected!r}\n    got      {got!r}")
+    if stats.errors:
+        print(f"Errors: {stats.errors}")
+    print(f"{'='*60}\n")
+    return stats
+
+
+def spawn_server(port, paths, speed):
+    env = dict(
+        os.environ,
+        ORACLE_BACKEND="replay",
+        ORACLE_REPLAY_CAPTURES=os.pathsep.join(paths),
+        ORACLE_REPLAY_SPEED=str(speed),
+        ORACLE_GREETING_CACHE_MAX_MB="0",  # every greeting must come from the capture
+        ORACLE_SPECULATE_ANSWERS="",  # side sessions would take turns from the capture
+        ORACLE_CAPTURE_DIR="",
+        ORACLE_HISTORY_DB="",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1):
+                return proc
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("replay server did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="capture files or directories of them")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="timing scale: 1 real time, 2 twice as fast, 0 as fast as possible")
+    parser.add_argument("--repeat", type=int, default=1, help="replays of each capture")
+    parser.add_argument("--concurrency", type=int, default=1, help="games in flight at once")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per game")
+    parser.add_argument("--server-pid", type=int, help="server process id for CPU accounting")
+    parser.add_argument("--spawn", action="store_true", help="start a replay-backed server on --port")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    paths = capture_paths(args.captures)
+    captures = [capture for capture in map(Capture.load, paths) if capture.turns]
+    if not captures:
+        sys.exit("No captured games found")
+
+    proc = None
+    if args.spawn:
+        proc = spawn_server(args.port, [c.path for c in captures], args.speed)
+        args.url = f"ws://127.0.0.1:{args.port}/ws"
+        args.server_pid = proc.pid
+    try:
+        stats = asyncio.run(run(args, captures))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+    sys.exit(1 if stats.failed or stats.mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
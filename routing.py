@@ -0,0 +1,76 @@
+"""
+Routing requests to the worker that owns a game (see serve.py and shared_registry.py).
+
+With several workers, a reconnecting player (resume_game) or a status query can land
+on a worker that doesn't run the game. That worker looks up the owner in the shared
+registry and relays the request to the owner's private address:
+
+* a WebSocket is proxied for its whole life, starting with the resume_game message
+  already read from it, which is marked "routed" so the owner doesn't route it on;
+* an HTTP GET is fetched from the owner and returned as is, with ROUTED_HEADER set.
+
+Only reconnects that land on another worker pay for the extra hop. A new game always
+runs on the worker that accepted it.
+"""
+import asyncio
+import json
+import urllib.error
+import urllib.request
+
+import websockets
+from fastapi import WebSocketDisconnect
+
+ROUTED_HEADER = "X-Oracle-Routed"
+
+
+async def proxy_websocket(websocket, first_message, url):
+    """Relay an accepted client WebSocket to `url` until either side closes."""
+    async with websockets.connect(url, max_size=None) as owner:
+        await owner.send(json.dumps({**first_message, "routed": True}))
+
+        async def client_to_owner():
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    if message.get("text") is not None:
+                        await owner.send(message["text"])
+                    elif message.get("bytes") is not None:
+                        await owner.send(message["bytes"])
+            except WebSocketDisconnect:
+                pass
+
+        async def owner_to_client():
+            try:
+                async for message in owner:
+                    if isinstance(message, bytes):
+                        await websocket.send_bytes(message)
+                    else:
+                        await websocket.send_text(message)
+            except websockets.ConnectionClosed:
+                pass
+            # The owner closed the game's connection: pass its close code on
+            await websocket.close(code=owner.close_code or 1000)
+
+        tasks = [asyncio.create_task(client_to_owner()), asyncio.create_task(owner_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _get(url, timeout, headers):
+    request = urllib.request.Request(url, headers={**headers, ROUTED_HEADER: "1"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), response.headers.get("Content-Type")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(), e.headers.get("Content-Type")
+
+
+async def fetch(url, timeout=5.0, headers=None):
+    """GET `url` from another worker: (status, body, content type)."""
+    return await asyncio.to_thread(_get, url, timeout, headers or {})
@@ -0,0 +1,130 @@
+"""
+Production entry point: the server in several worker processes, without reload.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+The supervisor opens the listening socket and starts --workers processes that all
+accept from it, so new connections are spread across the workers by the kernel.
+Every game runs entirely on the worker that accepted it. Workers also listen on a
+private 127.0.0.1 port each, and share a registry (shared_registry.py) that
+records each worker's address and which worker owns each game. The registry also
+enforces ORACLE_MAX_GAMES and ORACLE_MAX_GAMES_PER_IP across all workers. A
+reconnect (resume_game) or a GET /games/<session_id> that lands on another worker
+is routed to the owner (routing.py). GET /metrics?worker=N reads worker N's metrics.
+
+A worker that dies is restarted, and its games are dropped from the registry. Its
+players can't resume them. SIGINT or SIGTERM shuts every worker down gracefully.
+
+Configuration (environment):
+    ORACLE_WORKERS      default for --workers (default: the number of CPUs)
+    ORACLE_REGISTRY_DB  default for --registry (default: oracle-registry-<port>.db in the temp directory)
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+
+import uvicorn
+
+import logs
+import shared_registry
+
+RESTART_DELAY_S = 1.0  # between a worker's death and its restart, so a crash loop doesn't spin
+
+
+def listen(host, port, backlog=2048):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(index, sock, registry_path, log_level):
+    """One worker process: the app, serving the shared socket and a private one."""
+    private = listen("127.0.0.1", 0)
+    os.environ["ORACLE_REGISTRY_DB"] = registry_path
+    os.environ["ORACLE_WORKER_ID"] = str(index)
+    os.environ["ORACLE_WORKER_URL"] = f"http://127.0.0.1:{private.getsockname()[1]}"
+    config = uvicorn.Config("main:app", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock, private])
+
+
+class Supervisor:
+    def __init__(self, sock, workers, registry_path, log_level):
+        self.sock = sock
+        self.count = workers
+        self.registry_path = registry_path
+        self.log_level = log_level
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}  # index -> Process
+        self.died = {}     # index -> time the worker was found dead
+        self.stopping = False
+
+    def start(self, index):
+        process = self.context.Process(
+            target=run_worker, name=f"oracle-worker-{index}",
+            args=(index, self.sock, self.registry_path, self.log_level),
+        )
+        process.start()
+        self.workers[index] = process
+        self.died.pop(index, None)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for index in range(self.count):
+            self.start(index)
+        logging.info(f"Serving on {self.sock.getsockname()} with {self.count} workers")
+
+        while not self.stopping:
+            time.sleep(0.2)
+            now = time.monotonic()
+            for index, process in list(self.workers.items()):
+                if process.is_alive():
+                    continue
+                if index not in self.died:
+                    self.died[index] = now
+                    logging.warning(f"Worker {index} (pid {process.pid}) exited with {process.exitcode}; restarting")
+                    shared_registry.purge_worker(self.registry_path, index)
+                if now - self.died[index] >= RESTART_DELAY_S:
+                    self.start(index)
+
+        # SIGTERM lets uvicorn close the connections and end the games (lifespan shutdown)
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ORACLE_WORKERS", 0)) or os.cpu_count() or 1)
+    parser.add_argument("--registry", default=os.getenv("ORACLE_REGISTRY_DB"), help="shared registry database path")
+    parser.add_argument("--log-level", default="warning", help="uvicorn log level")
+    args = parser.parse_args()
+
+    logs.configure()
+    registry_path = args.registry or os.path.join(tempfile.gettempdir(), f"oracle-registry-{args.port}.db")
+    shared_registry.reset(registry_path)
+    sock = listen(args.host, args.port)
+    Supervisor(sock, args.workers, registry_path, args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Pool of pre-connected, idle live sessions per persona.
+
+A Live session is dialed before any player asks for it, so start_game can take a
+ready session instead of waiting for the live.connect handshake. Sessions are
+single-use: once a game has talked on one it is closed, never returned, and the
+pool dials a replacement in the background.
+
+Configuration (environment):
+    ORACLE_POOL_SIZE        idle sessions kept per persona (0 disables the pool)
+    ORACLE_POOL_MAX_TOTAL   cap on idle sessions across all personas
+    ORACLE_POOL_MAX_IDLE_S  idle sessions older than this are closed and redialed
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class PooledSession:
+    """An entered live-session context manager waiting to be handed out."""
+
+    def __init__(self, cm, session):
+        self._cm = cm
+        self.session = session
+        self.created = time.monotonic()
+
+    async def close(self):
+        try:
+            await self._cm.__aexit__(None, None, None)
+        except Exception as e:
+            logging.warning(f"Error closing pooled session: {e}")
+
+
+class SessionPool:
+    def __init__(self, backend, model, config_for, keys, size_per_key=None,
+                 max_total=None, max_idle_s=None, refill_interval_s=1.0):
+        self.backend = backend
+        self.model = model  # model name, or a function of the key returning one
+        self.config_for = config_for
+        self.keys = list(keys)
+        self.size_per_key = int(size_per_key if size_per_key is not None
+                                else os.getenv("ORACLE_POOL_SIZE", 0))
+        self.max_total = int(max_total if max_total is not None
+                             else os.getenv("ORACLE_POOL_MAX_TOTAL", 20))
+        self.max_idle_s = float(max_idle_s if max_idle_s is not None
+                                else os.getenv("ORACLE_POOL_MAX_IDLE_S", 300))
+        self.refill_interval_s = refill_interval_s
+        self._idle = {key: deque() for key in self.keys}
+        self._dialing = 0
+        self._wake = asyncio.Event()
+        self._task = None
+        self._closing = set()  # stale sessions closing in the background; the loop only keeps weak references
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.size_per_key > 0 and self.max_total > 0
+
+    def idle_count(self, key=None):
+        if key is not None:
+            return len(self._idle.get(key, ()))
+        return sum(len(q) for q in self._idle.values())
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in self._idle.values():
+            while queue:
+                await queue.popleft().close()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def _model(self, key):
+        return self.model(key) if callable(self.model) else self.model
+
+    def _take(self, key):
+        queue = self._idle.get(key)
+        now = time.monotonic()
+        while queue:
+            pooled = queue.popleft()
+            if now - pooled.created <= self.max_idle_s:
+                return pooled
+            # Stale; close it in the background and keep looking
+            self._close_later(pooled)
+        return None
+
+    def _close_later(self, pooled):
+        task = asyncio.create_task(pooled.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @asynccontextmanager
+    async def session(self, key, config=None):
+        """Yield a live session for `key`, from the pool if one is ready. A session
+        with its own `config` (e.g. resuming a handle) is always dialed."""
+        pooled = self._take(key) if self.enabled and config is None else None
+        if pooled is None:
+            if config is None:
+                self.misses += 1
+            async with self.backend.connect(model=self._model(key), config=config or self.config_for(key)) as session:
+                yield session
+            return
+
+        self.hits += 1
+        self._wake.set()
+        try:
+            yield pooled.session
+        finally:
+            await pooled.close()
+
+    def bind_handle(self, session, handle):
+        """Let the backend send a resume of `handle` where `session` is."""
+        self.backend.bind_handle(session, handle)
+
+    async def _dial(self, key):
+        cm = self.backend.connect(model=self._model(key), config=self.config_for(key))
+        session = await cm.__aenter__()
+        return PooledSession(cm, session)
+
+    def _evict_stale(self):
+        now = time.monotonic()
+        for queue in self._idle.values():
+            while queue and now - queue[0].created > self.max_idle_s:
+                self._close_later(queue.popleft())
+
+    async def _maintain(self):
+        backoff = self.refill_interval_s
+        while True:
+            self._evict_stale()
+            try:
+                # Round-robin across personas so a small max_total is shared fairly
+                progress = True
+                while progress:
+                    progress = False
+                    for key in self.keys:
+                        if (len(self._idle[key]) < self.size_per_key
+                                and self.idle_count() + self._dialing < self.max_total):
+                            self._dialing += 1
+                            try:
+                                self._idle[key].append(await self._dial(key))
+                            finally:
+                                self._dialing -= 1
+                            progress = True
+                backoff = self.refill_interval_s
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Session pool refill failed: {e}")
+                backoff = min(backoff * 2, 30.0)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,151 @@
+"""
+Registry shared by the worker processes of one server (see serve.py), in SQLite.
+
+Each worker records itself (its index, pid and private URL) and every game slot it
+admits: the client IP, and the game id once the game has started. This lets every
+worker:
+
+* enforce ORACLE_MAX_GAMES and ORACLE_MAX_GAMES_PER_IP across all workers. An
+  admission is one IMMEDIATE transaction that counts the slots and takes one if
+  there is room (see AdmissionController);
+* find the worker that owns a game, so reconnects and status queries that land on
+  another worker can be routed to it.
+
+The registry only holds live state. serve.py clears it at startup, and clears a
+worker's slots when the worker dies. Transactions take tens of microseconds, but
+one can wait up to the busy timeout for another worker's write lock, so workers
+make their calls through run(), on a thread of the registry's own, never on the
+event loop.
+
+Configuration (environment, set by serve.py):
+    ORACLE_REGISTRY_DB  path of the registry database; unset for a single process
+    ORACLE_WORKER_ID    this worker's index
+    ORACLE_WORKER_URL   this worker's private http://127.0.0.1:<port> address
+"""
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker INTEGER PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slots (
+    ticket TEXT PRIMARY KEY,
+    worker INTEGER NOT NULL,
+    ip TEXT NOT NULL,
+    game TEXT UNIQUE,
+    admitted REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_ip ON slots (ip);
+CREATE INDEX IF NOT EXISTS slots_worker ON slots (worker);
+"""
+
+# Why try_admit refused a slot
+FULL = "full"
+IP_LIMIT = "ip_limit"
+
+
+def connect(path):
+    db = sqlite3.connect(path, isolation_level=None, timeout=5.0, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=OFF")  # live state only; nothing to recover after a crash
+    db.executescript(SCHEMA)
+    return db
+
+
+def reset(path):
+    """Start a server with an empty registry (serve.py, before the workers start)."""
+    db = connect(path)
+    db.executescript("DELETE FROM slots; DELETE FROM workers;")
+    db.close()
+
+
+def purge_worker(path, worker):
+    """Forget a dead worker and its slots (serve.py, when it restarts one)."""
+    db = connect(path)
+    with db:
+        db.execute("DELETE FROM slots WHERE worker = ?", (worker,))
+        db.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+    db.close()
+
+
+class SharedRegistry:
+    """One worker's connection to the registry."""
+
+    def __init__(self, path, worker, url):
+        self.path = path
+        self.worker = worker
+        self.url = url
+        self.db = connect(path)
+        # The connection is only used from this one thread, so transactions don't interleave
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="oracle-registry")
+        with self.db:
+            # A restarted worker takes over its index; its predecessor's games are gone
+            self.db.execute("DELETE FROM slots WHERE worker = ?", (worker,))
+            self.db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?)",
+                            (worker, os.getpid(), url, time.time()))
+
+    @classmethod
+    def from_env(cls):
+        """The registry serve.py set up for this worker, or None in a single process."""
+        path = os.getenv("ORACLE_REGISTRY_DB")
+        if not path:
+            return None
+        return cls(path, int(os.getenv("ORACLE_WORKER_ID", 0)), os.getenv("ORACLE_WORKER_URL", ""))
+
+    def run(self, func, *args):
+        """Await `func(*args)`, a method of this registry, run on the registry thread."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self.db:
+            self.db.execute("DELETE FROM slots WHERE worker = ?", (self.worker,))
+            self.db.execute("DELETE FROM workers WHERE worker = ?", (self.worker,))
+        self.db.close()
+
+    def try_admit(self, ip, max_games, max_per_ip):
+        """Take a slot if the limits allow (0 = unlimited). Returns (ticket id, None),
+        or (None, FULL or IP_LIMIT)."""
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if max_games > 0 and db.execute("SELECT COUNT(*) FROM slots").fetchone()[0] >= max_games:
+                return None, FULL
+            if max_per_ip > 0 and db.execute(
+                    "SELECT COUNT(*) FROM slots WHERE ip = ?", (ip,)).fetchone()[0] >= max_per_ip:
+                return None, IP_LIMIT
+            ticket = uuid.uuid4().hex
+            db.execute("INSERT INTO slots (ticket, worker, ip, admitted) VALUES (?, ?, ?, ?)",
+                       (ticket, self.worker, ip, time.time()))
+            return ticket, None
+        finally:
+            db.execute("COMMIT")
+
+    def bind(self, ticket, game_id):
+        """Record the game started on a slot."""
+        self.db.execute("UPDATE slots SET game = ? WHERE ticket = ?", (game_id, ticket))
+
+    def release(self, ticket):
+        self.db.execute("DELETE FROM slots WHERE ticket = ?", (ticket,))
+
+    def owner(self, game_id):
+        """(worker, url) of the worker running a game, or None."""
+        return self.db.execute(
+            "SELECT w.worker, w.url FROM slots s JOIN workers w ON w.worker = s.worker WHERE s.game = ?",
+            (game_id,)).fetchone()
+
+    def worker_url(self, worker):
+        row = self.db.execute("SELECT url FROM workers WHERE worker = ?", (worker,)).fetchone()
+        return row[0] if row else None
+
+    def slots(self):
+        """Slots held across all workers, by worker."""
+        return dict(self.db.execute("SELECT worker, COUNT(*) FROM slots GROUP BY worker").fetchall())
@@ -0,0 +1,160 @@
+"""
+Speculative next turns: the reply to the player's likely answers, generated while
+they are still listening to the question.
+
+After a model turn that asks a regular question, the game starts one side session
+per answer in ORACLE_SPECULATE_ANSWERS. Each one gets the game summary, the question
+and the prompt that answer would produce, and starts generating. When the player's
+answer produces one of those prompts, the game relays that side session's turn, which
+is already under way, instead of prompting its own session. The exchange is then
+written into the game's own session without generating, the same way as a cached
+greeting. The other side sessions are closed.
+
+A side session only knows the game summary, not the full history, so its reply can
+differ a little from the one the game's own session would give.
+
+Budget: ORACLE_SPECULATE_MAX_ACTIVE caps the side sessions open across all games.
+When it is used up, the question is not speculated on. Every speculation costs an
+extra upstream session and the generation of a turn that is usually thrown away.
+
+Configuration (environment):
+    ORACLE_SPECULATE_ANSWERS     answers to prepare, comma-separated, e.g. "Yes,No"; empty disables (default: empty)
+    ORACLE_SPECULATE_MAX_ACTIVE  side sessions open at once across all games (default: 10)
+"""
+import asyncio
+import logging
+import os
+import time
+
+from backends import LiveMessage, LiveServerContent
+from metrics import SPECULATION_SAVED, SPECULATIONS
+
+
+class SpeculativeTurn:
+    """One side session's turn, collected as it streams so it can be relayed later."""
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.messages = []
+        self.done = False
+        self.failed = False
+        self.started = time.perf_counter()
+        self.first_output = None  # seconds from the start to the first audio or text
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _add(self, response):
+        content = response.server_content
+        if self.first_output is None and (response.data is not None or (content is not None and (
+                content.output_transcription or content.model_turn))):
+            self.first_output = time.perf_counter() - self.started
+        self.messages.append(response)
+        self._changed.set()
+
+    def _finish(self, failed=False):
+        self.done = True
+        self.failed = failed
+        self._changed.set()
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    async def replay(self, persona):
+        """Yield the turn's messages, waiting for those not generated yet. Counts the
+        latency saved once the first output is relayed."""
+        answered = time.perf_counter()
+        i = 0
+        counted = False
+        while True:
+            while i < len(self.messages):
+                response = self.messages[i]
+                i += 1
+                if not counted and self.first_output is not None:
+                    # Without speculation generation would have started at the answer
+                    counted = True
+                    waited = max(0.0, self.started + self.first_output - answered)
+                    SPECULATION_SAVED.observe(self.first_output - waited, persona=persona)
+                yield response
+            if self.done:
+                break
+            self._changed.clear()
+            await self._changed.wait()
+        last = self.messages[-1].server_content if self.messages else None
+        if last is None or not last.turn_complete:
+            # The side session failed mid-turn: end the turn with what was relayed
+            yield LiveMessage(server_content=LiveServerContent(turn_complete=True))
+
+
+class Speculation:
+    """The speculative turns prepared for one question, by prompt."""
+
+    def __init__(self, turns):
+        self.turns = turns
+
+    def take(self, prompt):
+        """The turn prepared for `prompt`, if any; every other one is cancelled."""
+        turn = self.turns.pop(prompt, None)
+        self.cancel()
+        if turn is None or (turn.failed and not turn.messages):
+            SPECULATIONS.inc(result="miss")
+            return None
+        SPECULATIONS.inc(result="hit")
+        return turn
+
+    def cancel(self):
+        for turn in self.turns.values():
+            turn.cancel()
+        self.turns = {}
+
+
+class Speculator:
+    def __init__(self, connect, answers=None, max_active=None):
+        self.connect = connect  # key -> async context manager yielding a new live session
+        answers = answers if answers is not None else os.getenv("ORACLE_SPECULATE_ANSWERS", "")
+        self.answers = [a.strip() for a in answers.split(",") if a.strip()] if isinstance(answers, str) else list(answers)
+        self.max_active = int(max_active if max_active is not None
+                              else os.getenv("ORACLE_SPECULATE_MAX_ACTIVE", 10))
+        self.active = 0
+
+    @property
+    def enabled(self):
+        return bool(self.answers) and self.max_active > 0
+
+    def start(self, key, seed, prompt_for):
+        """Start a side turn for each answer: `seed` is the history to send first,
+        `prompt_for(answer)` the prompt that answer would produce. Returns a
+        Speculation, or None if the budget allows none."""
+        turns = {}
+        for answer in self.answers:
+            if self.active >= self.max_active:
+                SPECULATIONS.inc(result="skipped")
+                continue
+            turn = SpeculativeTurn(prompt_for(answer))
+            self.active += 1
+            turn.task = asyncio.create_task(self._run(key, seed, turn))
+            turns[turn.prompt] = turn
+        return Speculation(turns) if turns else None
+
+    async def _run(self, key, seed, turn):
+        try:
+            async with self.connect(key) as session:
+                await session.send_client_content(
+                    turns=seed + [{"role": "user", "parts": [{"text": turn.prompt}]}],
+                    turn_complete=True
+                )
+                async for response in session.receive():
+                    turn._add(response)
+                    content = response.server_content
+                    if content is not None and content.turn_complete:
+                        break
+            turn._finish()
+        except asyncio.CancelledError:
+            turn._finish(failed=True)
+            raise
+        except Exception as e:
+            logging.warning(f"Speculative turn failed: {e}")
+            SPECULATIONS.inc(result="failed")
+            turn._finish(failed=True)
+        finally:
+            self.active -= 1
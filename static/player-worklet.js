@@ -0,0 +1,118 @@
+// Plays the oracle's voice on the audio rendering thread from a ring buffer.
+//
+// The page posts decoded chunks ({type: 'push', samples}), the end of each model
+// turn ({type: 'end'}) and barge-ins ({type: 'clear'}). Playback starts once
+// jitterMs of audio is buffered, or the turn has ended, so uneven arrival over the
+// network doesn't reach the speakers. Running dry before the turn's end is an
+// underrun: the player goes silent and buffers jitterMs again. Messages back:
+//     {type: 'playing'}             playback started
+//     {type: 'underrun', ms}        playback resumed after ms of silence mid-turn
+//     {type: 'idle', received}      everything played; received counts the page's messages so far
+
+const RING_SAMPLES = 1 << 21; // ~87 s at 24 kHz, longer than any model turn
+
+class PcmPlayer extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const jitterMs = (options.processorOptions || {}).jitterMs || 100;
+        this.jitterSamples = Math.round(jitterMs * sampleRate / 1000);
+        this.ring = new Float32Array(RING_SAMPLES);
+        this.read = 0;           // samples played, ever
+        this.write = 0;          // samples pushed, ever
+        this.playing = false;
+        this.ended = true;       // the current turn's last audio has been pushed
+        this.starved = false;    // ran dry mid-turn and waiting for more audio
+        this.starvedSamples = 0;
+        this.received = 0;
+        this.port.onmessage = (event) => this.onMessage(event.data);
+    }
+
+    get buffered() {
+        return this.write - this.read;
+    }
+
+    onMessage(msg) {
+        this.received++;
+        if (msg.type === 'push') {
+            this.push(msg.samples);
+            this.ended = false;
+        } else if (msg.type === 'end') {
+            this.ended = true;
+            if (!this.playing && this.buffered === 0) {
+                // Ran dry exactly at the end of the turn: nothing was missing
+                this.starved = false;
+                this.idle();
+            }
+        } else if (msg.type === 'clear') {
+            this.read = this.write;
+            this.playing = false;
+            this.ended = true;
+            this.starved = false;
+            this.idle();
+        }
+    }
+
+    push(samples) {
+        let n = samples.length;
+        if (n > RING_SAMPLES) {
+            samples = samples.subarray(n - RING_SAMPLES);
+            n = RING_SAMPLES;
+        }
+        const overflow = this.buffered + n - RING_SAMPLES;
+        if (overflow > 0) {
+            this.read += overflow; // drop the oldest audio
+        }
+        const at = this.write % RING_SAMPLES;
+        const first = Math.min(n, RING_SAMPLES - at);
+        this.ring.set(samples.subarray(0, first), at);
+        if (first < n) {
+            this.ring.set(samples.subarray(first), 0);
+        }
+        this.write += n;
+    }
+
+    idle() {
+        this.port.postMessage({ type: 'idle', received: this.received });
+    }
+
+    process(inputs, outputs) {
+        const out = outputs[0][0];
+        if (!this.playing) {
+            if (this.buffered < this.jitterSamples && !(this.ended && this.buffered > 0)) {
+                if (this.starved) {
+                    this.starvedSamples += out.length;
+                }
+                return true; // outputs start out silent
+            }
+            this.playing = true;
+            if (this.starved) {
+                this.port.postMessage({ type: 'underrun', ms: this.starvedSamples * 1000 / sampleRate });
+                this.starved = false;
+            } else {
+                this.port.postMessage({ type: 'playing' });
+            }
+        }
+
+        const count = Math.min(out.length, this.buffered);
+        const at = this.read % RING_SAMPLES;
+        const first = Math.min(count, RING_SAMPLES - at);
+        out.set(this.ring.subarray(at, at + first));
+        if (first < count) {
+            out.set(this.ring.subarray(0, count - first), first);
+        }
+        this.read += count;
+
+        if (this.buffered === 0) {
+            this.playing = false;
+            if (this.ended) {
+                this.idle();
+            } else {
+                this.starved = true;
+                this.starvedSamples = out.length - count;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor('pcm-player', PcmPlayer);
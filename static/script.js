@@ -12,6 +12,8 @@ const characterInput = document.getElementById('character-input');
 const settingsModal = document.getElementById('settings-modal');
 const playerNameInput = document.getElementById('player-name');
 const questionLimitInput = document.getElementById('question-limit');
+const audioEncodingInput = document.getElementById('audio-encoding');
+const gameModeInput = document.getElementById('game-mode');
 
 // Load Settings on Start
 window.onload = () => {
@@ -20,6 +22,8 @@ window.onload = () => {
     
     playerNameInput.value = savedName || "";
     questionLimitInput.value = savedLimit;
+    audioEncodingInput.value = localStorage.getItem('audioEncoding') || 'auto';
+    gameModeInput.value = localStorage.getItem('gameMode') || 'voice';
 
     if (!savedName) {
         openSettings();
@@ -42,6 +46,8 @@ function saveSettings() {
         localStorage.setItem('playerName', name);
     }
     localStorage.setItem('questionLimit', limit);
+    localStorage.setItem('audioEncoding', audioEncodingInput.value);
+    localStorage.setItem('gameMode', gameModeInput.value);
     closeSettings();
 }
 
@@ -80,6 +86,11 @@ let currentText = "";
 let textQueue = [];
 let isProcessingQueue = false;
 let currentPersonaId = null;
+let sessionId = null; // Lets a dropped connection re-attach to the running game
+let resumeAttempts = 0;
+let turnStreaming = false; // a model turn is in progress
+let earlyAnswer = false; // answered from question_detected/guess_detected before turn_complete
+const MAX_RESUME_ATTEMPTS = 5;
 
 function processTextQueue() {
     if (textQueue.length > 0) {
@@ -96,30 +107,253 @@ function processTextQueue() {
 
 // Audio Context for streaming
 let audioContext = null;
-let nextStartTime = 0;
+let discardAudio = false; // barged in: drop audio until the server confirms with "interrupted"
+
+// Playback runs in an AudioWorklet ring buffer with a small jitter buffer (player-worklet.js).
+// Browsers without AudioWorklet (or pages not served over https) schedule one
+// BufferSource per chunk instead.
+const AUDIO_WORKLET_URL = document.currentScript.dataset.audioWorklet;
+const JITTER_MS = 100;
+let playerNode = null;
+let playerLoading = false;  // the worklet module is loading
+let pendingAudio = [];      // chunks and turn ends that arrived meanwhile
+let playerMessages = 0;     // messages posted to the worklet, to match its idle reports
+let playerActive = false;   // the worklet has audio buffered or playing
+let underruns = 0;          // since the last report to the server
+let underrunMs = 0;
+let nextSeq = 0;            // expected sequence number of the next audio frame
+let nextOffset = 0;         // expected turn offset of the next audio frame
+let nextStartTime = 0;      // BufferSource fallback
+const scheduledSources = new Set();
 
 function initAudio() {
     if (!audioContext) {
         audioContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: 24000 });
+        loadPlayer();
     } else if (audioContext.state === 'suspended') {
         audioContext.resume();
     }
 }
 
-function playPcmChunk(base64Audio) {
-    initAudio();
+function loadPlayer() {
+    if (!audioContext.audioWorklet || !AUDIO_WORKLET_URL) return;
+    playerLoading = true;
+    audioContext.audioWorklet.addModule(AUDIO_WORKLET_URL).then(() => {
+        playerNode = new AudioWorkletNode(audioContext, 'pcm-player', {
+            numberOfInputs: 0,
+            outputChannelCount: [1],
+            processorOptions: { jitterMs: JITTER_MS }
+        });
+        playerNode.port.onmessage = (event) => onPlayerMessage(event.data);
+        playerNode.connect(audioContext.destination);
+    }).catch((error) => {
+        console.warn("Audio worklet unavailable, using buffer sources", error);
+    }).finally(() => {
+        playerLoading = false;
+        const pending = pendingAudio;
+        pendingAudio = [];
+        pending.forEach((play) => play());
+    });
+}
+
+function onPlayerMessage(msg) {
+    if (msg.type === 'playing') {
+        genieImg.classList.add('speaking');
+    } else if (msg.type === 'underrun') {
+        underruns++;
+        underrunMs += msg.ms;
+    } else if (msg.type === 'idle' && msg.received === playerMessages) {
+        // Idle with nothing posted since: the turn has been heard to the end
+        playerActive = false;
+        genieImg.classList.remove('speaking');
+        reportAudioStats();
+    }
+}
+
+function postToPlayer(message, transfer) {
+    playerMessages++;
+    playerNode.port.postMessage(message, transfer || []);
+}
+
+function reportAudioStats() {
+    if (!underruns) return;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({
+            type: "audio_stats",
+            underruns: underruns,
+            underrun_ms: Math.round(underrunMs)
+        }));
+    }
+    underruns = 0;
+    underrunMs = 0;
+}
+
+// Binary audio frames: 4-byte header (type, codec, reserved u16) + audio payload.
+// Sequenced frames (requested with sequenced_audio) have a 12-byte header:
+// type, codec, flags u16, sequence number u32, sample offset within the turn u32.
+const FRAME_AUDIO = 0x01;
+const FRAME_AUDIO_SEQ = 0x02;
+const AUDIO_HEADER_BYTES = 4;
+const AUDIO_SEQ_HEADER_BYTES = 12;
+const FLAG_END_OF_TURN = 0x0001;
+
+// Audio encodings negotiated in start_game (ids match audio_codec.CODEC_IDS)
+const CODEC_IDS = { pcm16: 0, mulaw: 1, adpcm: 2 };
+const CODEC_PCM16 = 0;
+const CODEC_MULAW = 1;
+const CODEC_ADPCM = 2;
+
+const MULAW_TABLE = (() => {
+    const table = new Float32Array(256);
+    for (let i = 0; i < 256; i++) {
+        const u = ~i & 0xFF;
+        const exponent = (u >> 4) & 0x07;
+        const sample = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84;
+        table[i] = ((u & 0x80) ? -sample : sample) / 32768.0;
+    }
+    return table;
+})();
+
+const ADPCM_STEPS = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767
+];
+const ADPCM_INDEX_ADJUST = [-1, -1, -1, -1, 2, 4, 6, 8];
+
+// Pick an encoding from the saved setting; "auto" saves bandwidth on cellular/slow links
+function preferredAudioEncoding() {
+    const setting = localStorage.getItem('audioEncoding') || 'auto';
+    if (setting !== 'auto') {
+        return setting;
+    }
+    const conn = navigator.connection;
+    if (!conn) {
+        return 'pcm16';
+    }
+    if (conn.saveData || ['slow-2g', '2g', '3g'].includes(conn.effectiveType)) {
+        return 'adpcm';
+    }
+    if (conn.type === 'cellular') {
+        return 'mulaw';
+    }
+    return 'pcm16';
+}
+
+function decodePcm16(bytes) {
+    // Copy if the payload isn't 2-byte aligned within its buffer
+    const aligned = (bytes.byteOffset % 2 === 0) ? bytes : bytes.slice();
+    const int16Data = new Int16Array(aligned.buffer, aligned.byteOffset, aligned.byteLength >> 1);
+    const float32Data = new Float32Array(int16Data.length);
+    for (let i = 0; i < int16Data.length; i++) {
+        float32Data[i] = int16Data[i] / 32768.0;
+    }
+    return float32Data;
+}
+
+function decodeMulaw(bytes) {
+    const float32Data = new Float32Array(bytes.length);
+    for (let i = 0; i < bytes.length; i++) {
+        float32Data[i] = MULAW_TABLE[bytes[i]];
+    }
+    return float32Data;
+}
+
+function decodeAdpcm(bytes) {
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    const total = view.getUint32(0, true);
+    const blockSamples = view.getUint16(4, true);
+    const blockBytes = 4 + (blockSamples >> 1);
+    const float32Data = new Float32Array(total);
+    let o = 0;
+    for (let b = 8; b + blockBytes <= bytes.length && o < total; b += blockBytes) {
+        let pred = view.getInt16(b, true);
+        let index = bytes[b + 2];
+        for (let i = 0; i < blockSamples && o < total; i++) {
+            const packed = bytes[b + 4 + (i >> 1)];
+            const code = (i & 1) ? (packed >> 4) : (packed & 0x0F);
+            const step = ADPCM_STEPS[index];
+            const q = code & 7;
+            let vpdiff = step >> 3;
+            if (q & 4) vpdiff += step;
+            if (q & 2) vpdiff += step >> 1;
+            if (q & 1) vpdiff += step >> 2;
+            pred = (code & 8) ? pred - vpdiff : pred + vpdiff;
+            if (pred > 32767) pred = 32767;
+            else if (pred < -32768) pred = -32768;
+            index += ADPCM_INDEX_ADJUST[q];
+            if (index < 0) index = 0;
+            else if (index > 88) index = 88;
+            float32Data[o++] = pred / 32768.0;
+        }
+    }
+    return float32Data;
+}
+
+function decodeAudio(bytes, codec) {
+    if (codec === CODEC_MULAW) return decodeMulaw(bytes);
+    if (codec === CODEC_ADPCM) return decodeAdpcm(bytes);
+    return decodePcm16(bytes);
+}
+
+function base64ToBytes(base64Audio) {
     const binaryString = atob(base64Audio);
     const len = binaryString.length;
     const bytes = new Uint8Array(len);
     for (let i = 0; i < len; i++) {
         bytes[i] = binaryString.charCodeAt(i);
     }
-    
-    // Convert 16-bit PCM to Float32
-    const int16Data = new Int16Array(bytes.buffer);
-    const float32Data = new Float32Array(int16Data.length);
-    for (let i = 0; i < int16Data.length; i++) {
-        float32Data[i] = int16Data[i] / 32768.0;
+    return bytes;
+}
+
+function handleBinaryFrame(buffer) {
+    const view = new DataView(buffer);
+    const type = buffer.byteLength >= AUDIO_HEADER_BYTES ? view.getUint8(0) : null;
+    const codec = type !== null ? view.getUint8(1) : null;
+    if (type === FRAME_AUDIO_SEQ && buffer.byteLength >= AUDIO_SEQ_HEADER_BYTES) {
+        receiveSequencedAudio(view.getUint32(4, true), view.getUint32(8, true),
+                              (view.getUint16(2, true) & FLAG_END_OF_TURN) !== 0,
+                              new Uint8Array(buffer, AUDIO_SEQ_HEADER_BYTES), codec);
+    } else if (type === FRAME_AUDIO) {
+        playPcmChunk(decodeAudio(new Uint8Array(buffer, AUDIO_HEADER_BYTES), codec));
+    } else {
+        console.warn("Unknown binary frame", buffer.byteLength);
+    }
+}
+
+function receiveSequencedAudio(seq, offset, end, bytes, codec) {
+    if (seq !== nextSeq) {
+        console.warn(`Audio frame ${seq} out of sequence, expected ${nextSeq}`);
+    }
+    nextSeq = seq + 1;
+    if (offset > nextOffset) {
+        console.debug(`Server dropped ${offset - nextOffset} samples of audio`);
+    }
+    if (end) {
+        nextOffset = 0;
+        endAudioTurn();
+        return;
+    }
+    const samples = decodeAudio(bytes, codec);
+    nextOffset = offset + samples.length;
+    playPcmChunk(samples);
+}
+
+function playPcmChunk(float32Data) {
+    if (discardAudio) return;
+    initAudio();
+    if (playerLoading) {
+        pendingAudio.push(() => playPcmChunk(float32Data));
+        return;
+    }
+    if (playerNode) {
+        playerActive = true;
+        postToPlayer({ type: 'push', samples: float32Data }, [float32Data.buffer]);
+        return;
     }
 
     const buffer = audioContext.createBuffer(1, float32Data.length, 24000);
@@ -135,6 +369,8 @@ function playPcmChunk(base64Audio) {
     
     source.start(nextStartTime);
     nextStartTime += buffer.duration;
+    scheduledSources.add(source);
+    source.onended = () => scheduledSources.delete(source);
     
     // Visuals
     genieImg.classList.add('speaking');
@@ -147,6 +383,38 @@ function playPcmChunk(base64Audio) {
     }, (nextStartTime - audioContext.currentTime) * 1000);
 }
 
+function endAudioTurn() {
+    // The turn's last audio has arrived: play out what's buffered without waiting for more
+    if (discardAudio) return;
+    if (playerLoading) {
+        pendingAudio.push(endAudioTurn);
+    } else if (playerNode) {
+        postToPlayer({ type: 'end' });
+    }
+}
+
+function audioPlaying() {
+    if (playerActive || pendingAudio.length > 0) return true;
+    return audioContext !== null && nextStartTime > audioContext.currentTime;
+}
+
+function stopAudio() {
+    // Cut off everything already scheduled (the player answered mid-speech)
+    pendingAudio = [];
+    if (playerNode) {
+        postToPlayer({ type: 'clear' });
+        playerActive = false;
+    }
+    for (const source of scheduledSources) {
+        source.stop();
+    }
+    scheduledSources.clear();
+    if (audioContext) {
+        nextStartTime = audioContext.currentTime;
+    }
+    genieImg.classList.remove('speaking');
+}
+
 async function selectPersona(personaId, imageUrl) {
     if (imageUrl) {
         genieImg.src = imageUrl;
@@ -156,22 +424,23 @@ async function selectPersona(personaId, imageUrl) {
 
 function startGame(personaId) {
     currentPersonaId = personaId;
+    sessionId = null;
+    turnStreaming = true;
+    earlyAnswer = false;
+    discardAudio = false;
+    resumeAttempts = 0;
     controls.style.display = 'none';
     genieText.innerText = "Consulting the oracle...";
-    initAudio(); // Initialize audio context on user interaction
+    const mode = localStorage.getItem('gameMode') || 'voice';
+    if (mode === 'voice') {
+        initAudio(); // Initialize audio context on user interaction
+    }
     
     if (socket) {
         socket.close();
     }
 
-    // Determine protocol (ws or wss)
-    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws`;
-    
-    socket = new WebSocket(wsUrl);
-
-    socket.onopen = () => {
-        console.log("Connected to WebSocket");
+    openSocket(() => {
         const playerName = localStorage.getItem('playerName') || "Traveler";
         const questionLimit = parseInt(localStorage.getItem('questionLimit')) || 20;
         
@@ -181,21 +450,62 @@ function startGame(personaId) {
         // Re-get the reference to q-count span since innerHTML replaced it
         qCountSpan = document.getElementById('q-count');
 
-        socket.send(JSON.stringify({
+        return {
             type: "start_game",
             persona_id: personaId,
             player_name: playerName,
-            question_count_limit: questionLimit
-        }));
+            question_count_limit: questionLimit,
+            mode: mode,
+            binary_audio: true,
+            sequenced_audio: true,
+            audio_encoding: preferredAudioEncoding()
+        };
+    });
+}
+
+function resumeGame() {
+    // Re-attach to the game still running on the server; missed turns are replayed
+    resumeAttempts++;
+    genieText.innerText = "Reconnecting to the spirit world...";
+    const delay = Math.min(500 * 2 ** (resumeAttempts - 1), 8000);
+    setTimeout(() => openSocket(() => ({
+        type: "resume_game",
+        session_id: sessionId,
+        binary_audio: true,
+        sequenced_audio: true,
+        audio_encoding: preferredAudioEncoding()
+    })), delay);
+}
+
+function openSocket(firstMessage) {
+    // Determine protocol (ws or wss)
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const wsUrl = `${protocol}//${window.location.host}/ws`;
+    
+    const ws = new WebSocket(wsUrl);
+    ws.binaryType = 'arraybuffer';
+    socket = ws;
+    nextSeq = 0; // sequence numbers restart on every connection
+
+    ws.onopen = () => {
+        console.log("Connected to WebSocket");
+        ws.send(JSON.stringify(firstMessage()));
     };
 
-    socket.onmessage = (event) => {
+    ws.onmessage = (event) => {
+        if (ws !== socket) return; // Superseded by a newer connection
+        if (event.data instanceof ArrayBuffer) {
+            handleBinaryFrame(event.data);
+            return;
+        }
         const data = JSON.parse(event.data);
         if(data.type!=='audio') {
             console.log("Received:", data);
         }
         
         if (data.type === "game_started") {
+            sessionId = data.session_id;
+            resumeAttempts = 0;
             if (data.image) {
                 genieImg.src = data.image;
             }
@@ -205,10 +515,42 @@ function startGame(personaId) {
             qCountSpan.innerText = data.question_count;
             currentText = ""; // Reset text
             
+        } else if (data.type === "queued") {
+            // Server is at capacity; we're waiting for a free slot
+            const wait = data.eta_s >= 60 ? `${Math.ceil(data.eta_s / 60)} min` : `${data.eta_s} s`;
+            genieText.innerText = `The oracle is busy with other seekers. You are number ${data.position} in line (about ${wait})...`;
+            
+        } else if (data.type === "server_busy") {
+            genieText.innerText = data.message;
+            
+        } else if (data.type === "game_resumed") {
+            resumeAttempts = 0;
+            // Show everything received so far; the rest of the turn is replayed after this
+            textQueue = [];
+            genieText.innerText = currentText;
+            qCountSpan.innerText = data.question_count;
+            
+        } else if (data.type === "resume_failed") {
+            sessionId = null;
+            genieText.innerText = "Connection lost. Please refresh.";
+            controls.style.display = 'block';
+            inputArea.style.display = 'none';
+            
         } else if (data.type === "audio") {
-            playPcmChunk(data.audio);
+            // Legacy JSON transport (base64 payload)
+            const codec = CODEC_IDS[data.encoding || 'pcm16'];
+            if (data.seq !== undefined) {
+                receiveSequencedAudio(data.seq, data.offset, data.end === true, base64ToBytes(data.audio), codec);
+            } else {
+                playPcmChunk(decodeAudio(base64ToBytes(data.audio), codec));
+            }
             
+        } else if (data.type === "interrupted") {
+            // Everything after this belongs to the reply to our answer
+            discardAudio = false;
+
         } else if (data.type === "text") {
+            if (earlyAnswer) return; // Rest of a turn the player already answered
             // If this is the start of a new response (and we haven't cleared yet), clear it
             if (currentText === "") {
                 genieText.innerHTML = "";
@@ -226,6 +568,12 @@ function startGame(personaId) {
             }
             
         } else if (data.type === "turn_complete") {
+            if (earlyAnswer) {
+                // Already answered from this turn's question_detected/guess_detected
+                earlyAnswer = false;
+                return;
+            }
+            turnStreaming = false;
             document.querySelector('.genie-avatar').classList.remove('thinking');
             qCountSpan.innerText = data.question_count;
             
@@ -241,48 +589,16 @@ function startGame(personaId) {
                 questionCounter.style.display = 'block';
             }
 
-            // Determine which buttons to show based on game state
-            if (data.awaiting_ready) {
-                // Initial greeting - show Continue button to start game
-                inputArea.innerHTML = `
-                    <button class="btn answer-btn" style="width: 200px; margin: 0 auto;" onclick="sendAnswer('Continue')">Continue</button>
-                `;
-                inputArea.style.display = 'block';
-            } else if (data.is_emotional_response) {
-                // AI gave an emotional response without a question - show Continue button
-                inputArea.innerHTML = `
-                    <button class="btn answer-btn" style="width: 200px; margin: 0 auto;" onclick="sendAnswer('Continue')">Continue</button>
-                `;
-                inputArea.style.display = 'block';
-            } else if (data.player_won) {
-                // Player won (AI couldn't guess) - show reveal input
-                revealArea.style.display = 'block';
-                inputArea.style.display = 'none';
-            } else if (data.awaiting_play_again) {
-                // AI is asking if they want to play again - show Yes/No
-                inputArea.innerHTML = `
-                    <button class="btn answer-btn" style="width: 45%;" onclick="startGame('${currentPersonaId}')">Yes</button>
-                    <button class="btn answer-btn" style="width: 45%;" onclick="quitToHome()">No</button>
-                `;
-                inputArea.style.display = 'block';
-            } else if (data.is_final_guess) {
-                // AI made the final guess - show Yes/No only
-                inputArea.innerHTML = `
-                    <button class="btn answer-btn" style="width: 45%;" onclick="sendAnswer('Yes')">Yes</button>
-                    <button class="btn answer-btn" style="width: 45%;" onclick="sendAnswer('No')">No</button>
-                `;
-                inputArea.style.display = 'block';
-            } else {
-                // Regular question - show all 5 options
-                inputArea.innerHTML = `
-                    <button class="btn answer-btn" onclick="sendAnswer('Yes')">Yes</button>
-                    <button class="btn answer-btn" onclick="sendAnswer('No')">No</button>
-                    <button class="btn answer-btn" onclick="sendAnswer('Don\\'t Know')">Don't Know</button>
-                    <button class="btn answer-btn" onclick="sendAnswer('Probably')">Probably</button>
-                    <button class="btn answer-btn" onclick="sendAnswer('Probably Not')">Probably Not</button>
-                `;
-                inputArea.style.display = 'block';
-            }
+            showControls(data);
+        } else if (data.type === "question_detected" || data.type === "guess_detected") {
+            // The question or guess is known before the turn's audio ends: let the player answer now
+            document.querySelector('.genie-avatar').classList.remove('thinking');
+            qCountSpan.innerText = data.question_count;
+            showControls({
+                is_final_guess: data.is_final_guess,
+                guess: data.type === "guess_detected" ? data.character : null
+            });
+
         } else if (data.type === "resync") {
             // Backend detected out of sync, update UI
             console.warn(data.message);
@@ -293,24 +609,99 @@ function startGame(personaId) {
     };
 
 
-    socket.onclose = (event) => {
+    ws.onclose = (event) => {
         console.log("WebSocket closed", event);
+        if (ws !== socket) return;
         if (event.code !== 1000 && event.code !== 1005) { // Normal closure
-             genieText.innerText = "Connection lost. Please refresh.";
-             controls.style.display = 'block';
-             inputArea.style.display = 'none';
+            // 1008/1011/1013: the server ended the game, nothing to resume
+            if (sessionId && event.code !== 1008 && event.code !== 1011 && event.code !== 1013
+                    && resumeAttempts < MAX_RESUME_ATTEMPTS) {
+                resumeGame();
+                return;
+            }
+            if (event.code !== 1013) { // 1013: turned away, keep the server_busy message
+                genieText.innerText = "Connection lost. Please refresh.";
+            }
+            controls.style.display = 'block';
+            inputArea.style.display = 'none';
         }
     };
 
-    socket.onerror = (error) => {
+    ws.onerror = (error) => {
+        if (ws !== socket) return;
         console.error("WebSocket error", error);
         genieText.innerText = "Error connecting to the spirit world.";
     };
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function guessCard(name) {
+    return name ? `<div class="guess-card">Is it <strong>${escapeHtml(name)}</strong>?</div>` : '';
+}
+
+function showControls(data) {
+    // Determine which buttons to show based on game state
+    if (data.awaiting_ready) {
+        // Initial greeting - show Continue button to start game
+        inputArea.innerHTML = `
+            <button class="btn answer-btn" style="width: 200px; margin: 0 auto;" onclick="sendAnswer('Continue')">Continue</button>
+        `;
+        inputArea.style.display = 'block';
+    } else if (data.is_emotional_response) {
+        // AI gave an emotional response without a question - show Continue button
+        inputArea.innerHTML = `
+            <button class="btn answer-btn" style="width: 200px; margin: 0 auto;" onclick="sendAnswer('Continue')">Continue</button>
+        `;
+        inputArea.style.display = 'block';
+    } else if (data.player_won) {
+        // Player won (AI couldn't guess) - show reveal input
+        revealArea.style.display = 'block';
+        inputArea.style.display = 'none';
+    } else if (data.awaiting_play_again) {
+        // AI is asking if they want to play again - show Yes/No
+        inputArea.innerHTML = `
+            <button class="btn answer-btn" style="width: 45%;" onclick="startGame('${currentPersonaId}')">Yes</button>
+            <button class="btn answer-btn" style="width: 45%;" onclick="quitToHome()">No</button>
+        `;
+        inputArea.style.display = 'block';
+    } else if (data.is_final_guess) {
+        // AI made the final guess - show Yes/No only
+        inputArea.innerHTML = guessCard(data.guess) + `
+            <button class="btn answer-btn" style="width: 45%;" onclick="sendAnswer('Yes')">Yes</button>
+            <button class="btn answer-btn" style="width: 45%;" onclick="sendAnswer('No')">No</button>
+        `;
+        inputArea.style.display = 'block';
+    } else {
+        // Regular question (or an early guess) - show all 5 options
+        inputArea.innerHTML = guessCard(data.guess) + `
+            <button class="btn answer-btn" onclick="sendAnswer('Yes')">Yes</button>
+            <button class="btn answer-btn" onclick="sendAnswer('No')">No</button>
+            <button class="btn answer-btn" onclick="sendAnswer('Don\\'t Know')">Don't Know</button>
+            <button class="btn answer-btn" onclick="sendAnswer('Probably')">Probably</button>
+            <button class="btn answer-btn" onclick="sendAnswer('Probably Not')">Probably Not</button>
+        `;
+        inputArea.style.display = 'block';
+    }
+}
+
 function sendAnswer(answer) {
     if (!socket || socket.readyState !== WebSocket.OPEN) return;
 
+    if (turnStreaming) {
+        earlyAnswer = true;
+    }
+    const bargeIn = turnStreaming || audioPlaying();
+    if (bargeIn) {
+        stopAudio();
+        discardAudio = true;
+    }
+    turnStreaming = true;
+
     // Visual feedback
     genieText.innerText = "Thinking...";
     currentText = ""; // Clear previous text
@@ -318,18 +709,14 @@ function sendAnswer(answer) {
     inputArea.style.display = 'none'; 
     document.querySelector('.genie-avatar').classList.add('thinking');
 
-    // Reset audio context time tracking for new turn
-    if (audioContext) {
-        nextStartTime = audioContext.currentTime;
-    }
-
     // Get current question count from UI
     const currentQuestionCount = parseInt(qCountSpan.innerText) || 0;
 
     socket.send(JSON.stringify({
         type: "answer",
         message: answer,
-        question_number: currentQuestionCount
+        question_number: currentQuestionCount,
+        barge_in: bargeIn
     }));
 }
 
@@ -340,6 +727,7 @@ function submitCharacter() {
     if (!socket || socket.readyState !== WebSocket.OPEN) return;
 
     revealArea.style.display = 'none';
+    turnStreaming = true;
     genieText.innerText = "Reviewing fate...";
     currentText = ""; // Clear previous text
     textQueue = []; // Clear queue
@@ -0,0 +1,139 @@
+"""
+Incremental parser for the transcript of one model turn.
+
+Transcription arrives in small chunks. The parser is fed each chunk as it is relayed
+and reports, as soon as it is certain, whether the turn asks a question or makes a
+guess, including the guessed name:
+
+    parser = TurnParser()
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            ...  # {"type": "question_detected", "question": "Is your character real?"}
+                 # {"type": "guess_detected", "character": "Ada Lovelace"}
+    parser.finish()  # at turn_complete; reports a guessed name the turn ended in
+
+Each feed costs O(len(chunk)). The parser keeps only a short tail, to match phrases
+split across chunks, plus the current sentence or the name being read. A guess
+("I think of... [Name]. Am I correct?") supersedes a question detected earlier in
+the same turn; its "Am I correct?" is not reported as a question.
+
+A guessed name ends at "?", "!", a line break, or a "." followed by whitespace or
+by a capital letter (transcript chunks can join "Marie Curie." and "Am I correct?"
+without a space). Initials and abbreviations ("J. R. R. Tolkien", "J.R.R. Tolkien",
+"Dr. Watson", "St.John") don't end it.
+"""
+import re
+
+QUESTION_DETECTED = "question_detected"
+GUESS_DETECTED = "guess_detected"
+
+# Phrases that introduce a guess; the game's system prompt asks for "I think of... [Name]"
+GUESS_TRIGGER = re.compile(r"\b(?:i think of|i think you(?:'re| are) thinking of|my guess is)\b")
+
+_TAIL = 48  # longer than any trigger phrase
+_MAX_NAME = 80
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "jr", "sr", "mt", "prof", "gen", "capt", "lt", "col", "sgt"}
+_NAME_STRIP = " \t\"'*[]()_:,;-"
+
+
+class TurnParser:
+    def __init__(self):
+        self.question = None  # first question asked in the turn
+        self.guess = None     # guessed character name
+        self._guessing = False
+        self._tail = ""
+        self._sentence = []   # pieces of the sentence in progress (question scan)
+        self._name = []       # characters of the name in progress (guess capture)
+        self._pending_dot = False
+
+    @property
+    def kind(self):
+        """"guess", "question" or None for the text seen so far."""
+        if self._guessing:
+            return "guess"
+        if self.question is not None:
+            return "question"
+        return None
+
+    def feed(self, chunk):
+        events = []
+        if not chunk:
+            return events
+        if self._guessing:
+            if self.guess is None:
+                self._read_name(chunk, events)
+            return events
+
+        lower = chunk.lower()
+        window = self._tail + lower
+        self._tail = window[-_TAIL:]
+        for match in GUESS_TRIGGER.finditer(window):
+            if match.end() <= len(window) - len(lower):
+                continue  # already seen with the previous chunk
+            self._guessing = True
+            offset = len(window) - len(lower)
+            self._scan_question(chunk[:max(match.start() - offset, 0)], events)
+            self._read_name(chunk[match.end() - offset:], events)
+            return events
+        self._scan_question(chunk, events)
+        return events
+
+    def finish(self):
+        """End of turn: report a guessed name that ran to the end of the transcript."""
+        events = []
+        if self._guessing and self.guess is None:
+            self._emit_guess(events)
+        return events
+
+    def _scan_question(self, text, events):
+        if self.question is not None or not text:
+            return
+        mark = text.find("?")
+        if mark < 0:
+            # Only the sentence in progress is ever needed
+            cut = max(text.rfind("."), text.rfind("!"))
+            if cut >= 0:
+                self._sentence = [text[cut + 1:]]
+            else:
+                self._sentence.append(text)
+            return
+        head = text[:mark + 1]
+        cut = max(head.rfind("."), head.rfind("!"))
+        sentence = head[cut + 1:] if cut >= 0 else "".join(self._sentence) + head
+        self._sentence = []
+        self.question = " ".join(sentence.split())
+        events.append({"type": QUESTION_DETECTED, "question": self.question})
+
+    def _read_name(self, text, events):
+        name = self._name
+        for ch in text:
+            if self._pending_dot:
+                self._pending_dot = False
+                if (ch.isspace() or ch.isupper()) and not self._ends_in_abbreviation():
+                    name.pop()  # the sentence-ending "."
+                    self._emit_guess(events)
+                    return
+            if not name and not ch.isalnum():
+                continue  # "...", quotes, brackets and spaces before the name
+            if ch in "?!\n":
+                self._emit_guess(events)
+                return
+            name.append(ch)
+            if ch == ".":
+                self._pending_dot = True
+            elif len(name) >= _MAX_NAME:
+                self._emit_guess(events)
+                return
+
+    def _ends_in_abbreviation(self):
+        # The word before the trailing "." of the name read so far
+        word = "".join(self._name[:-1]).rsplit(None, 1)[-1] if len(self._name) > 1 else ""
+        word = word.rsplit(".", 1)[-1].lower()
+        return len(word) == 1 or word in _ABBREVIATIONS
+
+    def _emit_guess(self, events):
+        name = "".join(self._name).strip(_NAME_STRIP).rstrip(".").strip(_NAME_STRIP)
+        self._name = []
+        if name:
+            self.guess = name
+            events.append({"type": GUESS_DETECTED, "character": name})
@@ -0,0 +1,118 @@
+"""
+The upstream live session of one game, replaceable mid-game.
+
+Long games (question_count_limit up to 50) build up a long history upstream, and
+the time to first audio grows with it. Three mechanisms keep it flat:
+
+* Sliding-window context compression, enabled in every Live config: past
+  ORACLE_CONTEXT_TRIGGER_TOKENS the server drops the oldest turns, down to
+  ORACLE_CONTEXT_TARGET_TOKENS. A fall in the prompt token count between turns shows
+  that this happened.
+* Session resumption: the server sends resumption handles. When it announces a
+  disconnect (go_away), the game reconnects with the latest handle and keeps its
+  context.
+* Rotation: with ORACLE_CONTEXT_ROTATE_TURNS set, a session that has produced that
+  many turns is replaced by a fresh one. A fresh session is also used when a
+  go_away comes without a usable handle.
+
+After a compaction or a fresh session, `needs_summary` is set. The game then sends
+its GameSummary with the next prompt.
+
+Configuration (environment):
+    ORACLE_CONTEXT_TRIGGER_TOKENS  context size that triggers compression; 0 disables it (default: 4000)
+    ORACLE_CONTEXT_TARGET_TOKENS   context size compression cuts down to (default: 2000)
+    ORACLE_CONTEXT_ROTATE_TURNS    model turns per upstream session; 0 never rotates (default: 0)
+"""
+import logging
+import os
+from contextlib import AsyncExitStack
+
+from metrics import CONTEXT_COMPACTIONS, TURN_PROMPT_TOKENS, UPSTREAM_ROTATIONS
+
+CONTEXT_TRIGGER_TOKENS = int(os.getenv("ORACLE_CONTEXT_TRIGGER_TOKENS", 4000))
+CONTEXT_TARGET_TOKENS = int(os.getenv("ORACLE_CONTEXT_TARGET_TOKENS", 2000))
+
+
+class Upstream:
+    """A game's current live session, with what the server has told us about it."""
+
+    def __init__(self, pool, key, resume_config, rotate_turns=None):
+        self.pool = pool
+        self.key = key
+        self.resume_config = resume_config  # (key, handle) -> Live config resuming that session
+        self.rotate_turns = int(rotate_turns if rotate_turns is not None
+                                else os.getenv("ORACLE_CONTEXT_ROTATE_TURNS", 0))
+        self.session = None
+        self.handle = None         # latest resumption handle
+        self.going_away = False    # the server announced it will close the connection
+        self.prompt_tokens = None  # context size of the last model turn
+        self.turns = 0             # model turns on the current session
+        self.needs_summary = False
+        self._stack = None
+
+    @property
+    def persona(self):
+        return self.key[0]
+
+    @property
+    def rotation_due(self):
+        return self.going_away or 0 < self.rotate_turns <= self.turns
+
+    async def open(self, handle=None):
+        stack = AsyncExitStack()
+        config = self.resume_config(self.key, handle) if handle else None
+        self.session = await stack.enter_async_context(self.pool.session(self.key, config=config))
+        self._stack = stack
+        self.going_away = False
+        self.turns = 0
+        if handle is None:
+            self.prompt_tokens = None  # a resumed session keeps its context
+        return self.session
+
+    async def close(self):
+        stack, self._stack, self.session = self._stack, None, None
+        if stack is not None:
+            try:
+                await stack.aclose()
+            except Exception as e:
+                logging.warning(f"Error closing upstream session: {e}")
+
+    async def rotate(self):
+        """Replace the session between turns: resumed from the latest handle after a
+        go_away, otherwise fresh (and the game summary is due)."""
+        reason = "go_away" if self.going_away else "turns"
+        handle = self.handle if reason == "go_away" else None
+        self.handle = None
+        await self.close()
+        if handle:
+            try:
+                await self.open(handle)
+                UPSTREAM_ROTATIONS.inc(reason=reason, result="resumed")
+                return self.session
+            except Exception as e:
+                logging.warning(f"Resuming upstream session failed, starting a fresh one: {e}")
+        await self.open()
+        self.needs_summary = True
+        UPSTREAM_ROTATIONS.inc(reason=reason, result="fresh")
+        return self.session
+
+    def observe(self, response):
+        """Take resumption handles, go_away notices and token counts from a server message."""
+        update = response.session_resumption_update
+        if update is not None and update.resumable and update.new_handle:
+            self.handle = update.new_handle
+            self.pool.bind_handle(self.session, self.handle)
+        if response.go_away is not None:
+            self.going_away = True
+        usage = response.usage_metadata
+        if usage is not None and usage.prompt_token_count:
+            tokens = usage.prompt_token_count
+            TURN_PROMPT_TOKENS.observe(tokens, persona=self.persona)
+            if self.prompt_tokens is not None and tokens < self.prompt_tokens:
+                # The server compressed the context: the opening turns are gone
+                CONTEXT_COMPACTIONS.inc(persona=self.persona)
+                self.needs_summary = True
+            self.prompt_tokens = tokens
+        content = response.server_content
+        if content is not None and content.turn_complete:
+            self.turns += 1